@@ -0,0 +1,223 @@
+import asyncio
+import logging
+import re
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+from src.core.metrics import metrics
+from src.models.telegramMessage import TIMEZONE, TelegramMessage
+
+logger = logging.getLogger(__name__)
+
+QUERY_SECONDS = metrics.histogram("archive_query_seconds", "Dauer einer Archiv-Suche")
+ARCHIVED_TOTAL = metrics.counter("archive_messages_total", "Ins Archiv geschriebene Nachrichten")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    tenant TEXT NOT NULL,
+    chat_id INTEGER NOT NULL,
+    message_id INTEGER NOT NULL,
+    update_id INTEGER NOT NULL,
+    sender TEXT NOT NULL,
+    date INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    UNIQUE (tenant, chat_id, message_id)
+);
+CREATE INDEX IF NOT EXISTS messages_chat_date ON messages (tenant, chat_id, date);
+CREATE INDEX IF NOT EXISTS messages_sender_date ON messages (tenant, sender, date);
+CREATE INDEX IF NOT EXISTS messages_date ON messages (tenant, date);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+    text, sender,
+    content='messages', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS messages_ai AFTER INSERT ON messages BEGIN
+    INSERT INTO messages_fts (rowid, text, sender) VALUES (new.id, new.text, new.sender);
+END;
+CREATE TRIGGER IF NOT EXISTS messages_ad AFTER DELETE ON messages BEGIN
+    INSERT INTO messages_fts (messages_fts, rowid, text, sender)
+    VALUES ('delete', old.id, old.text, old.sender);
+END;
+"""
+
+COLUMNS = ", ".join(
+    f"messages.{c}" for c in ("sender", "date", "text", "chat_id", "message_id", "update_id")
+)
+
+# Zeitangaben in Rückfragen → (Tage zurück bis Tagesbeginn, Anzahl Tage)
+TIME_WORDS = {
+    "heute": (0, 1),
+    "gestern": (1, 1),
+    "vorgestern": (2, 1),
+    "woche": (7, 8),
+}
+
+STOPWORDS = {
+    "aber", "alle", "auch", "bitte", "dann", "dass", "denn", "diese", "dieser",
+    "eine", "einer", "einem", "einen", "etwas", "geschrieben", "gesagt", "habe",
+    "haben", "hast", "hatte", "letzte", "letzten", "mehr", "mir", "mich", "nachricht",
+    "nachrichten", "noch", "nochmal", "oder", "schon", "schreibt", "schrieb", "sein",
+    "sind", "über", "uber", "und", "vorlesen", "wann", "warum", "was", "welche",
+    "wegen", "weißt", "wenn", "wer", "wie", "wieder", "wollte", "zum", "zur",
+}
+
+WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+@dataclass
+class ArchiveQuery:
+    terms: list[str]
+    senders: list[str]
+    since: int | None = None
+    until: int | None = None
+
+    @property
+    def scoped(self) -> bool:
+        """Nach Absender oder Zeitraum eingegrenzt (statt nur Suchbegriffe)."""
+        return bool(self.senders) or self.since is not None
+
+
+class MessageArchive:
+    """Lokales SQLite-Archiv aller abgerufenen Telegram-Nachrichten.
+
+    Index nach Chat, Absender und Zeit plus FTS5-Volltextindex. Rückfragen
+    wie "Was hat Max gestern geschrieben?" werden lokal aufgelöst, sodass
+    Claude nur die passenden Zeilen sieht.
+
+    Die Methoden blockieren (SQLite, fsync beim Commit). Aus dem Event-Loop
+    laufen sie über `run` in einem eigenen Thread, der die Verbindung allein
+    nutzt.
+    """
+
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="archive")
+
+    async def run(self, fn, *args):
+        """Führt eine Archiv-Methode im Archiv-Thread aus, z.B. `await archive.run(archive.add, ...)`."""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def add(self, tenant: str, messages: list[TelegramMessage]):
+        """Schreibt einen Batch in einer Transaktion (Duplikate werden ignoriert)."""
+        if not messages:
+            return
+        rows = [
+            (tenant, m.chat_id, m.message_id, m.update_id, m.sender, m.date, m.text)
+            for m in messages
+        ]
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO messages "
+                "(tenant, chat_id, message_id, update_id, sender, date, text) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.execute("COMMIT")
+        ARCHIVED_TOTAL.inc(len(rows))
+
+    def search(
+        self,
+        tenant: str,
+        terms: list[str] | None = None,
+        senders: list[str] | None = None,
+        since: int | None = None,
+        until: int | None = None,
+        limit: int = 20,
+    ) -> list[TelegramMessage]:
+        """Sucht nach Volltext-Begriffen (ODER, Präfix) und/oder Absender und Zeitraum."""
+        sql = f"SELECT {COLUMNS} FROM messages WHERE tenant = ?"
+        params: list = [tenant]
+        if terms:
+            match = " OR ".join(f'"{t}"*' for t in terms)
+            sql = (
+                f"SELECT {COLUMNS} FROM messages "
+                "JOIN messages_fts ON messages_fts.rowid = messages.id "
+                "WHERE tenant = ? AND messages_fts MATCH ?"
+            )
+            params.append(match)
+        if senders:
+            sql += f" AND messages.sender IN ({', '.join('?' * len(senders))})"
+            params.extend(senders)
+        if since is not None:
+            sql += " AND date >= ?"
+            params.append(since)
+        if until is not None:
+            sql += " AND date < ?"
+            params.append(until)
+        # FTS: Rowid (≈ Ankunftsreihenfolge) statt Datum — spart das Sortieren aller Treffer
+        sql += " ORDER BY messages_fts.rowid DESC LIMIT ?" if terms else " ORDER BY date DESC LIMIT ?"
+        params.append(limit)
+
+        started = time.monotonic()
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        QUERY_SECONDS.observe(time.monotonic() - started)
+        # Chronologisch, wie im Anruf vorgelesen
+        return [
+            TelegramMessage(sys.intern(sender), *rest) for sender, *rest in reversed(rows)
+        ]
+
+    def senders(self, tenant: str) -> list[str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT DISTINCT sender FROM messages WHERE tenant = ?", (tenant,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def parse_question(
+        self, tenant: str, question: str, now: datetime | None = None
+    ) -> ArchiveQuery:
+        """Erkennt Absender (Vor- oder Nachname), Zeitangaben und Suchbegriffe."""
+        words = [w.lower() for w in WORD_RE.findall(question)]
+        senders = [
+            s for s in self.senders(tenant)
+            if any(part.lower() in words for part in s.split())
+        ]
+        sender_words = {part.lower() for s in senders for part in s.split()}
+
+        since = until = None
+        for word in words:
+            if word in TIME_WORDS:
+                days_back, span = TIME_WORDS[word]
+                now = now or datetime.now(TIMEZONE)
+                start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+                start -= timedelta(days=days_back)
+                since = int(start.timestamp())
+                until = int((start + timedelta(days=span)).timestamp())
+                break
+
+        terms = [
+            w for w in words
+            if len(w) >= 4 and w not in STOPWORDS and w not in sender_words and w not in TIME_WORDS
+        ]
+        return ArchiveQuery(terms=terms, senders=senders, since=since, until=until)
+
+    def find(self, tenant: str, query: ArchiveQuery, limit: int = 20) -> list[TelegramMessage]:
+        """Volltext-Treffer im Filter; ohne solche zählen Absender und Zeitraum allein."""
+        if query.terms:
+            hits = self.search(tenant, query.terms, query.senders, query.since, query.until, limit)
+            if hits:
+                return hits
+        if query.scoped:
+            return self.search(tenant, None, query.senders, query.since, query.until, limit)
+        return []
+
+    def lookup(self, tenant: str, question: str) -> list[TelegramMessage]:
+        """Passende Nachrichten zu einer Rückfrage (Frage auswerten + suchen)."""
+        return self.find(tenant, self.parse_question(tenant, question))
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        self._conn.close()
@@ -0,0 +1,141 @@
+"""In-Process Audio-Codec: G.711 µ-law per Lookup-Tabelle und Polyphasen-Resampler.
+
+Ersetzt audioop (seit Python 3.13 nicht mehr in der Standardbibliothek) und
+den ffmpeg-Umweg von pydub fürs Resampling. Alle Funktionen arbeiten
+vektorisiert auf NumPy-Arrays; Encoder-Ausgaben sind `memoryview`s auf den
+Ergebnis-Puffer, damit Chunking und Base64 ohne Kopien auskommen.
+"""
+
+from functools import lru_cache
+from math import ceil, gcd
+
+import numpy as np
+
+# ── G.711 µ-law ──
+
+_SEG_UEND = np.array([0x3F, 0x7F, 0xFF, 0x1FF, 0x3FF, 0x7FF, 0xFFF, 0x1FFF], dtype=np.int32)
+_CLIP = 8159
+_BIAS = 0x84
+
+
+def _build_decode_table() -> np.ndarray:
+    """µ-law-Byte → int16 (256 Einträge)."""
+    u = ~np.arange(256, dtype=np.uint8)
+    exponent = (u >> 4) & 0x07
+    mantissa = (u & 0x0F).astype(np.int32)
+    sample = (((mantissa << 3) + _BIAS) << exponent) - _BIAS
+    return np.where(u & 0x80, -sample, sample).astype(np.int16)
+
+
+def _build_encode_table() -> np.ndarray:
+    """int16 (als uint16 indiziert) → µ-law-Byte (65536 Einträge), bitgenau wie audioop."""
+    pcm = np.arange(65536, dtype=np.uint16).view(np.int16).astype(np.int32) >> 2
+    mask = np.where(pcm < 0, 0x7F, 0xFF)
+    magnitude = np.minimum(np.abs(pcm), _CLIP) + (_BIAS >> 2)
+    seg = np.searchsorted(_SEG_UEND, magnitude)
+    uval = (np.minimum(seg, 7) << 4) | ((magnitude >> (np.minimum(seg, 7) + 1)) & 0x0F)
+    uval = np.where(seg >= 8, 0x7F, uval)
+    return (uval ^ mask).astype(np.uint8)
+
+
+MULAW_DECODE_TABLE = _build_decode_table()
+MULAW_ENCODE_TABLE = _build_encode_table()
+
+
+def encode_mulaw(pcm: np.ndarray) -> memoryview:
+    """Kodiert int16-PCM zu µ-law (ein Byte pro Sample)."""
+    pcm = np.asarray(pcm, dtype=np.int16)
+    return memoryview(MULAW_ENCODE_TABLE[pcm.view(np.uint16)])
+
+
+def decode_mulaw(mulaw) -> np.ndarray:
+    """Dekodiert µ-law (bytes/memoryview/ndarray) zu int16-PCM."""
+    return MULAW_DECODE_TABLE.take(np.frombuffer(mulaw, dtype=np.uint8))
+
+
+# ── Resampling ──
+
+TAPS_PER_PHASE = 24
+BLOCK_SIZE = 8192
+
+
+@lru_cache(maxsize=16)
+def _polyphase_filter(up: int, down: int) -> tuple[np.ndarray, int]:
+    """Kaiser-gefensterter Tiefpass, zerlegt in `up` Phasen à K Taps.
+
+    Liefert die Phasenmatrix (up × K) und die Gruppenlaufzeit in Samples
+    der hochgetakteten Rate.
+    """
+    factor = max(up, down)
+    half = TAPS_PER_PHASE // 2 * factor
+    n = np.arange(-half, half + 1)
+    cutoff = 0.5 / factor
+    h = 2 * cutoff * np.sinc(2 * cutoff * n) * np.kaiser(len(n), 8.0)
+    h *= up / h.sum()
+
+    taps = ceil(len(h) / up)
+    h = np.concatenate([h, np.zeros(taps * up - len(h))])
+    # phases[p, j] = h[p + j·up]
+    phases = h.reshape(taps, up).T.astype(np.float32)
+    return np.ascontiguousarray(phases[:, ::-1]), half
+
+
+def resample(samples: np.ndarray, src_rate: int, dst_rate: int) -> np.ndarray:
+    """Polyphasen-Resampler für int16-PCM (z.B. 24 kHz → 8 kHz).
+
+    Kein Hochtakten mit Nullen und kein Filtern verworfener Samples;
+    der Speicherbedarf bleibt linear bzw. blockweise begrenzt.
+    """
+    if src_rate == dst_rate:
+        return np.asarray(samples, dtype=np.int16)
+
+    g = gcd(src_rate, dst_rate)
+    up, down = dst_rate // g, src_rate // g
+    x = np.asarray(samples, dtype=np.float32)
+    if up == 1:
+        y = _decimate(x, down)
+    else:
+        y = _resample_rational(x, up, down)
+    return np.clip(np.rint(y), -32768, 32767).astype(np.int16)
+
+
+def _decimate(x: np.ndarray, down: int) -> np.ndarray:
+    """Ganzzahlige Dezimation als Summe von `down` Teilfaltungen (Polyphasen-Form).
+
+    Jede Phase faltet nur jedes `down`-te Eingangssample mit jedem
+    `down`-ten Filterkoeffizienten — berechnet werden ausschließlich die
+    behaltenen Ausgangssamples.
+    """
+    phases, delay = _polyphase_filter(1, down)
+    h = phases[0, ::-1]
+    n_out = ceil(len(x) / down)
+    shift = delay // down
+
+    padded = np.concatenate([np.zeros(down, np.float32), x, np.zeros(len(h), np.float32)])
+    y = np.zeros(n_out, dtype=np.float32)
+    for p in range(down):
+        # xq[j] = x[j·down - p], hq[m] = h[m·down + p]
+        xq = padded[down - p :: down]
+        y += np.convolve(xq, h[p::down])[shift : shift + n_out]
+    return y
+
+
+def _resample_rational(x: np.ndarray, up: int, down: int) -> np.ndarray:
+    """Rationales Resampling: jede Ausgabe aus den K Taps ihrer Filterphase."""
+    phases, delay = _polyphase_filter(up, down)
+    taps = phases.shape[1]
+
+    padded = np.concatenate([np.zeros(taps, np.float32), x, np.zeros(taps + 1, np.float32)])
+    n_out = ceil(len(x) * up / down)
+    out = np.empty(n_out, dtype=np.float32)
+    offsets = np.arange(taps)
+
+    for start in range(0, n_out, BLOCK_SIZE):
+        n = np.arange(start, min(start + BLOCK_SIZE, n_out))
+        t = n * down + delay
+        base = t // up
+        # Fenster x[base-K+1 .. base] in aufsteigender Reihenfolge (Taps sind gespiegelt)
+        windows = padded[(base + 1)[:, None] + offsets]
+        out[start : start + len(n)] = np.einsum("ij,ij->i", windows, phases[t % up])
+
+    return out
@@ -1,19 +1,46 @@
-import audioop
 import base64
 import io
 import logging
+import subprocess
+import wave
 
-from pydub import AudioSegment
+import numpy as np
+
+from src.core.audio_codec import decode_mulaw, encode_mulaw, resample
 
 logger = logging.getLogger(__name__)
 
+TWILIO_SAMPLE_RATE = 8000
+# edge-tts liefert 24 kHz — ffmpeg dekodiert dann ohne eigenes Resampling
+MP3_DECODE_RATE = 24000
+
+
+def decode_mp3(mp3_bytes: bytes, rate: int = MP3_DECODE_RATE) -> tuple[np.ndarray, int]:
+    """Dekodiert MP3 per ffmpeg-Subprozess zu Mono-int16-PCM mit `rate` Hz.
 
-def mp3_to_mulaw(mp3_bytes: bytes) -> bytes:
+    Kein pydub: das importiert audioop, das es ab Python 3.13 nur noch
+    über audioop-lts gibt. Downmix macht ffmpeg, Resampling auf 8 kHz
+    und µ-law übernimmt danach der NumPy-Codec. Blockiert bis ffmpeg fertig
+    ist — aus async Code nur über `asyncio.to_thread` aufrufen.
+    """
+    result = subprocess.run(
+        [
+            "ffmpeg", "-hide_banner", "-loglevel", "error",
+            "-f", "mp3", "-i", "pipe:0",
+            "-f", "s16le", "-ac", "1", "-ar", str(rate), "pipe:1",
+        ],
+        input=mp3_bytes,
+        capture_output=True,
+        check=True,
+    )
+    return np.frombuffer(result.stdout, dtype="<i2").astype(np.int16, copy=False), rate
+
+
+def mp3_to_mulaw(mp3_bytes: bytes) -> bytes | memoryview:
     """Konvertiert MP3-Audio zu mulaw 8kHz (Twilio-Format)."""
     try:
-        audio = AudioSegment.from_mp3(io.BytesIO(mp3_bytes))
-        audio = audio.set_frame_rate(8000).set_channels(1).set_sample_width(2)
-        mulaw = audioop.lin2ulaw(audio.raw_data, 2)
+        samples, rate = decode_mp3(mp3_bytes)
+        mulaw = encode_mulaw(resample(samples, rate, TWILIO_SAMPLE_RATE))
         logger.info(f"Converted {len(mp3_bytes)} MP3 bytes to {len(mulaw)} mulaw bytes")
         return mulaw
     except Exception as e:
@@ -21,30 +48,28 @@ def mp3_to_mulaw(mp3_bytes: bytes) -> bytes:
         return b""
 
 
-def mulaw_to_base64_chunks(mulaw_bytes: bytes, chunk_size: int = 640) -> list[str]:
+def mulaw_to_base64_chunks(mulaw_bytes: bytes | memoryview, chunk_size: int = 640) -> list[str]:
     """Teilt mulaw-Audio in Base64-kodierte Chunks für Twilio."""
-    chunks = []
-    for i in range(0, len(mulaw_bytes), chunk_size):
-        chunk = mulaw_bytes[i : i + chunk_size]
-        chunks.append(base64.b64encode(chunk).decode("ascii"))
-    return chunks
+    view = memoryview(mulaw_bytes)
+    return [
+        base64.b64encode(view[i : i + chunk_size]).decode("ascii")
+        for i in range(0, len(view), chunk_size)
+    ]
 
 
-def mulaw_to_wav(mulaw_bytes: bytes, sample_rate: int = 8000) -> bytes:
+def mulaw_to_wav(mulaw_bytes: bytes | memoryview, sample_rate: int = TWILIO_SAMPLE_RATE) -> bytes:
     """Konvertiert mulaw-Audio zu WAV für STT."""
     try:
-        pcm = audioop.ulaw2lin(mulaw_bytes, 2)
-        audio = AudioSegment(
-            data=pcm,
-            sample_width=2,
-            frame_rate=sample_rate,
-            channels=1,
-        )
+        pcm = decode_mulaw(mulaw_bytes)
         buffer = io.BytesIO()
-        audio.export(buffer, format="wav")
+        with wave.open(buffer, "wb") as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(sample_rate)
+            wav.writeframes(pcm.astype("<i2", copy=False))
         wav_bytes = buffer.getvalue()
         logger.info(f"Converted {len(mulaw_bytes)} mulaw bytes to {len(wav_bytes)} WAV bytes")
         return wav_bytes
     except Exception as e:
         logger.error(f"mulaw to WAV conversion error: {e}")
-        return b""
\ No newline at end of file
+        return b""
@@ -0,0 +1,84 @@
+import asyncio
+import logging
+import sys
+
+from src.core.metrics import metrics
+from src.models.telegramMessage import TelegramMessage
+
+logger = logging.getLogger(__name__)
+
+AUDIO_DROPPED_TOTAL = metrics.counter(
+    "audio_queue_dropped_total", "Verworfene Eingangs-Chunks wegen voller Audio-Queue"
+)
+BUDGET_EXCEEDED_TOTAL = metrics.counter(
+    "call_memory_budget_exceeded_total", "Überschreitungen des Speicherbudgets pro Anruf"
+)
+CALL_MEMORY_BYTES = metrics.histogram(
+    "call_memory_bytes", "Geschätzter Speicher pro Anruf bei Anrufende"
+)
+
+
+class AudioQueue(asyncio.Queue):
+    """Begrenzte Audio-Queue, die ihre Bytes mitzählt.
+
+    Läuft sie voll (z.B. während einer langen Ansage), fällt der älteste
+    Chunk weg — altes Anrufer-Audio wird vor dem Zuhören ohnehin verworfen.
+    """
+
+    def __init__(self, maxsize: int):
+        super().__init__(maxsize)
+        self.nbytes = 0
+
+    def put_latest(self, item: bytes | None):
+        while self.full():
+            self.get_nowait()
+            AUDIO_DROPPED_TOTAL.inc()
+        self.put_nowait(item)
+
+    def _put(self, item):
+        super()._put(item)
+        if item:
+            self.nbytes += len(item)
+
+    def _get(self):
+        item = super()._get()
+        if item:
+            self.nbytes -= len(item)
+        return item
+
+
+def message_bytes(message: TelegramMessage) -> int:
+    # Absender sind interniert und werden geteilt, daher nicht mitgezählt
+    return sys.getsizeof(message) + sys.getsizeof(message.text)
+
+
+def history_bytes(entry: dict) -> int:
+    return sys.getsizeof(entry) + sys.getsizeof(entry["content"])
+
+
+def trim_to_budget(
+    messages: list[TelegramMessage],
+    history: list[dict],
+    fixed_bytes: int,
+    budget: int,
+) -> int:
+    """Kürzt Verlauf und Nachrichten in-place, bis `budget` eingehalten wird.
+
+    Zuerst fallen die ältesten Rückfrage-Paare weg (die letzte bleibt),
+    danach die ältesten Nachrichten. Liefert die neue Gesamtgröße.
+    """
+    total = (
+        fixed_bytes
+        + sum(map(message_bytes, messages))
+        + sum(map(history_bytes, history))
+    )
+    if total <= budget:
+        return total
+
+    BUDGET_EXCEEDED_TOTAL.inc()
+    logger.warning(f"Call memory {total} B over budget {budget} B, trimming")
+    while total > budget and len(history) > 2:
+        total -= history_bytes(history.pop(0)) + history_bytes(history.pop(0))
+    while total > budget and messages:
+        total -= message_bytes(messages.pop(0))
+    return total
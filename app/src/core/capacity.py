@@ -0,0 +1,97 @@
+import asyncio
+import logging
+import time
+
+from src.core.config import MAX_CONCURRENT_CALLS, MAX_LOOP_LAG_MS
+from src.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_CALLS = metrics.gauge("active_calls", "Laufende Anrufe (Pipelines) auf diesem Pod")
+CALL_CAPACITY = metrics.gauge("call_capacity", "Max. gleichzeitige Anrufe pro Pod")
+LOOP_LAG_SECONDS = metrics.gauge(
+    "event_loop_lag_seconds", "Geglättete Verzögerung des Event-Loops"
+)
+
+LOOP_LAG_INTERVAL = 0.25
+# Glättung, damit einzelne Spitzen die Readiness nicht flattern lassen
+LOOP_LAG_SMOOTHING = 0.3
+
+
+class CallCapacity:
+    """Aktive Anrufe, Event-Loop-Headroom und Drain-Zustand eines Pods.
+
+    Grundlage für die Readiness: Ein voller, überlasteter oder
+    herunterfahrender Pod bekommt keine neuen Anrufe mehr.
+    """
+
+    def __init__(
+        self,
+        max_calls: int = MAX_CONCURRENT_CALLS,
+        max_loop_lag: float = MAX_LOOP_LAG_MS / 1000,
+    ):
+        self.max_calls = max_calls
+        self.max_loop_lag = max_loop_lag
+        self.active = 0
+        self.loop_lag = 0.0
+        self.draining = False
+        self._idle = asyncio.Event()
+        self._idle.set()
+        CALL_CAPACITY.set(max_calls)
+        ACTIVE_CALLS.set(0)
+
+    def call_started(self):
+        self.active += 1
+        self._idle.clear()
+        ACTIVE_CALLS.set(self.active)
+
+    def call_ended(self):
+        self.active -= 1
+        ACTIVE_CALLS.set(self.active)
+        if self.active == 0:
+            self._idle.set()
+
+    def unavailable_reason(self) -> str | None:
+        """Grund, warum keine neuen Anrufe angenommen werden sollen (None = bereit)."""
+        if self.draining:
+            return "draining"
+        if self.active >= self.max_calls:
+            return "at_capacity"
+        if self.loop_lag > self.max_loop_lag:
+            return "event_loop_lagging"
+        return None
+
+    def status(self) -> dict:
+        return {
+            "active_calls": self.active,
+            "max_calls": self.max_calls,
+            "loop_lag_ms": round(self.loop_lag * 1000, 1),
+        }
+
+    async def monitor_loop_lag(self, interval: float = LOOP_LAG_INTERVAL):
+        """Misst, wie viel später als geplant der Loop einen Sleep fortsetzt."""
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(interval)
+            lag = max(0.0, time.monotonic() - started - interval)
+            self.loop_lag += LOOP_LAG_SMOOTHING * (lag - self.loop_lag)
+            LOOP_LAG_SECONDS.set(self.loop_lag)
+
+    async def drain(self, timeout: float) -> int:
+        """Nimmt keine neuen Anrufe mehr an und wartet auf laufende.
+
+        Liefert die Anzahl der Anrufe, die nach `timeout` noch liefen.
+        """
+        self.draining = True
+        logger.info(f"Draining {self.active} active calls (timeout {timeout:.0f}s)")
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Drain timeout, {self.active} calls still active")
+        return self.active
+
+    def resume(self):
+        """Hebt einen Drain wieder auf (z.B. nach einem abgebrochenen Rollout)."""
+        if self.draining:
+            logger.info("Drain cancelled, accepting calls again")
+        self.draining = False
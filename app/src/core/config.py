@@ -5,3 +5,102 @@ TELEGRAM_TIMEOUT = int(os.getenv("TELEGRAM_TIMEOUT", "10"))
 ANTHROPIC_TIMEOUT = int(os.getenv("ANTHROPIC_TIMEOUT", "30"))
 DEEPGRAM_TIMEOUT = int(os.getenv("DEEPGRAM_TIMEOUT", "30"))
 TTS_TIMEOUT = int(os.getenv("TTS_TIMEOUT", "15"))
+
+# Voice Activity Detection (lokal, vor Deepgram)
+VAD_ENABLED = os.getenv("VAD_ENABLED", "true").lower() == "true"
+VAD_ENERGY_THRESHOLD_DB = float(os.getenv("VAD_ENERGY_THRESHOLD_DB", "-45"))
+VAD_ZCR_MAX = float(os.getenv("VAD_ZCR_MAX", "0.5"))
+VAD_MIN_SPEECH_MS = int(os.getenv("VAD_MIN_SPEECH_MS", "60"))
+VAD_PADDING_MS = int(os.getenv("VAD_PADDING_MS", "200"))
+VAD_HANGOVER_MS = int(os.getenv("VAD_HANGOVER_MS", "700"))
+
+# Deepgram-Endpointing (Fallback, falls die lokale VAD deaktiviert ist)
+DEEPGRAM_ENDPOINTING_MS = int(os.getenv("DEEPGRAM_ENDPOINTING_MS", "2000"))
+
+# Spekulative Rückfrage-Antworten auf stabilen Interim-Transkripten
+SPECULATION_ENABLED = os.getenv("SPECULATION_ENABLED", "true").lower() == "true"
+SPECULATION_STABILITY_MS = int(os.getenv("SPECULATION_STABILITY_MS", "400"))
+SPECULATION_TTS = os.getenv("SPECULATION_TTS", "false").lower() == "true"
+
+# Call-Traces für Record/Replay (leer = deaktiviert)
+TRACE_DIR = os.getenv("TRACE_DIR", "")
+
+# Admission Control für Upstreams (Claude, edge-tts, Deepgram)
+SCHEDULER_LLM_CONCURRENCY = int(os.getenv("SCHEDULER_LLM_CONCURRENCY", "8"))
+SCHEDULER_TTS_CONCURRENCY = int(os.getenv("SCHEDULER_TTS_CONCURRENCY", "8"))
+SCHEDULER_STT_CONCURRENCY = int(os.getenv("SCHEDULER_STT_CONCURRENCY", "50"))
+SCHEDULER_MAX_QUEUE = int(os.getenv("SCHEDULER_MAX_QUEUE", "32"))
+SCHEDULER_MAX_WAIT = float(os.getenv("SCHEDULER_MAX_WAIT", "5"))
+
+# Adaptive Timeouts + Hedging (statische Timeouts oben gelten als Obergrenze)
+HEDGING_ENABLED = os.getenv("HEDGING_ENABLED", "true").lower() == "true"
+ADAPTIVE_TIMEOUT_MIN = float(os.getenv("ADAPTIVE_TIMEOUT_MIN", "2"))
+ADAPTIVE_TIMEOUT_FACTOR = float(os.getenv("ADAPTIVE_TIMEOUT_FACTOR", "2"))
+LATENCY_WINDOW = int(os.getenv("LATENCY_WINDOW", "200"))
+LATENCY_MIN_SAMPLES = int(os.getenv("LATENCY_MIN_SAMPLES", "20"))
+LLM_HEDGE_MAX_TOKENS = int(os.getenv("LLM_HEDGE_MAX_TOKENS", "300"))
+
+# Modell-Routing: kleine Anfragen an das schnelle Modell (leer = aus)
+ROUTER_FAST_MAX_MESSAGES = int(os.getenv("ROUTER_FAST_MAX_MESSAGES", "20"))
+ROUTER_FAST_MAX_QUESTION_CHARS = int(os.getenv("ROUTER_FAST_MAX_QUESTION_CHARS", "120"))
+ROUTER_LATENCY_BUDGET = float(os.getenv("ROUTER_LATENCY_BUDGET", "2.0"))
+
+# Speicher pro Anruf (Pod-Limit 512Mi)
+AUDIO_QUEUE_MAX_FRAMES = int(os.getenv("AUDIO_QUEUE_MAX_FRAMES", "500"))
+CALL_HISTORY_MAX_TURNS = int(os.getenv("CALL_HISTORY_MAX_TURNS", "10"))
+CALL_MEMORY_BUDGET_BYTES = int(os.getenv("CALL_MEMORY_BUDGET_BYTES", "2000000"))
+
+# Start: max. Dauer des Warm-ups, bevor trotzdem Readiness gemeldet wird
+WARMUP_TIMEOUT = float(os.getenv("WARMUP_TIMEOUT", "30"))
+
+# Kapazität pro Pod (Readiness, HPA, Drain beim Shutdown)
+MAX_CONCURRENT_CALLS = int(os.getenv("MAX_CONCURRENT_CALLS", "20"))
+MAX_LOOP_LAG_MS = int(os.getenv("MAX_LOOP_LAG_MS", "100"))
+DRAIN_TIMEOUT = float(os.getenv("DRAIN_TIMEOUT", "300"))
+
+# Multi-Tenant: Registry-Datei (leer = ein Tenant aus den Env-Variablen)
+TENANTS_FILE = os.getenv("TENANTS_FILE", "")
+TENANT_CACHE_SIZE = int(os.getenv("TENANT_CACHE_SIZE", "256"))
+TELEGRAM_MAX_CONNECTIONS = int(os.getenv("TELEGRAM_MAX_CONNECTIONS", "4"))
+TELEGRAM_KEEPALIVE_EXPIRY = float(os.getenv("TELEGRAM_KEEPALIVE_EXPIRY", "30"))
+
+# Nachrichten-Archiv (SQLite + FTS5) für Rückfragen über frühere Anrufe (leer = aus)
+ARCHIVE_PATH = os.getenv("ARCHIVE_PATH", "")
+
+# Prompt-Aufbau: Token-Budget für den Nachrichtenblock (lokal geschätzt)
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "3000"))
+PROMPT_MAX_MESSAGE_TOKENS = int(os.getenv("PROMPT_MAX_MESSAGE_TOKENS", "250"))
+
+# Sprachnachrichten: parallele Downloads/Transkription, Cache nach file_unique_id
+VOICE_CONCURRENCY = int(os.getenv("VOICE_CONCURRENCY", "4"))
+VOICE_CACHE_SIZE = int(os.getenv("VOICE_CACHE_SIZE", "2048"))
+VOICE_TRANSCRIBE_TIMEOUT = float(os.getenv("VOICE_TRANSCRIBE_TIMEOUT", "4"))
+
+# Vorgerenderte Zusammenfassung: Telegram im Hintergrund pollen (Default aus)
+DIGEST_ENABLED = os.getenv("DIGEST_ENABLED", "false").lower() == "true"
+DIGEST_POLL_INTERVAL = float(os.getenv("DIGEST_POLL_INTERVAL", "15"))
+DIGEST_DEBOUNCE = float(os.getenv("DIGEST_DEBOUNCE", "10"))
+
+# Sampling-Profiler (/admin/profile): Abtastintervall, Laufzeit-Limit, Abkühlzeit, max. Stacks
+PROFILER_INTERVAL_MS = float(os.getenv("PROFILER_INTERVAL_MS", "5"))
+PROFILER_MAX_SECONDS = float(os.getenv("PROFILER_MAX_SECONDS", "30"))
+PROFILER_COOLDOWN = float(os.getenv("PROFILER_COOLDOWN", "60"))
+PROFILER_MAX_STACKS = int(os.getenv("PROFILER_MAX_STACKS", "5000"))
+
+# Prefetch beim /twilio/voice-Webhook: Nachrichten + Zusammenfassung vor dem Stream-Start
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "true").lower() == "true"
+PREFETCH_TTL = float(os.getenv("PREFETCH_TTL", "30"))
+# Max. Prefetches pro Anrufer-Nummer bzw. Tenant je Zeitfenster (s); darüber ohne Prefetch
+PREFETCH_RATE_WINDOW = float(os.getenv("PREFETCH_RATE_WINDOW", "60"))
+PREFETCH_MAX_PER_CALLER = int(os.getenv("PREFETCH_MAX_PER_CALLER", "3"))
+PREFETCH_MAX_PER_TENANT = int(os.getenv("PREFETCH_MAX_PER_TENANT", "10"))
+
+# Abbau pro Anruf: max. Wartezeit auf abgebrochene Tasks, Leak-Prüfung nach Anrufende (s)
+CALL_TEARDOWN_TIMEOUT = float(os.getenv("CALL_TEARDOWN_TIMEOUT", "5"))
+CALL_LEAK_CHECK_DELAY = float(os.getenv("CALL_LEAK_CHECK_DELAY", "30"))
+
+# Gültigkeit der signierten <Stream>-Parameter ab dem Voice-Webhook (s)
+STREAM_SIGNATURE_TTL = float(os.getenv("STREAM_SIGNATURE_TTL", "60"))
+
+# Admin-Endpoints (/admin/*): Bearer-Token; leer = nur von localhost erreichbar
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
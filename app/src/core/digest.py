@@ -0,0 +1,158 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+
+from src.core.audio_utils import mp3_to_mulaw, mulaw_to_base64_chunks
+from src.core.config import DIGEST_DEBOUNCE, DIGEST_POLL_INTERVAL
+from src.core.metrics import metrics
+from src.core.scheduler import Priority, current_priority
+from src.models.telegramMessage import TelegramMessage
+
+logger = logging.getLogger(__name__)
+
+DIGEST_RENDERS = metrics.counter(
+    "digest_renders_total", "Vorgerenderte Zusammenfassungen (done, stale, failed)"
+)
+DIGEST_LOOKUPS = metrics.counter(
+    "digest_lookups_total", "Anrufe mit (hit) bzw. ohne (miss) passende vorgerenderte Zusammenfassung"
+)
+DIGEST_RENDER_SECONDS = metrics.histogram(
+    "digest_render_seconds", "Dauer Zusammenfassung + TTS + Transcoding im Hintergrund"
+)
+
+
+def digest_key(messages: list[TelegramMessage]) -> tuple:
+    """Identität einer Nachrichtenmenge (Text zählt mit, z.B. Transkript statt Platzhalter)."""
+    return tuple((m.update_id, m.text) for m in messages)
+
+
+@dataclass
+class Digest:
+    key: tuple
+    summary: str
+    chunks: list[str]  # Base64-mulaw-Frames, direkt sendbar
+    audio_bytes: int
+
+
+class DigestRenderer:
+    """Hält eine fertig gerenderte Zusammenfassung der ungelesenen Nachrichten bereit.
+
+    Pollt Telegram im Hintergrund (ohne Offset — nichts wird als gelesen
+    markiert). Ändert sich die Nachrichtenmenge, wird ein laufendes Rendering
+    verworfen; neu gerendert wird erst, wenn die Menge `debounce` Sekunden
+    stabil ist. Passt die Menge beim Anruf, spielt die Pipeline das Ergebnis
+    ohne Claude-, TTS- und Transcoding-Latenz ab.
+
+    Jedes Replica pollt und rendert jeden seiner gecachten Tenants selbst —
+    Telegram-Polls, Claude- und TTS-Kosten wachsen mit der Zahl der Replicas.
+    """
+
+    def __init__(
+        self,
+        services,
+        interval: float = DIGEST_POLL_INTERVAL,
+        debounce: float = DIGEST_DEBOUNCE,
+    ):
+        self.services = services
+        self.interval = interval
+        self.debounce = debounce
+        self.digest: Digest | None = None
+
+        self._latest_key: tuple = ()
+        self._changed_at = 0.0
+        self._render: asyncio.Task | None = None
+        self._render_key: tuple = ()
+
+    def covers(self, messages: list[TelegramMessage]) -> bool:
+        """Wie `match`, aber ohne Lookup-Metrik (z.B. für den Prefetch)."""
+        digest = self.digest
+        return digest is not None and bool(messages) and digest.key == digest_key(messages)
+
+    def match(self, messages: list[TelegramMessage]) -> Digest | None:
+        """Vorgerenderte Zusammenfassung, falls sie genau diese Nachrichten abdeckt."""
+        if self.covers(messages):
+            DIGEST_LOOKUPS.inc(result="hit")
+            return self.digest
+        DIGEST_LOOKUPS.inc(result="miss")
+        return None
+
+    async def watch(self):
+        """Poll-Schleife; läuft, bis der Task abgebrochen wird."""
+        current_priority.set(Priority.BACKGROUND)
+        try:
+            while True:
+                try:
+                    await self.poll()
+                except Exception as e:
+                    logger.warning(f"Digest poll failed for '{self.services.tenant}': {e!r}")
+                await asyncio.sleep(self.interval)
+        finally:
+            self._cancel_render()
+
+    async def poll(self):
+        """Ein Poll-Schritt: Änderung erkennen, entprellen, Rendering anstoßen."""
+        services = self.services
+        messages = await services.telegram.get_messages()
+        if messages is None:
+            # Telegram-Fehler ist keine leere Mailbox — Digest behalten, nächster Poll
+            return
+        if services.voice_notes:
+            # Im Hintergrund darf die Transkription dauern
+            await services.voice_notes.transcribe(messages, services, timeout=self.interval)
+
+        key = digest_key(messages)
+        now = time.monotonic()
+        if key != self._latest_key:
+            self._latest_key, self._changed_at = key, now
+            self._cancel_render()
+            if not messages:
+                self.digest = None
+            return
+
+        if not messages or (self.digest and self.digest.key == key):
+            return
+        if self._render is not None and self._render_key == key:
+            return
+        if now - self._changed_at >= self.debounce:
+            self._render_key = key
+            self._render = asyncio.create_task(self._render_digest(key, messages))
+
+    async def _render_digest(self, key: tuple, messages: list[TelegramMessage]):
+        started = time.monotonic()
+        try:
+            summary = await self.services.llm.summarize(messages)
+            mp3_bytes = await self.services.tts.synthesize(summary)
+            mulaw = await asyncio.to_thread(mp3_to_mulaw, mp3_bytes) if mp3_bytes else b""
+            if not mulaw:
+                DIGEST_RENDERS.inc(result="failed")
+                return
+            if key != self._latest_key:
+                DIGEST_RENDERS.inc(result="stale")
+                return
+            self.digest = Digest(
+                key=key,
+                summary=summary,
+                chunks=mulaw_to_base64_chunks(mulaw),
+                audio_bytes=len(mulaw),
+            )
+            DIGEST_RENDERS.inc(result="done")
+            DIGEST_RENDER_SECONDS.observe(time.monotonic() - started)
+            logger.info(
+                f"Digest ready for '{self.services.tenant}': {len(messages)} messages, "
+                f"{len(mulaw)} mulaw bytes"
+            )
+        except asyncio.CancelledError:
+            DIGEST_RENDERS.inc(result="stale")
+            raise
+        except Exception as e:
+            DIGEST_RENDERS.inc(result="failed")
+            logger.warning(f"Digest render failed for '{self.services.tenant}': {e!r}")
+        finally:
+            if self._render is asyncio.current_task():
+                self._render = None
+
+    def _cancel_render(self):
+        if self._render is not None:
+            self._render.cancel()
+            self._render = None
@@ -0,0 +1,169 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable
+from typing import TypeVar
+
+from src.core.config import (
+    ADAPTIVE_TIMEOUT_FACTOR,
+    ADAPTIVE_TIMEOUT_MIN,
+    LATENCY_MIN_SAMPLES,
+    LATENCY_WINDOW,
+)
+from src.core.metrics import metrics
+from src.core.scheduler import UpstreamScheduler
+from src.core.supervisor import spawn
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+TIMEOUT_SECONDS = metrics.gauge(
+    "upstream_timeout_seconds", "Aktueller adaptiver Timeout pro Upstream"
+)
+LATENCY_P95_SECONDS = metrics.gauge(
+    "upstream_latency_p95_seconds", "p95 der beobachteten Upstream-Latenz"
+)
+HEDGE_TOTAL = metrics.counter("upstream_hedge_total", "Ausgelöste Hedge-Requests")
+HEDGE_WINS = metrics.counter(
+    "upstream_hedge_wins_total", "Hedge-Requests, die vor dem Original fertig wurden"
+)
+
+
+class LatencyTracker:
+    """Gleitendes Latenzfenster eines Upstreams mit adaptivem Timeout.
+
+    Solange zu wenige Messungen vorliegen, gilt der statische Timeout aus der
+    Konfiguration; danach `p99 × Faktor`, begrenzt auf [Minimum, statisch].
+    `scale` normiert Latenzen auf die Auftragsgröße (z.B. Textlänge bei TTS).
+    """
+
+    def __init__(
+        self,
+        upstream: str,
+        static_timeout: float,
+        window: int = LATENCY_WINDOW,
+        min_samples: int = LATENCY_MIN_SAMPLES,
+    ):
+        self.upstream = upstream
+        self.static_timeout = static_timeout
+        self.min_samples = min_samples
+        self._samples: deque[float] = deque(maxlen=window)
+        TIMEOUT_SECONDS.set(static_timeout, upstream=upstream)
+
+    def observe(self, seconds: float, scale: float = 1.0):
+        self._samples.append(seconds / scale)
+        if len(self._samples) >= self.min_samples:
+            LATENCY_P95_SECONDS.set(self.percentile(95), upstream=self.upstream)  # type: ignore
+            TIMEOUT_SECONDS.set(self.timeout(), upstream=self.upstream)
+
+    def percentile(self, pct: float) -> float | None:
+        if len(self._samples) < self.min_samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+    def timeout(self, scale: float = 1.0) -> float:
+        p99 = self.percentile(99)
+        if p99 is None:
+            return self.static_timeout
+        adaptive = p99 * scale * ADAPTIVE_TIMEOUT_FACTOR
+        return min(self.static_timeout, max(ADAPTIVE_TIMEOUT_MIN, adaptive))
+
+    def hedge_delay(self, scale: float = 1.0) -> float | None:
+        p95 = self.percentile(95)
+        return None if p95 is None else p95 * scale
+
+
+_trackers: dict[str, LatencyTracker] = {}
+
+
+def get_tracker(upstream: str, static_timeout: float) -> LatencyTracker:
+    """Prozessweiter Tracker pro Upstream (geteilt über alle Service-Instanzen)."""
+    if upstream not in _trackers:
+        _trackers[upstream] = LatencyTracker(upstream, static_timeout)
+    return _trackers[upstream]
+
+
+async def with_timeout(
+    tracker: LatencyTracker,
+    attempt: Callable[[], Awaitable[T]],
+    on_timeout: T,
+    scale: float = 1.0,
+) -> T:
+    """Führt einen Versuch mit adaptivem Timeout aus und misst seine Latenz."""
+    timeout = tracker.timeout(scale)
+    started = time.monotonic()
+    try:
+        result = await asyncio.wait_for(attempt(), timeout=timeout)
+    except asyncio.TimeoutError:
+        logger.error(f"{tracker.upstream} timeout nach {timeout:.1f}s")
+        # Zensierte Messung: hält das Perzentil oben, solange der Upstream hängt
+        tracker.observe(timeout, scale)
+        return on_timeout
+    tracker.observe(time.monotonic() - started, scale)
+    return result
+
+
+async def hedged(
+    tracker: LatencyTracker,
+    attempt: Callable[[], Awaitable[T]],
+    succeeded: Callable[[T], bool],
+    scheduler: UpstreamScheduler | None = None,
+    enabled: bool = True,
+    scale: float = 1.0,
+    upstream: str | None = None,
+) -> T:
+    """Startet nach p95 ohne Antwort einen Duplikat-Request; der erste Erfolg gewinnt.
+
+    Der Duplikat-Request belegt — falls vorhanden — einen zusätzlichen
+    Scheduler-Slot (`upstream`, Standard: der des Trackers) und wird nur
+    ausgelöst, wenn sofort einer frei ist.
+    """
+    upstream = upstream or tracker.upstream
+    delay = tracker.hedge_delay(scale) if enabled else None
+    primary = spawn(attempt())
+    if delay is None:
+        return await primary
+
+    try:
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+    except asyncio.CancelledError:
+        # asyncio.wait reicht den Abbruch nicht weiter — primary liefe sonst ohne Aufrufer
+        primary.cancel()
+        await asyncio.gather(primary, return_exceptions=True)
+        raise
+    if done:
+        return primary.result()
+
+    if scheduler and not scheduler.try_acquire(upstream):
+        return await primary
+
+    HEDGE_TOTAL.inc(upstream=tracker.upstream)
+    logger.info(f"Hedging {tracker.upstream} request after {delay * 1000:.0f} ms")
+    hedge = spawn(attempt())
+    pending = {primary, hedge}
+    result: T | None = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                # von außen abgebrochen: exception() würde selbst CancelledError werfen
+                if task.cancelled() or task.exception() is not None:
+                    continue
+                result = task.result()
+                if succeeded(result):
+                    if task is hedge:
+                        HEDGE_WINS.inc(upstream=tracker.upstream)
+                    return result
+        if result is None:
+            return primary.result()
+        return result
+    finally:
+        for task in pending:
+            task.cancel()
+        # Verlierer abwarten: hält sonst Verbindung und Slot über das Ergebnis hinaus
+        await asyncio.gather(*pending, return_exceptions=True)
+        if scheduler:
+            scheduler.release(upstream)
@@ -0,0 +1,84 @@
+import logging
+
+from src.core.config import (
+    ANTHROPIC_TIMEOUT,
+    LLM_HEDGE_MAX_TOKENS,
+    ROUTER_FAST_MAX_MESSAGES,
+    ROUTER_FAST_MAX_QUESTION_CHARS,
+    ROUTER_LATENCY_BUDGET,
+)
+from src.core.latency import LatencyTracker, get_tracker
+from src.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+FAST = "fast"
+STRONG = "strong"
+
+ROUTE_TOTAL = metrics.counter("llm_route_total", "LLM-Anfragen pro Route (fast, strong)")
+ROUTE_LATENCY_SECONDS = metrics.histogram(
+    "llm_route_latency_seconds", "Latenz der LLM-Anfragen pro Route"
+)
+ROUTE_FALLBACK_TOTAL = metrics.counter(
+    "llm_route_fallback_total", "Fehlgeschlagene Anfragen, die auf das starke Modell ausweichen"
+)
+
+
+def token_scale(max_tokens: int) -> float:
+    """Normiert LLM-Latenzen auf die Antwortlänge (Basis: kurze Rückfrage-Antwort)."""
+    return max(1.0, max_tokens / LLM_HEDGE_MAX_TOKENS)
+
+
+class ModelRouter:
+    """Wählt pro Anfrage zwischen schnellem und starkem Claude-Modell.
+
+    Kleine Backlogs und kurze Fragen gehen an das schnelle Modell — außer
+    das starke Modell hält das Latenzbudget ohnehin ein. Schlägt das
+    schnelle Modell fehl, wird einmal auf das starke ausgewichen.
+    """
+
+    def __init__(
+        self,
+        strong_model: str,
+        fast_model: str = "",
+        max_messages: int = ROUTER_FAST_MAX_MESSAGES,
+        max_question_chars: int = ROUTER_FAST_MAX_QUESTION_CHARS,
+        latency_budget: float = ROUTER_LATENCY_BUDGET,
+    ):
+        self.models = {STRONG: strong_model}
+        if fast_model and fast_model != strong_model:
+            self.models[FAST] = fast_model
+        self.max_messages = max_messages
+        self.max_question_chars = max_question_chars
+        self.latency_budget = latency_budget
+        # Prozessweit pro Route, damit adaptive Timeouts pro Modell gelten
+        self.latency: dict[str, LatencyTracker] = {
+            name: get_tracker(f"llm_{name}", static_timeout=ANTHROPIC_TIMEOUT)
+            for name in self.models
+        }
+
+    def route(self, n_messages: int, max_tokens: int, question: str = "") -> str:
+        name = self._choose(n_messages, max_tokens, question)
+        ROUTE_TOTAL.inc(route=name)
+        return name
+
+    def fallback(self, name: str) -> str | None:
+        """Route für einen zweiten Versuch, falls `name` kein Ergebnis lieferte."""
+        if name != FAST:
+            return None
+        ROUTE_FALLBACK_TOTAL.inc(route=name)
+        logger.warning(f"Fast model failed, falling back to {self.models[STRONG]}")
+        return STRONG
+
+    def observe(self, name: str, seconds: float):
+        ROUTE_LATENCY_SECONDS.observe(seconds, route=name)
+
+    def _choose(self, n_messages: int, max_tokens: int, question: str) -> str:
+        if FAST not in self.models:
+            return STRONG
+        if n_messages > self.max_messages or len(question) > self.max_question_chars:
+            return STRONG
+        strong_p95 = self.latency[STRONG].percentile(95)
+        if strong_p95 is not None and strong_p95 * token_scale(max_tokens) <= self.latency_budget:
+            return STRONG
+        return FAST
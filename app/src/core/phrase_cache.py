@@ -0,0 +1,41 @@
+import asyncio
+import logging
+
+from src.core.audio_utils import mp3_to_mulaw
+from src.core.scheduler import Priority, current_priority
+from src.service.tts_service import TTSService
+
+logger = logging.getLogger(__name__)
+
+
+class PhraseCache:
+    """Vorgerenderte mulaw-Audios für statische Ansagen.
+
+    Wird beim Start einmalig befüllt; danach kosten diese Ansagen weder
+    TTS-Aufrufe noch Transcoding — auch nicht unter Überlast.
+    """
+
+    def __init__(self):
+        self._audio: dict[str, bytes | memoryview] = {}
+
+    def get(self, text: str) -> bytes | memoryview | None:
+        return self._audio.get(text)
+
+    async def warm(self, tts: TTSService, phrases: list[str]):
+        """Rendert alle Ansagen parallel (Hintergrund-Priorität)."""
+        current_priority.set(Priority.BACKGROUND)
+        results = await asyncio.gather(
+            *(self._render(tts, text) for text in phrases), return_exceptions=True
+        )
+        for text, result in zip(phrases, results):
+            if isinstance(result, Exception) or not result:
+                logger.warning(f"Failed to pre-render phrase: '{text[:40]}'")
+                continue
+            self._audio[text] = result
+        logger.info(f"Pre-rendered {len(self._audio)}/{len(phrases)} phrases")
+
+    @staticmethod
+    async def _render(tts: TTSService, text: str) -> bytes | memoryview:
+        mp3_bytes = await tts.synthesize(text)
+        # ffmpeg-Subprozess blockiert — im Thread, sonst stehen laufende Anrufe
+        return await asyncio.to_thread(mp3_to_mulaw, mp3_bytes) if mp3_bytes else b""
@@ -2,12 +2,38 @@ import asyncio
 import base64
 import json
 import logging
+import time
 
-import websockets
-from fastapi import WebSocket
+from websockets.exceptions import WebSocketException
 
-from src.core.audio_utils import mp3_to_mulaw, mulaw_to_base64_chunks
+from src.core.audio_utils import mp3_to_mulaw
+from src.core.call_memory import (
+    CALL_MEMORY_BYTES,
+    AudioQueue,
+    history_bytes,
+    message_bytes,
+    trim_to_budget,
+)
+from src.core.config import (
+    AUDIO_QUEUE_MAX_FRAMES,
+    CALL_HISTORY_MAX_TURNS,
+    CALL_MEMORY_BUDGET_BYTES,
+    SPECULATION_ENABLED,
+    SPECULATION_TTS,
+    VAD_ENABLED,
+)
+from src.core.metrics import metrics
+from src.core.prefetch import Prefetch, fetch_messages
+from src.core.profiler import tag_task
+from src.core.prompt_builder import PromptStats, current_prompt_stats
+from src.core.scheduler import Overloaded, Priority, current_priority
 from src.core.service_provider import ServiceProvider
+from src.core.speculation import SpeculativeExecutor
+from src.core.supervisor import CallSupervisor, current_supervisor
+from src.core.trace import record
+from src.core.transport import CallTransport
+from src.core.vad import VoiceActivityDetector
+from src.models.telegramMessage import TelegramMessage
 
 logger = logging.getLogger(__name__)
 
@@ -17,40 +43,128 @@ GREETING = (
 )
 GOODBYE_MSG = "Auf Wiedersehen! Ich wünsche dir einen schönen Tag."
 ERROR_MSG = "Es tut mir leid, es ist ein Fehler aufgetreten."
+BUSY_MSG = (
+    "Es tut mir leid, gerade sind alle Leitungen ausgelastet. "
+    "Bitte später erneut anrufen."
+)
+NO_MORE_MESSAGES_MSG = "Keine weiteren Nachrichten."
 GOODBYE_WORDS = ["tschüss", "danke", "auf wiedersehen", "bye", "ciao", "ende"]
 
+# Tastenkürzel (Twilio-DTMF) — ohne STT und ohne Claude
+KEYMAP = {"1": "repeat", "2": "next", "3": "skip", "#": "hangup"}
+
+# Ansagen, die beim Start vorgerendert werden (siehe PhraseCache)
+STATIC_PHRASES = [GREETING, GOODBYE_MSG, ERROR_MSG, BUSY_MSG, NO_MORE_MESSAGES_MSG]
+
+# Deepgram schließt Streams nach ~10 s ohne Audio — während Stille KeepAlive senden
+DEEPGRAM_KEEPALIVE_INTERVAL = 5.0
+
+# Max. Wartezeit auf das Ende der Verabschiedung, bevor aufgelegt wird
+HANGUP_PLAYBACK_TIMEOUT = 10.0
+
+KEYPRESS_TOTAL = metrics.counter("dtmf_keypress_total", "Tastendrücke nach Aktion")
+
 
 class Pipeline:
     """Orchestriert den Anruf-Flow: Begrüßung → Zusammenfassung → Rückfragen."""
 
-    def __init__(self, ws: WebSocket, stream_sid: str, services: ServiceProvider):
-        self.ws = ws
-        self.stream_sid = stream_sid
+    def __init__(
+        self,
+        transport: CallTransport,
+        services: ServiceProvider,
+        memory_budget: int = CALL_MEMORY_BUDGET_BYTES,
+        prefetch: Prefetch | None = None,
+        supervisor: CallSupervisor | None = None,
+    ):
+        self.transport = transport
+        self.stream_sid = transport.sid
         self.services = services
-
-        self.audio_queue: asyncio.Queue[bytes | None] = asyncio.Queue()
+        self.memory_budget = memory_budget
+        # Alle Tasks, Deepgram-Sockets und Queues des Anrufs; abgebaut vom Besitzer (aclose)
+        self.supervisor = supervisor or CallSupervisor(self.stream_sid)
+        # Abruf + Zusammenfassung, gestartet beim Voice-Webhook (siehe CallPrefetcher)
+        self.prefetch = prefetch
+        if prefetch:
+            self.supervisor.adopt(prefetch.messages)
+            self.supervisor.adopt(prefetch.summary)
+
+        self.audio_queue = AudioQueue(maxsize=AUDIO_QUEUE_MAX_FRAMES)
         self.conversation_history: list[dict] = []
-        self.messages = []
+        self.messages: list[TelegramMessage] = []
+        self._utterances = 0
+
+        # Tastensteuerung: Aktionen, zuletzt gespieltes Audio, vorgerenderte Einzelnachrichten
+        self._keys: asyncio.Queue[str] = asyncio.Queue()
+        self._output = asyncio.Lock()
+        self._last_played: tuple[bytes | memoryview | list[str], int] | None = None
+        self._messages_ready = False
+        self._message_index = -1
+        self._message_audio: dict[int, asyncio.Task] = {}
+        self._summary_task: asyncio.Task | None = None
+        self._skip_summary = False
+        self._hangup = False
+        transport.bind(self.audio_queue.put_latest, self.press)
+        self.supervisor.register(self.audio_queue, "queue")
+        self.supervisor.register(self._keys, "queue")
 
     def feed_audio(self, payload: str):
-        """Empfängt Base64-kodierten mulaw-Audio vom WebSocket."""
-        self.audio_queue.put_nowait(base64.b64decode(payload))
+        """Empfängt Base64-kodierten mulaw-Audio (Twilio- bzw. Trace-Format)."""
+        self.audio_queue.put_latest(base64.b64decode(payload))
+
+    def press(self, digit: str):
+        """Tastendruck (DTMF) — wird sofort im Key-Handler des Anrufs ausgeführt."""
+        if action := KEYMAP.get(digit):
+            KEYPRESS_TOTAL.inc(action=action)
+            self._keys.put_nowait(action)
+
+    def memory_usage(self) -> dict[str, int]:
+        """Geschätzter Speicher des Anruf-Zustands in Bytes."""
+        last = self._last_played[1] if self._last_played else 0
+        usage = {
+            "audio_queue": self.audio_queue.nbytes,
+            "messages": sum(map(message_bytes, self.messages)),
+            "history": sum(map(history_bytes, self.conversation_history)),
+            "playback": last + sum(
+                len(t.result()) for t in self._message_audio.values()
+                if t.done() and not t.cancelled() and t.exception() is None
+            ),
+        }
+        usage["total"] = sum(usage.values())
+        return usage
 
     # ── Haupt-Flow ──
 
     async def run(self):
         """Kern-Flow: Begrüßung → Nachrichten → Zusammenfassung → Rückfragen."""
+        current_priority.set(Priority.FIRST_AUDIO)
+        current_supervisor.set(self.supervisor)
+        self._main = asyncio.current_task()
+        prompt_stats = PromptStats()
+        current_prompt_stats.set(prompt_stats)
+        self._stage("greeting")
+        keys = self.supervisor.spawn(self._handle_keys())
+        # Abruf (inkl. Sprachnachrichten) läuft schon während der Begrüßung —
+        # oder seit dem Webhook, wenn ein Prefetch übergeben wurde
+        if self.prefetch:
+            fetch = self.prefetch.messages
+            self._stage("fetch", fetch)
+        else:
+            fetch = self.supervisor.spawn(self._fetch_messages())
         try:
-            await self.speak(GREETING)
-
-            logger.info("Fetching Telegram messages...")
-            self.messages = await self.services.telegram.get_messages()
-
-            logger.info("Summarizing messages with Claude...")
-            summary = await self.services.llm.summarize(self.messages)
-            logger.info(f"Summary: {summary}")
-
-            await self.speak(summary)
+            try:
+                await self.speak(GREETING)
+                self.messages = await fetch
+            finally:
+                fetch.cancel()
+            self._messages_ready = True
+            # Taste 2 spielt nur fertiges Audio — die erste Nachricht schon jetzt rendern
+            self._prefetch_message(0)
+
+            self._stage("summary")
+            if self._skip_summary:
+                logger.info("Summary skipped via keypad")
+            else:
+                await self._summary_phase()
 
             if self.messages:
                 last_update_id = self.messages[-1].update_id
@@ -59,43 +173,127 @@ class Pipeline:
                 except Exception as e:
                     logger.warning(f"Failed to acknowledge messages: {e}")
 
+            count = len(self.messages)
+            self._enforce_memory_budget()
+            if len(self.messages) < count:
+                self._reset_message_audio()  # "Nachricht 1 von N" stimmt nicht mehr
+            current_priority.set(Priority.FOLLOWUP)
             await self._listen_loop()
+            await self._end_call()
 
         except asyncio.CancelledError:
-            logger.info("Pipeline cancelled (call ended)")
+            if self._hangup:
+                await self._end_call()
+            else:
+                logger.info("Pipeline cancelled (call ended)")
+        except Overloaded as e:
+            logger.warning(f"Shedding call {self.stream_sid}: {e}")
+            try:
+                await self.speak(BUSY_MSG)
+            except Overloaded:
+                logger.error("Busy message not pre-rendered, ending call silently")
         except Exception as e:
             logger.error(f"Pipeline error: {e}", exc_info=True)
             try:
                 await self.speak(ERROR_MSG)
             except Exception:
                 logger.error("Failed to speak error message")
+        finally:
+            keys.cancel()
+            if self.prefetch:
+                self.prefetch.cancel()
+            for task in self._message_audio.values():
+                task.cancel()
+            CALL_MEMORY_BYTES.observe(self.memory_usage()["total"])
+            prompt_stats.report()
+
+    async def _summary_phase(self):
+        """Zusammenfassung als eigener Task — Taste 3 bricht sie ab."""
+        self._summary_task = self.supervisor.spawn(self._speak_summary())
+        try:
+            await asyncio.wait([self._summary_task])
+        finally:
+            self._summary_task.cancel()
+        if self._summary_task.cancelled():
+            logger.info("Summary skipped via keypad")
+        else:
+            self._summary_task.result()  # Fehler (z.B. Overloaded) weiterreichen
+
+    async def _speak_summary(self):
+        digest = self.services.digest.match(self.messages) if self.services.digest else None
+        if digest is not None:
+            logger.info(f"Playing pre-rendered digest: {digest.summary}")
+            await self._send_chunks(digest.chunks, digest.audio_bytes)
+        else:
+            summary = await self.prefetch.summary if self.prefetch else None
+            if summary is None:
+                logger.info("Summarizing messages with Claude...")
+                summary = await self.services.llm.summarize(self.messages)
+            else:
+                logger.info("Using prefetched summary")
+            logger.info(f"Summary: {summary}")
+            await self.speak(summary)
+
+    async def _fetch_messages(self) -> list[TelegramMessage]:
+        """Lädt neue Nachrichten, transkribiert Sprachnachrichten und archiviert."""
+        self._stage("fetch")
+        return await fetch_messages(self.services)
 
     async def _listen_loop(self):
         """Hört auf Anrufer-Fragen und beantwortet sie per Claude."""
         logger.info("Entering listen loop for follow-up questions...")
 
         while True:
-            transcript = await self._listen_for_utterance()
+            self._stage("listen")
+            speculation = (
+                SpeculativeExecutor(self._prepare_answer) if SPECULATION_ENABLED else None
+            )
+            transcript = await self._listen_for_utterance(speculation)
             if not transcript:
+                if speculation:
+                    speculation.cancel()
                 continue
 
             logger.info(f"Caller said: {transcript}")
+            self._stage("answer")
 
             if any(word in transcript.lower() for word in GOODBYE_WORDS):
+                if speculation:
+                    speculation.cancel()
                 await self.speak(GOODBYE_MSG)
                 break
 
-            answer = await self.services.llm.answer_followup(
-                question=transcript,
-                messages=self.messages,
-                conversation_history=self.conversation_history,
-            )
+            prepared = await speculation.resolve(transcript) if speculation else None
+            if prepared is None:
+                prepared = await self._prepare_answer(transcript)
+
+            answer, mulaw_bytes = prepared
+            self.conversation_history.append({"role": "user", "content": transcript})
+            self.conversation_history.append({"role": "assistant", "content": answer})
+            del self.conversation_history[: -2 * CALL_HISTORY_MAX_TURNS]
+            self._enforce_memory_budget()
             logger.info(f"Claude answer: {answer}")
-            await self.speak(answer)
+
+            if mulaw_bytes is None:
+                mulaw_bytes = await self._render(answer)
+            if mulaw_bytes:
+                await self._send_audio(mulaw_bytes)
+
+    async def _prepare_answer(self, question: str) -> tuple[str, bytes | None]:
+        """Erzeugt die Antwort (und optional das Audio), ohne den Verlauf zu ändern."""
+        answer = await self.services.llm.draft_followup(
+            question=question,
+            messages=await self._followup_context(question),
+            conversation_history=self.conversation_history,
+        )
+        mulaw_bytes = await self._render(answer) if SPECULATION_TTS else None
+        return answer, mulaw_bytes
 
     # ── STT (Deepgram Streaming) ──
 
-    async def _listen_for_utterance(self) -> str:
+    async def _listen_for_utterance(
+        self, speculation: SpeculativeExecutor | None = None
+    ) -> str:
         """Streamt Audio an Deepgram und wartet auf eine vollständige Äußerung."""
         self._flush_audio_queue()
         transcript_parts: list[str] = []
@@ -109,20 +307,30 @@ class Pipeline:
         try:
             async with dg_ctx as dg_ws:
                 logger.info("Deepgram streaming connection established")
-                await self._stream_and_transcribe(dg_ws, transcript_parts)
-        except websockets.exceptions.WebSocketException as e:
+                self.supervisor.register(dg_ws, "socket", close=True)
+                await self._stream_and_transcribe(dg_ws, transcript_parts, speculation)
+        except WebSocketException as e:
             logger.error(f"Deepgram WebSocket error: {e}")
+        except Overloaded:
+            raise
         except Exception as e:
             logger.error(f"listen_for_utterance error: {e}", exc_info=True)
 
         return " ".join(transcript_parts)
 
-    async def _stream_and_transcribe(self, dg_ws, transcript_parts: list[str]):
+    async def _stream_and_transcribe(
+        self,
+        dg_ws,
+        transcript_parts: list[str],
+        speculation: SpeculativeExecutor | None = None,
+    ):
         """Startet Forward- und Receive-Tasks parallel, wartet auf erstes Ergebnis."""
-        forward_task = asyncio.create_task(self._forward_audio(dg_ws))
-        receive_task = asyncio.create_task(
-            self._receive_transcript(dg_ws, transcript_parts)
+        forward_task = self.supervisor.spawn(self._forward_audio(dg_ws))
+        receive_task = self.supervisor.spawn(
+            self._receive_transcript(dg_ws, transcript_parts, speculation)
         )
+        self._stage("stt", forward_task)
+        self._stage("stt", receive_task)
 
         _, pending = await asyncio.wait(
             [forward_task, receive_task],
@@ -130,30 +338,66 @@ class Pipeline:
         )
         for task in pending:
             task.cancel()
+        if pending:
+            # Abgebrochene Tasks abwarten, bevor `async with` den Socket schließt
+            await asyncio.wait(pending)
 
     async def _forward_audio(self, dg_ws):
-        """Leitet Audio-Chunks aus der Queue an Deepgram weiter."""
+        """Leitet Sprach-Chunks aus der Queue an Deepgram weiter (lokale VAD)."""
+        vad = VoiceActivityDetector() if VAD_ENABLED else None
         chunks_sent = 0
+        last_send = time.monotonic()
         try:
             while True:
                 chunk = await asyncio.wait_for(self.audio_queue.get(), timeout=15.0)
                 if chunk is None:
                     break
-                await dg_ws.send(chunk)
-                chunks_sent += 1
-                if chunks_sent % 50 == 0:
-                    logger.info(f"Forwarded {chunks_sent} chunks to Deepgram")
+
+                if vad is None:
+                    await dg_ws.send(chunk)
+                    chunks_sent += 1
+                    continue
+
+                result = vad.process(chunk)
+                if result.audio:
+                    await dg_ws.send(result.audio)
+                    chunks_sent += 1
+                    last_send = time.monotonic()
+                    if chunks_sent % 50 == 0:
+                        logger.info(f"Forwarded {chunks_sent} chunks to Deepgram")
+                elif time.monotonic() - last_send > DEEPGRAM_KEEPALIVE_INTERVAL:
+                    await dg_ws.send(json.dumps({"type": "KeepAlive"}))
+                    last_send = time.monotonic()
+
+                if result.end_of_utterance:
+                    logger.info("VAD: end of utterance, finalizing Deepgram stream")
+                    await dg_ws.send(json.dumps({"type": "Finalize"}))
         except (asyncio.TimeoutError, asyncio.CancelledError):
             pass
         finally:
-            logger.info(f"Forward audio done. Total: {chunks_sent}")
+            if vad is not None:
+                logger.info(
+                    f"Forward audio done. Total: {chunks_sent} "
+                    f"(VAD forwarded {vad.frames_out}/{vad.frames_in} frames)"
+                )
+            else:
+                logger.info(f"Forward audio done. Total: {chunks_sent}")
             try:
                 await dg_ws.send(json.dumps({"type": "CloseStream"}))
             except Exception:
                 pass
 
-    async def _receive_transcript(self, dg_ws, transcript_parts: list[str]):
-        """Empfängt Deepgram-Ergebnisse und sammelt finale Transkripte."""
+    async def _receive_transcript(
+        self,
+        dg_ws,
+        transcript_parts: list[str],
+        speculation: SpeculativeExecutor | None = None,
+    ):
+        """Empfängt Deepgram-Ergebnisse und sammelt finale Transkripte.
+
+        Interim-Ergebnisse werden an die Spekulation gemeldet, damit die
+        Antwort bereits vor dem finalen Transkript vorbereitet werden kann.
+        """
         async for msg in dg_ws:
             data = json.loads(msg)
 
@@ -163,15 +407,23 @@ class Pipeline:
                 is_final = data.get("is_final", False)
                 speech_final = data.get("speech_final", False)
 
+                if not is_final:
+                    logger.debug(f"DG interim: text='{text}'")
+                    if speculation and text.strip():
+                        speculation.observe(" ".join([*transcript_parts, text.strip()]))
+                    continue
+
                 logger.info(
                     f"DG: is_final={is_final}, speech_final={speech_final}, "
                     f"text='{text}'"
                 )
 
-                if is_final and text.strip():
+                if text.strip():
                     transcript_parts.append(text.strip())
+                    if speculation:
+                        speculation.observe(" ".join(transcript_parts))
 
-                if (speech_final or is_final) and transcript_parts:
+                if transcript_parts:
                     return
 
             elif data.get("type") == "UtteranceEnd":
@@ -182,32 +434,178 @@ class Pipeline:
 
     async def speak(self, text: str):
         """Wandelt Text in Sprache und sendet es über den Twilio WebSocket."""
-        mp3_bytes = await self.services.tts.synthesize(text)
-        if not mp3_bytes:
-            return
-
-        mulaw_bytes = mp3_to_mulaw(mp3_bytes)
+        mulaw_bytes = await self._render(text)
         if not mulaw_bytes:
             return
 
         await self._send_audio(mulaw_bytes)
 
-    async def _send_audio(self, mulaw_bytes: bytes):
-        """Sendet mulaw-Audio in Chunks über den Twilio WebSocket."""
-        chunks = mulaw_to_base64_chunks(mulaw_bytes)
-        logger.info(f"Sending {len(chunks)} audio chunks to Twilio")
+    async def _render(self, text: str) -> bytes | memoryview:
+        """Synthetisiert Text und konvertiert ihn zu mulaw 8 kHz."""
+        if (cached := self.services.phrases.get(text)) is not None:
+            return cached
 
-        for chunk in chunks:
-            await self.ws.send_json({
-                "event": "media",
-                "streamSid": self.stream_sid,
-                "media": {"payload": chunk},
-            })
+        mp3_bytes = await self.services.tts.synthesize(text)
+        if not mp3_bytes:
+            return b""
+
+        # ffmpeg-Decode blockiert bis zum Ende — im Thread, damit andere Anrufe weiterlaufen
+        return await asyncio.to_thread(mp3_to_mulaw, mp3_bytes)
+
+    async def _send_audio(self, mulaw_bytes: bytes | memoryview, interrupt: bool = False):
+        """Sendet mulaw-Audio über den Transport und markiert das Ende der Äußerung."""
+        async with self._output:
+            if interrupt:
+                await self.transport.clear()
+            record("out", n=len(mulaw_bytes))
+            await self.transport.send_audio(mulaw_bytes)
+            await self._mark()
+            self._last_played = (mulaw_bytes, len(mulaw_bytes))
+
+    async def _send_chunks(self, chunks: list[str], n_bytes: int, interrupt: bool = False):
+        """Sendet bereits Base64-kodierte mulaw-Frames (z.B. vorgerenderte Zusammenfassung)."""
+        async with self._output:
+            if interrupt:
+                await self.transport.clear()
+            record("out", n=n_bytes)
+            await self.transport.send_frames(chunks, n_bytes)
+            await self._mark()
+            self._last_played = (chunks, n_bytes)
+
+    async def _mark(self):
+        self._utterances += 1
+        await self.transport.mark(f"utterance-{self._utterances}")
+
+    # ── Tastensteuerung (DTMF) ──
+
+    async def _handle_keys(self):
+        """Führt Tastendrücke aus: nur gecachtes Audio, aktuelle Wiedergabe wird verworfen."""
+        while True:
+            action = await self._keys.get()
+            started = time.monotonic()
+            try:
+                if action == "repeat":
+                    await self._repeat()
+                elif action == "next":
+                    await self._play_next_message()
+                elif action == "skip":
+                    await self._skip()
+                elif action == "hangup":
+                    await self._hang_up()
+                    return
+            except Exception as e:
+                logger.warning(f"Keypad action '{action}' failed: {e!r}")
+            logger.info(f"Keypad '{action}' handled in {(time.monotonic() - started) * 1000:.0f} ms")
+
+    async def _repeat(self):
+        if self._last_played is None:
+            return
+        audio, n_bytes = self._last_played
+        if isinstance(audio, list):
+            await self._send_chunks(audio, n_bytes, interrupt=True)
+        else:
+            await self._send_audio(audio, interrupt=True)
+
+    async def _play_next_message(self):
+        index = self._message_index + 1
+        if self._messages_ready and index >= len(self.messages):
+            await self._send_audio(await self._render(NO_MORE_MESSAGES_MSG), interrupt=True)
+            return
+        task = self._message_audio.get(index)
+        if task is None or not task.done():
+            # Kein Live-TTS im Tasten-Handler — sonst blockiert er auch "#"
+            logger.info(f"Message {index + 1} not rendered yet, ignoring keypress")
+            return
+        self._message_index = index
+        self._suppress_summary()
+        # Nächste Nachricht schon rendern, ältere freigeben
+        self._prefetch_message(index + 1)
+        for old in [i for i in self._message_audio if i < index]:
+            self._message_audio.pop(old).cancel()
+        if audio := task.result():
+            await self._send_audio(audio, interrupt=True)
+
+    def _prefetch_message(self, index: int):
+        """Rendert eine Einzelnachricht im Hintergrund vor (höchstens einmal)."""
+        if index >= len(self.messages) or index in self._message_audio:
+            return
+        message = self.messages[index]
+        text = (
+            f"Nachricht {index + 1} von {len(self.messages)}, "
+            f"von {message.sender} um {message.clock_time()}: {message.text}"
+        )
+        self._message_audio[index] = self.supervisor.spawn(self._render_background(text))
 
-        await asyncio.sleep(0.1)
+    def _reset_message_audio(self):
+        for task in self._message_audio.values():
+            task.cancel()
+        self._message_audio.clear()
+        self._message_index = -1
+        self._prefetch_message(0)
+
+    async def _render_background(self, text: str) -> bytes | memoryview:
+        current_priority.set(Priority.BACKGROUND)
+        return await self._render(text)
+
+    async def _skip(self):
+        self._suppress_summary()
+        await self.transport.clear()
+
+    def _suppress_summary(self):
+        """Zusammenfassung abbrechen bzw. gar nicht erst starten (Tasten 2 und 3)."""
+        self._skip_summary = True
+        if self._summary_task is not None and not self._summary_task.done():
+            self._summary_task.cancel()
+
+    async def _hang_up(self):
+        self._hangup = True
+        if self._summary_task is not None:
+            self._summary_task.cancel()
+        await self._send_audio(await self._render(GOODBYE_MSG), interrupt=True)
+        self._main.cancel()
+
+    async def _end_call(self):
+        """Wartet, bis die letzte Ansage abgespielt ist, und beendet den Anruf."""
+        deadline = time.monotonic() + HANGUP_PLAYBACK_TIMEOUT
+        while self.transport.playing and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        await self.transport.end()
 
     # ── Helpers ──
 
+    def _stage(self, stage: str, task: asyncio.Task | None = None):
+        """Taggt den (aktuellen) Task für den Sampling-Profiler."""
+        tag_task(self.stream_sid, stage, task)
+
+    async def _followup_context(self, question: str) -> list[TelegramMessage]:
+        """Nachrichten für eine Rückfrage, bei aktivem Archiv ergänzt um die passenden.
+
+        Archiv-Treffer (nach Absender, Zeitraum oder Suchbegriff) kommen zu
+        den aktuellen Nachrichten hinzu — auf die beziehen sich Rückfragen
+        ("Nachricht 2") meist, auch wenn ein Absender genannt wird.
+        """
+        archive = self.services.archive
+        if archive is None:
+            return self.messages
+
+        matches = await archive.run(archive.lookup, self.services.tenant, question)
+        logger.info(f"Archive: {len(matches)} matching messages for follow-up")
+        if not matches:
+            return self.messages
+
+        current = {(m.chat_id, m.message_id) for m in self.messages}
+        extra = [m for m in matches if (m.chat_id, m.message_id) not in current]
+        return sorted([*extra, *self.messages], key=lambda m: m.date)
+
+    def _enforce_memory_budget(self):
+        """Hält das Byte-Budget ein (kürzt ältesten Verlauf, dann älteste Nachrichten)."""
+        trim_to_budget(
+            self.messages,
+            self.conversation_history,
+            fixed_bytes=self.audio_queue.nbytes,
+            budget=self.memory_budget,
+        )
+
     def _flush_audio_queue(self):
         """Leert die Audio-Queue (stale Audio von vorheriger Wiedergabe)."""
         while not self.audio_queue.empty():
@@ -0,0 +1,206 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass
+
+from src.core.config import (
+    PREFETCH_MAX_PER_CALLER,
+    PREFETCH_MAX_PER_TENANT,
+    PREFETCH_RATE_WINDOW,
+    PREFETCH_TTL,
+)
+from src.core.metrics import metrics
+from src.core.profiler import tag_task
+from src.core.scheduler import Priority, current_priority
+from src.core.service_provider import ServiceProvider
+from src.core.tenants import TenantRegistry
+from src.models.telegramMessage import TelegramMessage
+
+logger = logging.getLogger(__name__)
+
+PREFETCH_TOTAL = metrics.counter(
+    "prefetch_total",
+    "Prefetches beim Voice-Webhook (started, claimed, expired, missing, rejected, rate_limited)",
+)
+PREFETCH_PENDING = metrics.gauge("prefetch_pending", "Gestartete, noch nicht abgeholte Prefetches")
+PREFETCH_UNCLAIMED = metrics.counter(
+    "prefetch_unclaimed_total",
+    "Verworfene Prefetches ohne Anruf auf diesem Pod, nach erledigter Arbeit (none, fetched, summarized)",
+)
+
+
+async def fetch_messages(services: ServiceProvider) -> list[TelegramMessage]:
+    """Lädt neue Nachrichten, transkribiert Sprachnachrichten und archiviert."""
+    logger.info("Fetching Telegram messages...")
+    # Telegram nicht erreichbar: der Anruf sagt "keine neuen Nachrichten"
+    messages = await services.telegram.get_messages() or []
+    if services.voice_notes:
+        await services.voice_notes.transcribe(messages, services)
+    if services.archive:
+        # Vor dem Acknowledge, danach sind die Updates bei Telegram weg
+        await services.archive.run(services.archive.add, services.tenant, messages)
+    return messages
+
+
+@dataclass
+class Prefetch:
+    """Laufender Abruf + Zusammenfassung eines Anrufs, gestartet vor dem Media Stream.
+
+    `summary` liefert None, wenn ein vorgerenderter Digest die Nachrichten
+    bereits abdeckt — dann spielt die Pipeline den Digest.
+    """
+
+    call_sid: str
+    tenant: str
+    messages: asyncio.Task
+    summary: asyncio.Task
+    expiry: asyncio.TimerHandle | None = None
+
+    def cancel(self):
+        if self.expiry is not None:
+            self.expiry.cancel()
+        for task in (self.messages, self.summary):
+            if not task.done():
+                task.cancel()
+            elif not task.cancelled():
+                task.exception()  # als abgeholt markieren, sonst warnt asyncio beim GC
+
+
+class RateLimit:
+    """Höchstens `limit` Ereignisse pro Schlüssel innerhalb von `window` Sekunden."""
+
+    def __init__(self, limit: int, window: float = PREFETCH_RATE_WINDOW):
+        self.limit = limit
+        self.window = window
+        self._events: dict[str, deque[float]] = {}
+
+    def exhausted(self, key: str) -> bool:
+        events = self._events.get(key)
+        if events is None:
+            return False
+        cutoff = time.monotonic() - self.window
+        while events and events[0] <= cutoff:
+            events.popleft()
+        if not events:
+            del self._events[key]  # sonst wächst das Dict mit jeder Anrufer-Nummer
+            return False
+        return len(events) >= self.limit
+
+    def add(self, key: str):
+        self._events.setdefault(key, deque()).append(time.monotonic())
+
+
+class CallPrefetcher:
+    """Startet Telegram-Abruf und Zusammenfassung schon beim `/twilio/voice`-Webhook.
+
+    Zwischen Webhook und `start`-Event des Media Streams vergehen einige
+    hundert Millisekunden; in dieser Zeit laufen Abruf, Transkription der
+    Sprachnachrichten und Claude bereits. Schlüssel ist die CallSid, die per
+    `<Parameter>` im `<Stream>` zurückkommt. Wird ein Prefetch nicht binnen
+    `ttl` Sekunden abgeholt (Anruf abgebrochen), wird er verworfen.
+
+    Jeder Prefetch kostet Telegram-, Deepgram- und Claude-Aufrufe, bevor
+    ein Anruf überhaupt verbunden ist. Pro Anrufer-Nummer und pro Tenant
+    ist die Zahl der Prefetches je Zeitfenster daher begrenzt — ein
+    einzelner Anrufer kann so nicht alle `max_pending` Plätze belegen.
+    Darüber läuft der Anruf normal, nur ohne Prefetch.
+
+    Offene Prefetches liegen im Speicher des Pods, der den Webhook bekommen
+    hat. Landet der Media Stream auf einem anderen Replica, holt dieses die
+    Nachrichten neu ab (`prefetch_total{result="missing"}`), und der
+    Prefetch verfällt ungenutzt (`prefetch_unclaimed_total`). Session
+    Affinity hilft nicht — Webhook und Stream kommen von verschiedenen
+    Twilio-IPs. Mit N Replicas trifft ohne geteilten Speicher nur etwa
+    jeder N-te Anruf seinen Prefetch.
+    """
+
+    def __init__(
+        self,
+        tenants: TenantRegistry,
+        ttl: float = PREFETCH_TTL,
+        max_pending: int = 100,
+        per_caller: RateLimit | None = None,
+        per_tenant: RateLimit | None = None,
+    ):
+        self.tenants = tenants
+        self.ttl = ttl
+        self.max_pending = max_pending
+        self.per_caller = per_caller or RateLimit(PREFETCH_MAX_PER_CALLER)
+        self.per_tenant = per_tenant or RateLimit(PREFETCH_MAX_PER_TENANT)
+        self._pending: dict[str, Prefetch] = {}
+
+    def start(self, call_sid: str, tenant_id: str, caller: str = "") -> bool:
+        """Startet den Prefetch (idempotent pro CallSid); False bei zu vielen offenen/zu häufigen."""
+        if call_sid in self._pending:
+            return True  # Twilio wiederholt den Webhook
+        if len(self._pending) >= self.max_pending:
+            PREFETCH_TOTAL.inc(result="rejected")
+            return False
+        if self.per_caller.exhausted(caller) or self.per_tenant.exhausted(tenant_id):
+            PREFETCH_TOTAL.inc(result="rate_limited")
+            logger.warning(f"Prefetch rate limit hit for caller {caller!r} / tenant '{tenant_id}'")
+            return False
+        self.per_caller.add(caller)
+        self.per_tenant.add(tenant_id)
+
+        services = self.tenants.get(tenant_id)
+        messages = asyncio.create_task(
+            self._leased(call_sid, tenant_id, fetch_messages, services)
+        )
+        summary = asyncio.create_task(
+            self._leased(call_sid, tenant_id, self._summarize, services, messages)
+        )
+        prefetch = Prefetch(call_sid=call_sid, tenant=tenant_id, messages=messages, summary=summary)
+        prefetch.expiry = asyncio.get_running_loop().call_later(self.ttl, self._expire, call_sid)
+        self._pending[call_sid] = prefetch
+        PREFETCH_TOTAL.inc(result="started")
+        PREFETCH_PENDING.set(len(self._pending))
+        logger.info(f"Prefetch started for call {call_sid} (tenant '{tenant_id}')")
+        return True
+
+    def claim(self, call_sid: str) -> Prefetch | None:
+        """Übergibt den Prefetch an den Anruf; danach ist die Pipeline zuständig."""
+        prefetch = self._pending.pop(call_sid, None)
+        PREFETCH_PENDING.set(len(self._pending))
+        if prefetch is None:
+            PREFETCH_TOTAL.inc(result="missing")
+            return None
+        prefetch.expiry.cancel()  # type: ignore[union-attr]
+        PREFETCH_TOTAL.inc(result="claimed")
+        return prefetch
+
+    def cancel_all(self):
+        for prefetch in self._pending.values():
+            prefetch.cancel()
+        self._pending.clear()
+        PREFETCH_PENDING.set(0)
+
+    def _expire(self, call_sid: str):
+        if prefetch := self._pending.pop(call_sid, None):
+            # Wie viel Telegram-/Claude-Arbeit umsonst war (Anruf abgebrochen oder auf anderem Pod)
+            if prefetch.summary.done():
+                stage = "summarized"
+            elif prefetch.messages.done():
+                stage = "fetched"
+            else:
+                stage = "none"
+            PREFETCH_UNCLAIMED.inc(stage=stage)
+            prefetch.cancel()
+            PREFETCH_TOTAL.inc(result="expired")
+            PREFETCH_PENDING.set(len(self._pending))
+            logger.info(f"Prefetch for call {call_sid} expired unclaimed")
+
+    async def _leased(self, call_sid: str, tenant_id: str, fn, *args):
+        # Der Anrufer wartet schon — gleiche Priorität wie die Begrüßung
+        current_priority.set(Priority.FIRST_AUDIO)
+        tag_task(call_sid, "prefetch")
+        async with self.tenants.lease(tenant_id):
+            return await fn(*args)
+
+    @staticmethod
+    async def _summarize(services: ServiceProvider, messages: asyncio.Task) -> str | None:
+        messages = await messages
+        if services.digest and services.digest.covers(messages):
+            return None
+        return await services.llm.summarize(messages)
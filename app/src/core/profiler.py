@@ -0,0 +1,141 @@
+import asyncio
+import sys
+import threading
+import time
+import weakref
+from collections import Counter
+
+from src.core.config import (
+    PROFILER_COOLDOWN,
+    PROFILER_INTERVAL_MS,
+    PROFILER_MAX_SECONDS,
+    PROFILER_MAX_STACKS,
+)
+from src.core.metrics import metrics
+
+PROFILES_TOTAL = metrics.counter("profiler_runs_total", "Profiler-Läufe (ok, rejected)")
+
+# Task → (stream_sid, Stufe); schwach referenziert, endet mit dem Task
+_task_tags: "weakref.WeakKeyDictionary[asyncio.Task, tuple[str, str]]" = weakref.WeakKeyDictionary()
+
+MAX_DEPTH = 64
+TRUNCATED = "[truncated]"
+
+
+def tag_task(stream_sid: str, stage: str, task: asyncio.Task | None = None):
+    """Ordnet Samples des (aktuellen) Tasks einem Anruf und einer Pipeline-Stufe zu."""
+    task = task or asyncio.current_task()
+    if task is not None:
+        _task_tags[task] = (stream_sid, stage)
+
+
+class ProfilerBusy(Exception):
+    """Es läuft bereits ein Profil oder die Abkühlzeit ist nicht vorbei."""
+
+
+class SamplingProfiler:
+    """Stack-Sampling im Prozess, ohne Instrumentierung des Codes.
+
+    Ein Hintergrund-Thread liest alle `interval` Sekunden die Stacks aller
+    Threads (`sys._current_frames`). Samples des Event-Loop-Threads werden
+    mit streamSid und Pipeline-Stufe des gerade laufenden Tasks getaggt.
+    Ausgabe im Collapsed-Format (`a;b;c 42`), direkt lesbar von
+    flamegraph.pl, speedscope und inferno. Höchstens ein Lauf gleichzeitig,
+    danach `cooldown` Sekunden Pause; die Zahl unterschiedlicher Stacks ist
+    begrenzt.
+
+    Der Sampler braucht den GIL: CPU-Blöcke kürzer als das Switch-Intervall
+    (5 ms) erscheinen unterrepräsentiert, Wartestellen (`select`) eher über.
+    """
+
+    def __init__(
+        self,
+        max_seconds: float = PROFILER_MAX_SECONDS,
+        cooldown: float = PROFILER_COOLDOWN,
+        max_stacks: int = PROFILER_MAX_STACKS,
+    ):
+        self.max_seconds = max_seconds
+        self.cooldown = cooldown
+        self.max_stacks = max_stacks
+        self._lock = threading.Lock()
+        self._last_run = float("-inf")
+
+    async def profile(self, seconds: float, interval_ms: float = PROFILER_INTERVAL_MS) -> str:
+        """Sampelt `seconds` Sekunden lang und liefert das Collapsed-Profil."""
+        now = time.monotonic()
+        if now - self._last_run < self.cooldown or not self._lock.acquire(blocking=False):
+            PROFILES_TOTAL.inc(result="rejected")
+            raise ProfilerBusy(f"profiler busy or cooling down ({self.cooldown:.0f}s between runs)")
+        try:
+            self._last_run = now
+            loop = asyncio.get_running_loop()
+            stacks = await asyncio.to_thread(
+                self._sample,
+                loop,
+                threading.get_ident(),
+                min(max(seconds, 0.1), self.max_seconds),
+                max(interval_ms, 1) / 1000,
+            )
+        finally:
+            self._lock.release()
+        PROFILES_TOTAL.inc(result="ok")
+        return collapse(stacks)
+
+    def _sample(
+        self, loop: asyncio.AbstractEventLoop, loop_thread: int, seconds: float, interval: float
+    ) -> Counter:
+        stacks: Counter = Counter()
+        own = threading.get_ident()
+        names = {t.ident: t.name for t in threading.enumerate()}
+        deadline = time.monotonic() + seconds
+
+        while time.monotonic() < deadline:
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                if thread_id == loop_thread:
+                    sid, stage = _loop_tags(loop)
+                    prefix = (f"call:{sid}", f"stage:{stage}")
+                else:
+                    prefix = (f"thread:{names.get(thread_id, thread_id)}",)
+                key = prefix + _frames(frame)
+                if key in stacks or len(stacks) < self.max_stacks:
+                    stacks[key] += 1
+                else:
+                    stacks[prefix + (TRUNCATED,)] += 1
+            time.sleep(interval)
+        return stacks
+
+
+def _loop_tags(loop: asyncio.AbstractEventLoop) -> tuple[str, str]:
+    """(streamSid, Stufe) des Tasks, der gerade auf `loop` läuft — aus dem Sampler-Thread.
+
+    Nutzt die öffentliche `asyncio.current_task(loop)` statt des privaten
+    `asyncio.tasks._current_tasks`: bis CPython 3.13 liest sie dieses
+    Dict, ab 3.14 liegt der laufende Task am Thread-State und wird für
+    einen fremden Loop dort gesucht. Schlägt das fehl, bleibt das Sample
+    ungetaggt.
+    """
+    try:
+        task = asyncio.current_task(loop)
+    except RuntimeError:
+        return "-", "-"
+    if task is None:
+        return "-", "idle"
+    return _task_tags.get(task, ("-", "-"))
+
+
+def _frames(frame) -> tuple[str, ...]:
+    """Stack von der Wurzel zum Blatt als `modul:funktion`, höchstens MAX_DEPTH tief."""
+    names = []
+    while frame is not None and len(names) < MAX_DEPTH:
+        code = frame.f_code
+        names.append(f"{frame.f_globals.get('__name__', '?')}:{code.co_name}")
+        frame = frame.f_back
+    names.reverse()
+    return tuple(names)
+
+
+def collapse(stacks: Counter) -> str:
+    """Collapsed-Stack-Format, häufigste Stacks zuerst."""
+    return "\n".join(f"{';'.join(stack)} {count}" for stack, count in stacks.most_common())
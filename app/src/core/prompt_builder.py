@@ -0,0 +1,191 @@
+import logging
+import re
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+from src.core.config import PROMPT_MAX_MESSAGE_TOKENS, PROMPT_TOKEN_BUDGET
+from src.core.metrics import metrics
+from src.models.telegramMessage import TelegramMessage
+
+logger = logging.getLogger(__name__)
+
+PROMPT_TOKENS_TOTAL = metrics.counter(
+    "prompt_tokens_estimated_total", "Geschätzte Nachrichten-Tokens (raw = ungekürzt, sent = gesendet)"
+)
+CALL_TOKENS_SAVED = metrics.histogram(
+    "prompt_tokens_saved_per_call", "Pro Anruf eingesparte Nachrichten-Tokens (geschätzt)"
+)
+
+TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+WHITESPACE_RE = re.compile(r"\s+")
+TRUNCATION_MARK = " […]"
+MERGE_SEPARATOR = " / "
+# "[HH:MM] " und ":" einer Nachrichtenzeile
+LINE_PREFIX_TOKENS = 6
+
+
+def estimate_tokens(text: str) -> int:
+    """Schnelle lokale Token-Schätzung: Wörter und Satzzeichen, lange Wörter zählen mehrfach."""
+    return sum(1 + len(token) // 6 for token in TOKEN_RE.findall(text))
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """Kürzt `text` auf ungefähr `max_tokens` (gleiche Schätzung wie oben)."""
+    used = 0
+    for match in TOKEN_RE.finditer(text):
+        used += 1 + len(match.group()) // 6
+        if used > max_tokens:
+            return text[: match.start()].rstrip() + TRUNCATION_MARK
+    return text
+
+
+@dataclass
+class PromptStats:
+    """Geschätzte Tokens eines Anrufs — ungekürzt vs. tatsächlich gesendet."""
+
+    raw_tokens: int = 0
+    sent_tokens: int = 0
+
+    @property
+    def saved_tokens(self) -> int:
+        return self.raw_tokens - self.sent_tokens
+
+    def report(self):
+        if not self.raw_tokens:
+            return
+        CALL_TOKENS_SAVED.observe(self.saved_tokens)
+        logger.info(
+            f"Prompt tokens: sent ~{self.sent_tokens} of ~{self.raw_tokens} "
+            f"(saved {self.saved_tokens / self.raw_tokens:.0%})"
+        )
+
+
+# Token-Statistik des aktuellen Anrufs; wird von der Pipeline gesetzt
+current_prompt_stats: ContextVar[PromptStats | None] = ContextVar(
+    "current_prompt_stats", default=None
+)
+
+
+@dataclass
+class MessageBlock:
+    text: str
+    raw_tokens: int
+    tokens: int
+    omitted: int = 0
+    # Nachrichtenzeilen im Block (ohne Hinweis auf ausgelassene)
+    lines: int = 0
+
+    def record(self, kind: str):
+        """Verbucht die Tokens in Metriken und der Statistik des laufenden Anrufs."""
+        PROMPT_TOKENS_TOTAL.inc(self.raw_tokens, kind=kind, variant="raw")
+        PROMPT_TOKENS_TOTAL.inc(self.tokens, kind=kind, variant="sent")
+        if stats := current_prompt_stats.get():
+            stats.raw_tokens += self.raw_tokens
+            stats.sent_tokens += self.tokens
+
+
+@dataclass
+class _Group:
+    """Aufeinanderfolgende Nachrichten eines Absenders — eine Zeile im Block."""
+
+    sender: str
+    clocks: list[str]
+    texts: list[str]
+    numbers: list[int]
+    # Tokens pro Text inkl. Trenner (und Nummer), siehe `_text_cost`
+    costs: list[int]
+
+    def line(self, numbered: bool) -> str:
+        prefix = _numbers(self.numbers) if numbered else ""
+        return f"{prefix}[{self.clocks[0]}] {self.sender}: {MERGE_SEPARATOR.join(self.texts)}"
+
+    def fixed_cost(self) -> int:
+        """Tokens der Zeile ohne die Texte (das "#" gleicht das fehlende letzte Komma aus)."""
+        return estimate_tokens(f"[{self.clocks[0]}] {self.sender}:") - estimate_tokens(MERGE_SEPARATOR)
+
+
+def build_message_block(
+    messages: list[TelegramMessage],
+    budget: int = PROMPT_TOKEN_BUDGET,
+    max_message_tokens: int = PROMPT_MAX_MESSAGE_TOKENS,
+    numbered: bool = False,
+) -> MessageBlock:
+    """Formatiert Nachrichten kompakt für den Prompt (ohne Seiteneffekte).
+
+    Wiederholte oder weitergeleitete Texte erscheinen nur einmal, überlange
+    Nachrichten werden gekürzt, aufeinanderfolgende Nachrichten desselben
+    Absenders zu einer Zeile zusammengefasst. Reicht das Budget nicht,
+    fallen die ältesten Nachrichten weg — auch innerhalb einer Zeile, damit
+    ein einzelner Vielschreiber das Budget nicht sprengt. Bleibt nur eine
+    Nachricht übrig, wird sie auf das Budget gekürzt.
+
+    Mit `numbered` beginnt jede Zeile mit den Nummern der enthaltenen
+    Nachrichten in `messages` (`#2,3`) — dieselben Nummern, unter denen
+    die Tastensteuerung sie vorliest, auch nach Zusammenfassen und Kürzen.
+    """
+    raw_tokens = 0
+    seen: set[str] = set()
+    groups: list[_Group] = []
+
+    for number, m in enumerate(messages, start=1):
+        # Vergleichsbasis: eine ungekürzte Zeile pro Nachricht
+        raw_tokens += estimate_tokens(m.text) + LINE_PREFIX_TOKENS + estimate_tokens(m.sender)
+        key = WHITESPACE_RE.sub(" ", m.text).strip().casefold()
+        if not key or key in seen:
+            continue
+        seen.add(key)
+        text = truncate_tokens(m.text.strip(), max_message_tokens)
+        cost = _text_cost(text, number, numbered)
+        if groups and groups[-1].sender == m.sender:
+            group = groups[-1]
+            group.clocks.append(m.clock_time())
+            group.texts.append(text)
+            group.numbers.append(number)
+            group.costs.append(cost)
+        else:
+            groups.append(_Group(m.sender, [m.clock_time()], [text], [number], [cost]))
+
+    total = sum(g.fixed_cost() + sum(g.costs) for g in groups)
+    omitted = 0
+    # Älteste Nachricht zuerst, bis das Budget passt — die neueste bleibt immer
+    while total > budget and (len(groups) > 1 or len(groups[0].texts) > 1):
+        group = groups[0]
+        total -= group.costs.pop(0)
+        if not group.costs:
+            total -= group.fixed_cost()
+            groups.pop(0)
+        else:
+            group.clocks.pop(0)
+            group.texts.pop(0)
+            group.numbers.pop(0)
+        omitted += 1
+
+    if total > budget:
+        # Eine einzelne Nachricht, länger als das Budget
+        group = groups[0]
+        text = group.texts[0]
+        allowed = budget - (total - estimate_tokens(text)) - estimate_tokens(TRUNCATION_MARK)
+        group.texts[0] = truncate_tokens(text, max(allowed, 0))
+
+    lines = [group.line(numbered) for group in groups]
+    total = sum(map(estimate_tokens, lines))
+    count = len(lines)
+    if omitted:
+        lines.insert(0, f"({omitted} ältere Nachrichten ausgelassen)")
+    return MessageBlock(
+        text="\n".join(lines), raw_tokens=raw_tokens, tokens=total, omitted=omitted, lines=count
+    )
+
+
+def _text_cost(text: str, number: int, numbered: bool) -> int:
+    """Tokens, die ein Text zu seiner Zeile beiträgt (inkl. Trenner und Nummer mit Komma).
+
+    Texte und Trenner sind durch Leerzeichen getrennt, Tokens verschmelzen
+    nicht — die Schätzung der Zeile ist die Summe ihrer Teile.
+    """
+    cost = estimate_tokens(text) + estimate_tokens(MERGE_SEPARATOR)
+    return cost + estimate_tokens(f"{number},") if numbered else cost
+
+
+def _numbers(numbers: list[int]) -> str:
+    return f"#{','.join(map(str, numbers))} "
@@ -0,0 +1,314 @@
+"""
+Replay-Engine für Call-Traces: Führt die Pipeline deterministisch gegen
+einen aufgezeichneten Anruf aus und vergleicht Latenzen zweier Code-Stände.
+
+Nutzung (aus dem Verzeichnis app/):
+    python -m src.core.replay run traces/MZ123.trace.jsonl.gz --speed 10 --out new.json
+    python -m src.core.replay compare base.json new.json
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import logging
+import time
+from pathlib import Path
+
+from src.core.pipeline import Pipeline
+from src.core.service_provider import ServiceProvider
+from src.core.trace import TraceRecorder, current_trace, load_trace
+from src.core.transport import InMemoryTransport
+from src.service.llm_service import LLMService
+from src.service.stt_service import STTService
+from src.service.telegram_service import TelegramService
+from src.service.tts_service import TTSService
+
+logger = logging.getLogger(__name__)
+
+UPSTREAM_KINDS = ("telegram", "llm", "tts", "stt_open")
+
+
+class _ReplayClock:
+    """Bildet Trace-Zeit (ms) auf Wall-Clock ab, beschleunigt um `speed`."""
+
+    def __init__(self, speed: float):
+        self.speed = speed
+        self.start = time.monotonic()
+
+    async def sleep(self, seconds: float):
+        await asyncio.sleep(max(0.0, seconds) / self.speed)
+
+    async def sleep_until(self, trace_ms: float):
+        target = self.start + trace_ms / 1000 / self.speed
+        await asyncio.sleep(max(0.0, target - time.monotonic()))
+
+
+def _events(events: list[dict], kind: str) -> list[dict]:
+    return [e for e in events if e["k"] == kind]
+
+
+class ReplayTelegramService(TelegramService):
+    def __init__(self, events: list[dict], clock: _ReplayClock):
+        super().__init__(bot_token="replay")
+        self._responses = _events(events, "telegram")
+        self._clock = clock
+
+    async def _fetch_updates(self, limit: int) -> list[dict] | None:
+        if not self._responses:
+            return []
+        event = self._responses.pop(0)
+        await self._clock.sleep(event["latency"])
+        return event["updates"]
+
+    async def acknowledge(self, last_update_id: int):
+        pass
+
+
+class ReplayLLMService(LLMService):
+    # Duplikate würden aufgezeichnete Antworten doppelt verbrauchen
+    hedging = False
+
+    def __init__(self, events: list[dict], clock: _ReplayClock):
+        super().__init__(api_key="replay")
+        self._responses = _events(events, "llm")
+        self._clock = clock
+
+    async def _request(
+        self, system: str, messages: list[dict], max_tokens: int, model: str
+    ) -> str | None:
+        if not self._responses:
+            return None
+        event = self._responses.pop(0)
+        await self._clock.sleep(event["latency"])
+        return event["text"]
+
+
+class ReplayTTSService(TTSService):
+    # Duplikate würden aufgezeichnete Antworten doppelt verbrauchen
+    hedging = False
+
+    def __init__(self, events: list[dict], clock: _ReplayClock):
+        super().__init__()
+        self._responses = _events(events, "tts")
+        self._clock = clock
+
+    async def _synthesize_with_timeout(self, text: str) -> bytes:
+        if not self._responses:
+            return b""
+        event = self._responses.pop(0)
+        await self._clock.sleep(event["latency"])
+        return base64.b64decode(event["audio"])
+
+
+class _ReplayStream:
+    """Spielt die aufgezeichneten Deepgram-Nachrichten eines Streams ab."""
+
+    def __init__(self, open_event: dict | None, messages: list[dict], clock: _ReplayClock):
+        self._open = open_event
+        self._messages = messages
+        self._clock = clock
+        self._opened_at = 0.0
+
+    async def __aenter__(self):
+        if self._open is None:
+            # Trace erschöpft: Stream bleibt stumm, bis der Replay endet
+            await asyncio.Event().wait()
+        await self._clock.sleep(self._open["latency"])  # type: ignore
+        self._opened_at = time.monotonic()
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def send(self, data):
+        pass
+
+    def __aiter__(self):
+        return self._iter()
+
+    async def _iter(self):
+        base_ms = self._open["t"]  # type: ignore
+        for event in self._messages:
+            offset = (event["t"] - base_ms) / 1000 / self._clock.speed
+            await asyncio.sleep(max(0.0, self._opened_at + offset - time.monotonic()))
+            yield event["m"]
+
+
+class ReplaySTTService(STTService):
+    def __init__(self, events: list[dict], clock: _ReplayClock):
+        super().__init__(api_key="replay")
+        self._opens = _events(events, "stt_open")
+        self._messages = _events(events, "stt")
+        self._clock = clock
+
+    def _connect(self):
+        if not self._opens:
+            return _ReplayStream(None, [], self._clock)
+        open_event = self._opens.pop(0)
+        messages = [e for e in self._messages if e["s"] == open_event["s"]]
+        return _ReplayStream(open_event, messages, self._clock)
+
+
+async def replay(events: list[dict], speed: float = 1.0, grace: float = 5.0) -> list[dict]:
+    """Führt die Pipeline gegen einen Trace aus und liefert den Replay-Trace."""
+    clock = _ReplayClock(speed)
+    recorder = TraceRecorder(clock_scale=speed)
+    token = current_trace.set(recorder)
+
+    services = ServiceProvider(
+        telegram=ReplayTelegramService(events, clock),
+        llm=ReplayLLMService(events, clock),
+        tts=ReplayTTSService(events, clock),
+        stt=ReplaySTTService(events, clock),
+    )
+    start = next((e for e in events if e["k"] == "start"), {})
+    pipeline = Pipeline(
+        transport=InMemoryTransport(sid=start.get("sid", "replay")),
+        services=services,
+    )
+
+    recorder.write("start", sid=pipeline.stream_sid)
+    pipeline_task = pipeline.supervisor.spawn(pipeline.run())
+    try:
+        for event in events:
+            if event["k"] == "in":
+                await clock.sleep_until(event["t"])
+                recorder.write("in")
+                pipeline.feed_audio(event["p"])
+            elif event["k"] == "stop":
+                await clock.sleep_until(event["t"])
+                recorder.write("stop")
+                pipeline.transport.receive(None)
+
+        await asyncio.wait_for(asyncio.shield(pipeline_task), timeout=grace)
+    except asyncio.TimeoutError:
+        pass
+    finally:
+        await pipeline.supervisor.aclose()
+        recorder.close()
+        current_trace.reset(token)
+        await services.telegram.client.aclose()
+
+    return recorder.events
+
+
+# ── Auswertung ──
+
+
+def _is_final_transcript(raw: str) -> bool:
+    data = json.loads(raw)
+    if data.get("type") != "Results" or not data.get("is_final"):
+        return False
+    alt = data.get("channel", {}).get("alternatives", [{}])[0]
+    return bool(alt.get("transcript", "").strip())
+
+
+def _percentile(values: list[float], pct: float) -> float | None:
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return round(ordered[index], 2)
+
+
+def _summary(values: list[float]) -> dict:
+    return {
+        "n": len(values),
+        "mean": round(sum(values) / len(values), 2) if values else None,
+        "p50": _percentile(values, 50),
+        "p95": _percentile(values, 95),
+    }
+
+
+def analyze(events: list[dict]) -> dict:
+    """Berechnet Latenz-Kennzahlen aus einem (aufgezeichneten oder Replay-)Trace."""
+    outs = [e["t"] for e in events if e["k"] == "out"]
+    finals = [e["t"] for e in events if e["k"] == "stt" and _is_final_transcript(e["m"])]
+
+    # Antwortlatenz: letztes finales Transkript vor einer Audio-Ausgabe → Ausgabe
+    turn_latencies = []
+    previous_out = 0.0
+    for out in outs:
+        turn_finals = [f for f in finals if previous_out <= f <= out]
+        if turn_finals:
+            turn_latencies.append(out - turn_finals[-1])
+        previous_out = out
+
+    upstream = {
+        kind: _summary([e["latency"] * 1000 for e in events if e["k"] == kind])
+        for kind in UPSTREAM_KINDS
+    }
+
+    return {
+        "first_audio_ms": outs[0] if outs else None,
+        "duration_ms": events[-1]["t"] if events else 0,
+        "turn_latency_ms": _summary(turn_latencies),
+        "upstream_ms": upstream,
+    }
+
+
+def compare(base: dict, new: dict) -> dict:
+    """Vergleicht zwei Replay-Reports; negative Deltas sind Verbesserungen."""
+
+    def delta(a, b):
+        return None if a is None or b is None else round(b - a, 2)
+
+    rows = {
+        "first_audio_ms": (base["first_audio_ms"], new["first_audio_ms"]),
+        "turn_latency_mean_ms": (base["turn_latency_ms"]["mean"], new["turn_latency_ms"]["mean"]),
+        "turn_latency_p95_ms": (base["turn_latency_ms"]["p95"], new["turn_latency_ms"]["p95"]),
+        "duration_ms": (base["duration_ms"], new["duration_ms"]),
+    }
+    return {name: {"base": a, "new": b, "delta": delta(a, b)} for name, (a, b) in rows.items()}
+
+
+# ── CLI ──
+
+
+def _run(args):
+    events = load_trace(args.trace)
+    replayed = asyncio.run(replay(events, speed=args.speed, grace=args.grace))
+    report = {
+        "trace": str(args.trace),
+        "speed": args.speed,
+        "recorded": analyze(events),
+        "replayed": analyze(replayed),
+    }
+    output = json.dumps(report, indent=2)
+    if args.out:
+        Path(args.out).write_text(output)
+    print(output)
+
+
+def _compare(args):
+    base = json.loads(Path(args.base).read_text())["replayed"]
+    new = json.loads(Path(args.new).read_text())["replayed"]
+    print(f"{'Kennzahl':<24}{'Basis':>12}{'Neu':>12}{'Delta':>12}")
+    for name, row in compare(base, new).items():
+        print(f"{name:<24}{row['base']!s:>12}{row['new']!s:>12}{row['delta']!s:>12}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Call-Trace Replay")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="Pipeline gegen einen Trace ausführen")
+    run.add_argument("trace", type=Path)
+    run.add_argument("--speed", type=float, default=1.0, help="Zeitraffer-Faktor (1 = Echtzeit)")
+    run.add_argument("--grace", type=float, default=5.0, help="Nachlaufzeit nach Trace-Ende (s)")
+    run.add_argument("--out", type=Path)
+    run.set_defaults(func=_run)
+
+    cmp = sub.add_parser("compare", help="Zwei Replay-Reports vergleichen")
+    cmp.add_argument("base", type=Path)
+    cmp.add_argument("new", type=Path)
+    cmp.set_defaults(func=_compare)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    main()
@@ -0,0 +1,190 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from contextlib import asynccontextmanager, nullcontext
+from contextvars import ContextVar
+from enum import IntEnum
+
+from src.core.config import (
+    SCHEDULER_LLM_CONCURRENCY,
+    SCHEDULER_MAX_QUEUE,
+    SCHEDULER_MAX_WAIT,
+    SCHEDULER_STT_CONCURRENCY,
+    SCHEDULER_TTS_CONCURRENCY,
+)
+from src.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+QUEUE_WAIT_SECONDS = metrics.histogram(
+    "upstream_queue_wait_seconds",
+    "Wartezeit auf einen Upstream-Slot (llm, tts, stt) nach Priorität",
+)
+SHED_TOTAL = metrics.counter(
+    "upstream_shed_total",
+    "Wegen Überlast abgewiesene Upstream-Anfragen",
+)
+ACTIVE = metrics.gauge("upstream_active", "Laufende Upstream-Anfragen")
+QUEUED = metrics.gauge("upstream_queued", "Wartende Upstream-Anfragen")
+
+
+class Priority(IntEnum):
+    """Kleinere Werte werden zuerst bedient."""
+
+    FIRST_AUDIO = 0
+    FOLLOWUP = 1
+    BACKGROUND = 2
+
+
+# Priorität des aktuellen Anruf-Abschnitts; Tasks erben sie beim Erzeugen
+current_priority: ContextVar[Priority] = ContextVar("current_priority", default=Priority.FOLLOWUP)
+
+
+class Overloaded(Exception):
+    """Kein Upstream-Slot verfügbar — Anfrage wird abgewiesen (Load Shedding)."""
+
+    def __init__(self, upstream: str):
+        super().__init__(f"Upstream '{upstream}' overloaded")
+        self.upstream = upstream
+
+
+class _Upstream:
+    def __init__(self, name: str, limit: int):
+        self.name = name
+        self.limit = limit
+        self.active = 0
+        # (priority, seq, future) — Min-Heap nach Priorität, dann FIFO
+        self.waiters: list[tuple[int, int, asyncio.Future]] = []
+
+    def queued(self) -> int:
+        return sum(1 for _, _, f in self.waiters if not f.done())
+
+
+class UpstreamScheduler:
+    """Globale Admission Control mit Concurrency-Limits und Prioritäts-Queue.
+
+    Ist ein Upstream ausgelastet, warten Anfragen nach Priorität. Läuft die
+    Queue voll oder die Wartezeit ab, wird sofort `Overloaded` geworfen,
+    statt alle Anrufe gleichmäßig langsamer werden zu lassen.
+    """
+
+    def __init__(
+        self,
+        limits: dict[str, int] | None = None,
+        max_queue: int = SCHEDULER_MAX_QUEUE,
+        max_wait: float = SCHEDULER_MAX_WAIT,
+    ):
+        limits = limits or {
+            "llm": SCHEDULER_LLM_CONCURRENCY,
+            "tts": SCHEDULER_TTS_CONCURRENCY,
+            "stt": SCHEDULER_STT_CONCURRENCY,
+        }
+        self._upstreams = {name: _Upstream(name, limit) for name, limit in limits.items()}
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self._seq = itertools.count()
+
+    @asynccontextmanager
+    async def slot(self, upstream: str, priority: Priority | None = None):
+        """Belegt einen Slot für die Dauer des `async with`-Blocks."""
+        await self.acquire(upstream, priority)
+        try:
+            yield
+        finally:
+            self.release(upstream)
+
+    async def acquire(self, upstream: str, priority: Priority | None = None):
+        up = self._upstreams[upstream]
+        priority = current_priority.get() if priority is None else priority
+        started = time.monotonic()
+
+        if up.active < up.limit and not up.queued():
+            up.active += 1
+            self._observe(up, priority, started)
+            return
+
+        if up.queued() >= self.max_queue and not self._evict_lower(up, priority):
+            self._shed(up, priority)
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(up.waiters, (priority, next(self._seq), future))
+        QUEUED.set(up.queued(), upstream=upstream)
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout=self.max_wait)
+        except asyncio.TimeoutError:
+            if self._abandon(future):
+                self._shed(up, priority)
+        except asyncio.CancelledError:
+            if not self._abandon(future):
+                self.release(upstream)
+            raise
+        except Overloaded:
+            self._shed(up, priority)
+        finally:
+            QUEUED.set(up.queued(), upstream=upstream)
+
+        self._observe(up, priority, started)
+
+    def try_acquire(self, upstream: str) -> bool:
+        """Belegt einen Slot nur, wenn sofort einer frei ist (z.B. für Hedging)."""
+        up = self._upstreams[upstream]
+        if up.active >= up.limit or up.queued():
+            return False
+        up.active += 1
+        ACTIVE.set(up.active, upstream=upstream)
+        return True
+
+    def release(self, upstream: str):
+        up = self._upstreams[upstream]
+        while up.waiters:
+            _, _, future = heapq.heappop(up.waiters)
+            if not future.done():
+                # Slot direkt an den nächsten Wartenden übergeben
+                future.set_result(None)
+                return
+        up.active -= 1
+        ACTIVE.set(up.active, upstream=upstream)
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        return {
+            name: {"active": up.active, "queued": up.queued(), "limit": up.limit}
+            for name, up in self._upstreams.items()
+        }
+
+    def _observe(self, up: _Upstream, priority: Priority, started: float):
+        ACTIVE.set(up.active, upstream=up.name)
+        QUEUE_WAIT_SECONDS.observe(
+            time.monotonic() - started, upstream=up.name, priority=priority.name.lower()
+        )
+
+    def _shed(self, up: _Upstream, priority: Priority):
+        SHED_TOTAL.inc(upstream=up.name, priority=priority.name.lower())
+        logger.warning(f"Shedding {priority.name} request for {up.name}: {self.stats()[up.name]}")
+        raise Overloaded(up.name)
+
+    def _evict_lower(self, up: _Upstream, priority: Priority) -> bool:
+        """Verdrängt den am niedrigsten priorisierten Wartenden, falls niedriger als `priority`."""
+        pending = [w for w in up.waiters if not w[2].done()]
+        if not pending:
+            return False
+        worst = max(pending, key=lambda w: (w[0], w[1]))
+        if worst[0] <= priority:
+            return False
+        worst[2].set_exception(Overloaded(up.name))
+        return True
+
+    @staticmethod
+    def _abandon(future: asyncio.Future) -> bool:
+        """Zieht eine wartende Anfrage zurück. False, falls der Slot schon übergeben war."""
+        if future.done() and not future.cancelled() and future.exception() is None:
+            return False
+        if not future.done():
+            future.cancel()
+        return True
+
+
+def admission(scheduler: UpstreamScheduler | None, upstream: str):
+    """Slot beim Scheduler belegen — oder No-op, falls keiner konfiguriert ist."""
+    return scheduler.slot(upstream) if scheduler else nullcontext()
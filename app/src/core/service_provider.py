@@ -1,11 +1,18 @@
+from src.core.archive import MessageArchive
+from src.core.phrase_cache import PhraseCache
+from src.core.scheduler import UpstreamScheduler
+from src.core.voice_notes import VoiceNoteTranscriber
 from src.service.llm_service import LLMService
 from src.service.stt_service import STTService
 from src.service.telegram_service import TelegramService
 from src.service.tts_service import TTSService
 
 
+DEFAULT_TENANT = "default"
+
+
 class ServiceProvider:
-    """Zentraler Container für alle Service-Instanzen."""
+    """Zentraler Container für alle Service-Instanzen (eines Tenants)."""
 
     def __init__(
         self,
@@ -13,8 +20,20 @@ class ServiceProvider:
         llm: LLMService,
         tts: TTSService,
         stt: STTService,
+        scheduler: UpstreamScheduler | None = None,
+        phrases: PhraseCache | None = None,
+        tenant: str = DEFAULT_TENANT,
+        archive: MessageArchive | None = None,
+        voice_notes: VoiceNoteTranscriber | None = None,
     ):
         self.telegram = telegram
         self.llm = llm
         self.tts = tts
         self.stt = stt
+        self.scheduler = scheduler
+        self.phrases = phrases or PhraseCache()
+        self.tenant = tenant
+        self.archive = archive
+        self.voice_notes = voice_notes
+        # Vorgerenderte Zusammenfassung (DigestRenderer), von der Registry gesetzt
+        self.digest = None
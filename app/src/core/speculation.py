@@ -0,0 +1,125 @@
+import asyncio
+import logging
+import re
+import time
+from collections.abc import Awaitable, Callable
+from typing import Generic, TypeVar
+
+from src.core.config import SPECULATION_STABILITY_MS
+from src.core.metrics import metrics
+from src.core.supervisor import spawn
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+SPECULATION_TOTAL = metrics.counter(
+    "speculation_total",
+    "Spekulative Rückfrage-Antworten nach Ergebnis (hit, miss, none)",
+)
+SPECULATION_SAVED_SECONDS = metrics.histogram(
+    "speculation_latency_saved_seconds",
+    "Eingesparte Antwortlatenz durch spekulative Ausführung",
+)
+
+
+def normalize_transcript(text: str) -> str:
+    """Normalisiert ein Transkript für den Vergleich (Groß/klein, Satzzeichen)."""
+    return " ".join(re.sub(r"[^\w\s]", " ", text.lower()).split())
+
+
+class SpeculativeExecutor(Generic[T]):
+    """Startet eine Berechnung, sobald ein Interim-Transkript stabil ist.
+
+    Stimmt das finale Transkript mit dem spekulierten überein, wird das
+    Ergebnis übernommen, sonst wird die Berechnung abgebrochen und verworfen.
+    """
+
+    def __init__(
+        self,
+        compute: Callable[[str], Awaitable[T]],
+        stability_ms: int = SPECULATION_STABILITY_MS,
+    ):
+        self.compute = compute
+        self.stability = stability_ms / 1000
+
+        self._candidate = ""
+        self._timer: asyncio.TimerHandle | None = None
+        self._task: asyncio.Task[T] | None = None
+        self._task_text = ""
+        self._started_at = 0.0
+        self._finished_at: float | None = None
+
+    def observe(self, transcript: str):
+        """Meldet das aktuelle (Interim-)Transkript der laufenden Äußerung."""
+        candidate = normalize_transcript(transcript)
+        if not candidate or candidate == self._candidate:
+            return
+
+        self._candidate = candidate
+        if self._timer:
+            self._timer.cancel()
+        if self._task and self._task_text != candidate:
+            self._discard()
+
+        loop = asyncio.get_running_loop()
+        self._timer = loop.call_later(self.stability, self._start, transcript)
+
+    async def resolve(self, final_transcript: str) -> T | None:
+        """Liefert das spekulative Ergebnis, falls es zum finalen Transkript passt."""
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+
+        if self._task is None:
+            SPECULATION_TOTAL.inc(outcome="none")
+            return None
+
+        if self._task_text != normalize_transcript(final_transcript):
+            logger.info(f"Speculation miss: '{self._task_text}'")
+            SPECULATION_TOTAL.inc(outcome="miss")
+            self._discard()
+            return None
+
+        resolved_at = time.monotonic()
+        task = self._task
+        self._task = None
+        try:
+            result = await task
+        except Exception as e:
+            logger.warning(f"Speculative task failed: {e}")
+            SPECULATION_TOTAL.inc(outcome="miss")
+            return None
+
+        finished_at = self._finished_at or time.monotonic()
+        saved = min(resolved_at, finished_at) - self._started_at
+        SPECULATION_TOTAL.inc(outcome="hit")
+        SPECULATION_SAVED_SECONDS.observe(saved)
+        logger.info(f"Speculation hit, saved {saved * 1000:.0f} ms")
+        return result
+
+    def cancel(self):
+        """Bricht Timer und laufende Spekulation ab (z.B. bei Verabschiedung)."""
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+        self._discard()
+
+    def _start(self, transcript: str):
+        self._timer = None
+        self._task_text = normalize_transcript(transcript)
+        self._started_at = time.monotonic()
+        self._finished_at = None
+        logger.info(f"Starting speculative answer for: '{transcript}'")
+        self._task = spawn(self.compute(transcript))
+        self._task.add_done_callback(self._on_done)
+
+    def _on_done(self, task: asyncio.Task):
+        if task is self._task:
+            self._finished_at = time.monotonic()
+
+    def _discard(self):
+        if self._task and not self._task.done():
+            self._task.cancel()
+        self._task = None
+        self._task_text = ""
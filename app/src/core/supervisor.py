@@ -0,0 +1,164 @@
+import asyncio
+import gc
+import inspect
+import logging
+import time
+import weakref
+from collections import Counter
+from collections.abc import Coroutine, Iterable
+from contextvars import ContextVar
+
+from src.core.config import CALL_LEAK_CHECK_DELAY, CALL_TEARDOWN_TIMEOUT
+from src.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+TEARDOWN_SECONDS = metrics.histogram("call_teardown_seconds", "Dauer des Abbaus pro Anruf")
+TEARDOWN_TOTAL = metrics.counter(
+    "call_teardown_total", "Abbau pro Anruf (clean, timeout = Tasks liefen nach dem Limit weiter)"
+)
+LEAKED_OBJECTS = metrics.gauge(
+    "call_leaked_objects", "Tasks, Sockets und Queues, die nach Anrufende noch leben (kind)"
+)
+
+# Supervisor des laufenden Anrufs; Tasks erben ihn beim Erzeugen
+current_supervisor: ContextVar["CallSupervisor | None"] = ContextVar(
+    "current_supervisor", default=None
+)
+
+
+def spawn(coro: Coroutine, name: str | None = None) -> asyncio.Task:
+    """`asyncio.create_task`, registriert beim Supervisor des laufenden Anrufs (falls vorhanden)."""
+    supervisor = current_supervisor.get()
+    if supervisor is None:
+        return asyncio.create_task(coro, name=name)
+    return supervisor.spawn(coro, name=name)
+
+
+class LeakTracker:
+    """Zählt Objekte beendeter Anrufe, die `delay` Sekunden nach dem Abbau noch leben.
+
+    Kandidaten werden gesammelt und gemeinsam geprüft — höchstens eine
+    volle GC pro `delay`, damit Zyklen (Pipeline ↔ Transport) nicht als
+    Leak zählen. Ein gefundener Leak bleibt im Gauge, bis das Objekt
+    freigegeben wird bzw. der Task endet.
+    """
+
+    def __init__(self, delay: float = CALL_LEAK_CHECK_DELAY):
+        self.delay = delay
+        self._suspects: list[tuple[weakref.ref, str, str]] = []
+        self._timer: asyncio.TimerHandle | None = None
+
+    def watch(self, call_sid: str, objects: Iterable[tuple[object, str]]):
+        self._suspects.extend((weakref.ref(obj), kind, call_sid) for obj, kind in objects)
+        if self._suspects and self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.delay, self.check)
+
+    def check(self) -> Counter:
+        """Prüft alle gesammelten Kandidaten; liefert die gefundenen Leaks pro Art."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        suspects, self._suspects = self._suspects, []
+        leaks: Counter = Counter()
+        if not any(ref() is not None for ref, _, _ in suspects):
+            return leaks
+
+        gc.collect()
+        for ref, kind, call_sid in suspects:
+            obj = ref()
+            if obj is None or (kind == "task" and obj.done()):  # type: ignore[attr-defined]
+                continue
+            leaks[kind] += 1
+            LEAKED_OBJECTS.inc(kind=kind)
+            if kind == "task":
+                obj.add_done_callback(lambda _, kind=kind: LEAKED_OBJECTS.dec(kind=kind))  # type: ignore[attr-defined]
+            else:
+                weakref.finalize(obj, LEAKED_OBJECTS.dec, kind=kind)
+            logger.warning(f"Leak: {kind} of call {call_sid} still alive after teardown: {obj!r:.120}")
+        return leaks
+
+
+leak_tracker = LeakTracker()
+
+
+class CallSupervisor:
+    """Besitzt alle Tasks, Verbindungen und Queues eines Anrufs.
+
+    Per-Call-Coroutinen laufen über `spawn` (bzw. `adopt` für fremd
+    erzeugte Tasks), Deepgram-Sockets und Queues werden mit `register`
+    angemeldet. `aclose()` bricht alle Tasks ab, wartet höchstens `timeout`
+    Sekunden auf ihr Ende, schließt noch offene Verbindungen und übergibt
+    alles dem LeakTracker.
+    """
+
+    def __init__(
+        self,
+        call_sid: str,
+        timeout: float = CALL_TEARDOWN_TIMEOUT,
+        leaks: LeakTracker | None = None,
+    ):
+        self.call_sid = call_sid
+        self.timeout = timeout
+        self.leaks = leaks or leak_tracker
+        self.closed = False
+        self._tasks: set[asyncio.Task] = set()
+        self._resources: list[tuple[weakref.ref, str, bool]] = []
+
+    def spawn(self, coro: Coroutine, name: str | None = None) -> asyncio.Task:
+        return self.adopt(asyncio.create_task(coro, name=name))
+
+    def adopt(self, task: asyncio.Task) -> asyncio.Task:
+        """Übernimmt einen anderswo erzeugten Task (z.B. aus dem Prefetch)."""
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        if self.closed:
+            # Anruf ist schon abgebaut — nichts darf ihn überleben
+            task.cancel()
+        return task
+
+    def register(self, obj, kind: str, close: bool = False):
+        """Meldet eine Verbindung oder Queue an; mit `close` wird sie beim Abbau geschlossen."""
+        self._resources.append((weakref.ref(obj), kind, close))
+        return obj
+
+    async def aclose(self):
+        """Bricht alle Tasks ab und wartet darauf, schließt Verbindungen — höchstens `timeout` s."""
+        if self.closed:
+            return
+        self.closed = True
+        started = time.monotonic()
+        current = asyncio.current_task()
+
+        tasks = [t for t in self._tasks if t is not current and not t.done()]
+        for task in tasks:
+            task.cancel()
+        pending: set[asyncio.Task] = set()
+        if tasks:
+            _, pending = await asyncio.wait(tasks, timeout=self.timeout)
+
+        for ref, kind, close in self._resources:
+            if close and (obj := ref()) is not None:
+                await self._close(obj, kind, max(started + self.timeout - time.monotonic(), 0.1))
+
+        TEARDOWN_SECONDS.observe(time.monotonic() - started)
+        TEARDOWN_TOTAL.inc(result="timeout" if pending else "clean")
+        if pending:
+            names = ", ".join(sorted(t.get_name() for t in pending))
+            logger.warning(
+                f"Call {self.call_sid}: {len(pending)} tasks still running after "
+                f"{self.timeout:.0f}s teardown ({names})"
+            )
+
+        alive = [(obj, kind) for ref, kind, _ in self._resources if (obj := ref()) is not None]
+        self.leaks.watch(self.call_sid, [*((t, "task") for t in self._tasks if t is not current), *alive])
+        self._tasks.clear()
+        self._resources.clear()
+
+    async def _close(self, obj, kind: str, timeout: float):
+        try:
+            result = obj.close()
+            if inspect.isawaitable(result):
+                await asyncio.wait_for(result, timeout=timeout)
+        except Exception as e:
+            logger.warning(f"Call {self.call_sid}: closing {kind} failed: {e!r}")
@@ -0,0 +1,190 @@
+import asyncio
+import json
+import logging
+from collections import Counter, OrderedDict
+from contextlib import asynccontextmanager
+from pathlib import Path
+
+from src.core.archive import MessageArchive
+from src.core.config import DIGEST_ENABLED, TENANT_CACHE_SIZE
+from src.core.digest import DigestRenderer
+from src.core.metrics import metrics
+from src.core.phrase_cache import PhraseCache
+from src.core.scheduler import UpstreamScheduler
+from src.core.service_provider import DEFAULT_TENANT, ServiceProvider
+from src.core.voice_notes import VoiceNoteTranscriber
+from src.models.tenant import Tenant
+from src.service.llm_service import LLMService
+from src.service.stt_service import STTService
+from src.service.telegram_service import TelegramService
+from src.service.tts_service import TTSService
+
+logger = logging.getLogger(__name__)
+
+CACHED_TENANTS = metrics.gauge("tenant_providers_cached", "Gecachte Tenant-ServiceProvider")
+TENANT_EVICTIONS = metrics.counter(
+    "tenant_evictions_total", "Aus dem LRU-Cache verdrängte Tenant-ServiceProvider"
+)
+
+
+def load_tenants(path: str) -> dict[str, Tenant]:
+    """Lädt Tenants aus einer JSON-Datei.
+
+    Format: `{"<id>": {"telegram_bot_token": "...", "tts_voice": "...",
+    "numbers": ["+49..."]}}` — `tts_voice` ist optional.
+    """
+    data = json.loads(Path(path).read_text())
+    return {
+        tenant_id: Tenant(
+            id=tenant_id,
+            telegram_bot_token=entry["telegram_bot_token"],
+            tts_voice=entry.get("tts_voice", ""),
+            numbers=tuple(entry.get("numbers", ())),
+        )
+        for tenant_id, entry in data.items()
+    }
+
+
+class TenantRegistry:
+    """Baut ServiceProvider pro Tenant bei Bedarf und cacht sie per LRU.
+
+    Eigen sind pro Tenant nur Telegram-Client (Bot-Token) und Stimme.
+    Claude, Deepgram, Scheduler, Archiv (Spalte `tenant`) und der Cache der
+    Sprachnachrichten werden geteilt,
+    TTS-Service und Phrase-Cache pro Stimme. Verdrängte Provider schließen
+    ihren Telegram-Pool, sobald kein Anruf sie mehr nutzt. Mit `digests`
+    pollt jeder gecachte Provider im Hintergrund und rendert seine
+    Zusammenfassung vor (siehe DigestRenderer).
+    """
+
+    def __init__(
+        self,
+        tenants: dict[str, Tenant],
+        llm: LLMService,
+        stt: STTService,
+        default_voice: str,
+        scheduler: UpstreamScheduler | None = None,
+        static_phrases: list[str] | None = None,
+        archive: MessageArchive | None = None,
+        voice_notes: VoiceNoteTranscriber | None = None,
+        max_cached: int = TENANT_CACHE_SIZE,
+        digests: bool = DIGEST_ENABLED,
+    ):
+        self.tenants = tenants
+        self.llm = llm
+        self.stt = stt
+        self.default_voice = default_voice
+        self.scheduler = scheduler
+        self.static_phrases = static_phrases or []
+        self.archive = archive
+        self.voice_notes = voice_notes
+        if voice_notes:
+            # Hintergrund-Batches halten den Tenant selbst fest
+            voice_notes.lease = self.lease
+        self.max_cached = max_cached
+        self.digests = digests
+
+        self._by_number = {
+            number: tenant.id for tenant in tenants.values() for number in tenant.numbers
+        }
+        self._providers: OrderedDict[str, ServiceProvider] = OrderedDict()
+        self._leases: Counter[str] = Counter()
+        self._voices: dict[str, tuple[TTSService, PhraseCache]] = {}
+        self._background: set[asyncio.Task] = set()
+        self._watchers: dict[str, asyncio.Task] = {}
+
+    def resolve(self, *numbers: str) -> str | None:
+        """Tenant zur angerufenen bzw. anrufenden Nummer (erste Übereinstimmung)."""
+        for number in numbers:
+            if tenant_id := self._by_number.get(number):
+                return tenant_id
+        if not self._by_number and DEFAULT_TENANT in self.tenants:
+            # Single-Tenant-Betrieb: jede Nummer gehört zum Default-Tenant
+            return DEFAULT_TENANT
+        return None
+
+    def voice(self, voice: str) -> tuple[TTSService, PhraseCache]:
+        """Geteilter TTS-Service und Phrase-Cache pro Stimme.
+
+        Die Default-Stimme wird beim Start vorgerendert, weitere Stimmen
+        beim ersten Anruf im Hintergrund.
+        """
+        if voice not in self._voices:
+            tts, phrases = TTSService(voice=voice, scheduler=self.scheduler), PhraseCache()
+            self._voices[voice] = (tts, phrases)
+            if voice != self.default_voice and self.static_phrases:
+                task = asyncio.create_task(phrases.warm(tts, self.static_phrases))
+                self._background.add(task)
+                task.add_done_callback(self._background.discard)
+        return self._voices[voice]
+
+    def get(self, tenant_id: str) -> ServiceProvider:
+        """ServiceProvider eines Tenants (wird bei Bedarf gebaut)."""
+        if tenant_id in self._providers:
+            self._providers.move_to_end(tenant_id)
+            return self._providers[tenant_id]
+
+        tenant = self.tenants[tenant_id]
+        tts, phrases = self.voice(tenant.tts_voice or self.default_voice)
+        provider = ServiceProvider(
+            telegram=TelegramService(bot_token=tenant.telegram_bot_token),
+            llm=self.llm,
+            tts=tts,
+            stt=self.stt,
+            scheduler=self.scheduler,
+            phrases=phrases,
+            tenant=tenant_id,
+            archive=self.archive,
+            voice_notes=self.voice_notes,
+        )
+        self._providers[tenant_id] = provider
+        CACHED_TENANTS.set(len(self._providers))
+        logger.info(f"Built services for tenant '{tenant_id}'")
+        if self.digests:
+            provider.digest = DigestRenderer(provider)
+            self._watchers[tenant_id] = asyncio.create_task(provider.digest.watch())
+        return provider
+
+    def start_digests(self):
+        """Baut Provider (und damit Digest-Watcher) für die ersten `max_cached` Tenants."""
+        for tenant_id in list(self.tenants)[: self.max_cached]:
+            self.get(tenant_id)
+
+    @asynccontextmanager
+    async def lease(self, tenant_id: str):
+        """Hält den Provider eines Tenants für die Dauer eines Anrufs fest."""
+        provider = self.get(tenant_id)
+        self._leases[tenant_id] += 1
+        try:
+            yield provider
+        finally:
+            self._leases[tenant_id] -= 1
+            if self._leases[tenant_id] <= 0:
+                del self._leases[tenant_id]
+            await self._evict()
+
+    async def aclose(self):
+        for task in [*self._background, *self._watchers.values()]:
+            task.cancel()
+        self._watchers.clear()
+        for provider in self._providers.values():
+            await provider.telegram.aclose()
+        self._providers.clear()
+        CACHED_TENANTS.set(0)
+        if self.voice_notes:
+            self.voice_notes.cancel()
+        await self.stt.aclose()
+        if self.archive:
+            self.archive.close()
+
+    async def _evict(self):
+        """Verdrängt die am längsten ungenutzten Provider ohne laufende Anrufe."""
+        idle = [tid for tid in self._providers if tid not in self._leases]
+        while len(self._providers) > self.max_cached and idle:
+            tenant_id = idle.pop(0)
+            provider = self._providers.pop(tenant_id)
+            TENANT_EVICTIONS.inc()
+            if watcher := self._watchers.pop(tenant_id, None):
+                watcher.cancel()
+            await provider.telegram.aclose()
+        CACHED_TENANTS.set(len(self._providers))
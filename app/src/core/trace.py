@@ -0,0 +1,112 @@
+import gzip
+import json
+import logging
+import time
+from contextvars import ContextVar
+from pathlib import Path
+
+from src.core.config import TRACE_DIR
+
+logger = logging.getLogger(__name__)
+
+TRACE_SUFFIX = ".trace.jsonl.gz"
+
+current_trace: ContextVar["TraceRecorder | None"] = ContextVar("current_trace", default=None)
+
+
+class TraceRecorder:
+    """Schreibt einen kompakten Call-Trace (gzip JSON-Lines) für Replays.
+
+    Jedes Event hat `t` (ms seit Anrufbeginn) und `k` (Art), z.B. eingehende
+    Frames (`in`), ausgehendes Audio (`out`) und Antworten/Latenzen der
+    Upstreams (`telegram`, `llm`, `tts`, `stt_open`, `stt`).
+    """
+
+    def __init__(self, path: Path | None = None, clock_scale: float = 1.0):
+        self.path = path
+        self.clock_scale = clock_scale
+        self.events: list[dict] = []
+        self._file = gzip.open(path, "wt", encoding="utf-8") if path else None
+        self._start = time.monotonic()
+        self._streams = 0
+        self.closed = False
+
+    @classmethod
+    def for_call(cls, stream_sid: str) -> "TraceRecorder | None":
+        """Erzeugt einen Recorder unter TRACE_DIR, falls Tracing aktiviert ist."""
+        if not TRACE_DIR:
+            return None
+        directory = Path(TRACE_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"{stream_sid}{TRACE_SUFFIX}"
+        logger.info(f"Recording call trace to {path}")
+        return cls(path)
+
+    def now_ms(self) -> float:
+        return round((time.monotonic() - self._start) * 1000 * self.clock_scale, 2)
+
+    def next_stream_id(self) -> int:
+        self._streams += 1
+        return self._streams
+
+    def write(self, kind: str, **data):
+        if self.closed:
+            return
+        event = {"t": self.now_ms(), "k": kind, **data}
+        if self._file:
+            self._file.write(json.dumps(event, separators=(",", ":"), ensure_ascii=False))
+            self._file.write("\n")
+        else:
+            self.events.append(event)
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        if self._file:
+            self._file.close()
+
+
+def record(kind: str, **data):
+    """Schreibt ein Event in den Trace des aktuellen Anrufs (No-op ohne Tracing)."""
+    recorder = current_trace.get()
+    if recorder is not None:
+        recorder.write(kind, **data)
+
+
+def load_trace(path: str | Path) -> list[dict]:
+    """Lädt einen Call-Trace als Liste von Events."""
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+class RecordingStream:
+    """Umhüllt eine Deepgram-Verbindung und zeichnet empfangene Nachrichten auf."""
+
+    def __init__(self, connect_ctx, recorder: TraceRecorder):
+        self._ctx = connect_ctx
+        self._recorder = recorder
+        self._stream_id = recorder.next_stream_id()
+        self._ws = None
+
+    async def __aenter__(self):
+        started = time.monotonic()
+        self._ws = await self._ctx.__aenter__()
+        self._recorder.write(
+            "stt_open", s=self._stream_id, latency=round(time.monotonic() - started, 4)
+        )
+        return self
+
+    async def __aexit__(self, *exc):
+        return await self._ctx.__aexit__(*exc)
+
+    async def send(self, data):
+        await self._ws.send(data)  # type: ignore
+
+    def __aiter__(self):
+        return self._iter()
+
+    async def _iter(self):
+        async for msg in self._ws:  # type: ignore
+            self._recorder.write("stt", s=self._stream_id, m=msg)
+            yield msg
@@ -0,0 +1,205 @@
+import asyncio
+import base64
+import logging
+from collections import deque
+from collections.abc import Callable
+
+import numpy as np
+
+from src.core.audio_codec import decode_mulaw, encode_mulaw
+from src.core.audio_utils import TWILIO_SAMPLE_RATE
+
+logger = logging.getLogger(__name__)
+
+# 20 ms bei 8 kHz — Blockgröße für Mikrofon und Lautsprecher
+DEVICE_BLOCK_SAMPLES = 160
+
+
+class CallTransport:
+    """Audio-Ein-/Ausgabe eines Anrufs, unabhängig vom Telefonie-Anbieter.
+
+    Audio ist immer mulaw 8 kHz mono. Eingehendes Audio reicht der Transport
+    über `receive()` an die Pipeline weiter (`None` = Eingang beendet),
+    Tastendrücke (DTMF) über `keypress()`.
+    `send_frames` nimmt Base64-Chunks im Twilio-Format entgegen, wie sie
+    vorgerendert gespeichert werden (siehe DigestRenderer).
+    """
+
+    sid = ""
+
+    def __init__(self):
+        self._sink: Callable[[bytes | None], None] | None = None
+        self._keys: Callable[[str], None] | None = None
+
+    def bind(
+        self,
+        sink: Callable[[bytes | None], None],
+        keys: Callable[[str], None] | None = None,
+    ):
+        """Registriert die Empfänger für eingehendes Audio und Tasten (die Pipeline)."""
+        self._sink = sink
+        self._keys = keys
+
+    def receive(self, chunk: bytes | None):
+        if self._sink is not None:
+            self._sink(chunk)
+
+    def keypress(self, digit: str):
+        if self._keys is not None:
+            self._keys(digit)
+
+    async def send_audio(self, mulaw: bytes | memoryview):
+        raise NotImplementedError
+
+    async def send_frames(self, frames: list[str], n_bytes: int):
+        await self.send_audio(b"".join(map(base64.b64decode, frames)))
+
+    async def clear(self):
+        """Verwirft noch nicht abgespieltes Audio (Barge-in, Tastendruck)."""
+        raise NotImplementedError
+
+    async def mark(self, name: str):
+        """Markiert das Ende des bisher gesendeten Audios."""
+        raise NotImplementedError
+
+    async def end(self):
+        """Beendet den Anruf von unserer Seite (nach der Verabschiedung)."""
+
+    @property
+    def playing(self) -> bool:
+        """True, solange gesendetes Audio noch nicht abgespielt ist."""
+        return False
+
+
+class InMemoryTransport(CallTransport):
+    """Transport ohne Geräte und ohne Echtzeit — für Simulation und Tests.
+
+    Ausgehendes Audio wird nur gezählt und gilt sofort als abgespielt; die
+    Pipeline läuft so schnell, wie ihre Upstreams antworten.
+    """
+
+    def __init__(self, sid: str = "memory"):
+        super().__init__()
+        self.sid = sid
+        self.frames_sent = 0
+        self.bytes_sent = 0
+        self.marks: list[str] = []
+        self.clears = 0
+        self.ended = False
+
+    @property
+    def audio_seconds(self) -> float:
+        """Dauer des gesendeten Audios (so lange hätte der Anrufer zugehört)."""
+        return self.bytes_sent / TWILIO_SAMPLE_RATE
+
+    def say(self, mulaw: bytes, chunk_size: int = 640):
+        """Speist Anrufer-Audio in Twilio-Chunkgröße ein."""
+        for i in range(0, len(mulaw), chunk_size):
+            self.receive(mulaw[i : i + chunk_size])
+
+    def hang_up(self):
+        self.receive(None)
+
+    async def send_audio(self, mulaw: bytes | memoryview):
+        self.frames_sent += -(-len(mulaw) // 640)
+        self.bytes_sent += len(mulaw)
+
+    async def send_frames(self, frames: list[str], n_bytes: int):
+        # Nicht dekodieren — nur die Menge zählt
+        self.frames_sent += len(frames)
+        self.bytes_sent += n_bytes
+
+    async def clear(self):
+        self.clears += 1
+
+    async def mark(self, name: str):
+        self.marks.append(name)
+
+    async def end(self):
+        self.ended = True
+
+
+class SoundDeviceTransport(CallTransport):
+    """Mikrofon und Lautsprecher statt Telefon (lokale Demo).
+
+    Die Wiedergabe läuft als Stream: gesendete Chunks landen in einem
+    Puffer, aus dem der Audio-Callback blockweise liest — die Ausgabe
+    beginnt mit dem ersten Chunk statt nach dem kompletten Audio. Die
+    Pipeline sendet allerdings jede Ansage erst nach vollständiger TTS und
+    MP3-Dekodierung (`Pipeline._render`), die Zeit bis zum ersten Ton ist
+    damit dieselbe wie vorher.
+    """
+
+    def __init__(self, sid: str = "local"):
+        import sounddevice as sd  # lazy: braucht PortAudio, nur lokal vorhanden
+
+        super().__init__()
+        self.sid = sid
+        self._sd = sd
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._playback: deque[np.ndarray] = deque()
+        self._streams = []
+
+    def start(self):
+        """Öffnet Mikrofon- und Lautsprecher-Stream (8 kHz, int16)."""
+        self._loop = asyncio.get_running_loop()
+        self._streams = [
+            self._sd.InputStream(
+                samplerate=TWILIO_SAMPLE_RATE, channels=1, dtype="int16",
+                blocksize=DEVICE_BLOCK_SAMPLES, callback=self._on_input,
+            ),
+            self._sd.OutputStream(
+                samplerate=TWILIO_SAMPLE_RATE, channels=1, dtype="int16",
+                blocksize=DEVICE_BLOCK_SAMPLES, callback=self._on_output,
+            ),
+        ]
+        for stream in self._streams:
+            stream.start()
+
+    def close(self):
+        for stream in self._streams:
+            stream.stop()
+            stream.close()
+        self._streams = []
+        self.receive(None)
+
+    def _on_input(self, indata, frames, time_info, status):
+        if status:
+            logger.warning(f"Sounddevice input status: {status}")
+        if self._playback:
+            # Halbduplex: ohne Echo-Unterdrückung hört das Mikrofon sonst die Ansage
+            return
+        chunk = encode_mulaw(indata[:, 0])
+        self._loop.call_soon_threadsafe(self.receive, chunk)  # type: ignore
+
+    def _on_output(self, outdata, frames, time_info, status):
+        out = outdata[:, 0]
+        filled = 0
+        # clear() tauscht den Puffer aus statt ihn zu leeren — dieser hier
+        # wird nur noch von diesem Callback verändert
+        playback = self._playback
+        while filled < frames and playback:
+            block = playback[0]
+            n = min(frames - filled, len(block))
+            out[filled : filled + n] = block[:n]
+            filled += n
+            if n == len(block):
+                playback.popleft()
+            else:
+                playback[0] = block[n:]  # Rest des Blocks für den nächsten Callback
+        out[filled:] = 0
+
+    async def send_audio(self, mulaw: bytes | memoryview):
+        if len(mulaw):
+            self._playback.append(decode_mulaw(mulaw))
+
+    async def clear(self):
+        # Austauschen statt clear(): der Audio-Thread kann gerade mitten im alten Puffer sein
+        self._playback = deque()
+
+    async def mark(self, name: str):
+        logger.debug(f"Mark '{name}' ({len(self._playback)} blocks queued)")
+
+    @property
+    def playing(self) -> bool:
+        return bool(self._playback)
@@ -0,0 +1,120 @@
+import logging
+from collections import deque
+from dataclasses import dataclass
+
+import numpy as np
+
+from src.core.audio_codec import decode_mulaw
+from src.core.config import (
+    VAD_ENERGY_THRESHOLD_DB,
+    VAD_HANGOVER_MS,
+    VAD_MIN_SPEECH_MS,
+    VAD_PADDING_MS,
+    VAD_ZCR_MAX,
+)
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 8000
+FRAME_MS = 20
+FRAME_SAMPLES = SAMPLE_RATE * FRAME_MS // 1000  # 160 Samples = 1 Twilio-Frame
+
+
+@dataclass
+class VadResult:
+    audio: bytes = b""
+    end_of_utterance: bool = False
+
+
+class VoiceActivityDetector:
+    """Energie- und Zero-Crossing-VAD auf mulaw-Frames (8 kHz, 20 ms).
+
+    Leitet nur Sprache plus Padding weiter und meldet das Äußerungsende
+    lokal, sobald nach Sprache `hangover_ms` Stille erkannt wurde.
+    """
+
+    def __init__(
+        self,
+        energy_threshold_db: float = VAD_ENERGY_THRESHOLD_DB,
+        zcr_max: float = VAD_ZCR_MAX,
+        min_speech_ms: int = VAD_MIN_SPEECH_MS,
+        padding_ms: int = VAD_PADDING_MS,
+        hangover_ms: int = VAD_HANGOVER_MS,
+    ):
+        self.energy_threshold_db = energy_threshold_db
+        self.zcr_max = zcr_max
+        self.min_speech_frames = max(1, min_speech_ms // FRAME_MS)
+        self.hangover_frames = max(1, hangover_ms // FRAME_MS)
+
+        padding_frames = padding_ms // FRAME_MS
+        self._preroll: deque[bytes] = deque(
+            maxlen=padding_frames + self.min_speech_frames
+        )
+        self._remainder = b""
+        self._triggered = False
+        self._speech_run = 0
+        self._silence_run = 0
+
+        self.frames_in = 0
+        self.frames_out = 0
+
+    def process(self, chunk: bytes) -> VadResult:
+        """Verarbeitet einen mulaw-Chunk und liefert weiterzuleitendes Audio."""
+        data = self._remainder + chunk
+        n_frames = len(data) // FRAME_SAMPLES
+        self._remainder = data[n_frames * FRAME_SAMPLES :]
+        if n_frames == 0:
+            return VadResult()
+
+        frames = [
+            data[i * FRAME_SAMPLES : (i + 1) * FRAME_SAMPLES]
+            for i in range(n_frames)
+        ]
+        speech = self.classify(data[: n_frames * FRAME_SAMPLES])
+        self.frames_in += n_frames
+
+        out: list[bytes] = []
+        end_of_utterance = False
+
+        for frame, is_speech in zip(frames, speech):
+            if not self._triggered:
+                self._preroll.append(frame)
+                self._speech_run = self._speech_run + 1 if is_speech else 0
+                if self._speech_run >= self.min_speech_frames:
+                    self._triggered = True
+                    self._silence_run = 0
+                    out.extend(self._preroll)
+                    self._preroll.clear()
+                continue
+
+            out.append(frame)
+            self._silence_run = 0 if is_speech else self._silence_run + 1
+            if self._silence_run >= self.hangover_frames:
+                self._triggered = False
+                self._speech_run = 0
+                end_of_utterance = True
+
+        self.frames_out += len(out)
+        return VadResult(audio=b"".join(out), end_of_utterance=end_of_utterance)
+
+    def classify(self, mulaw: bytes) -> np.ndarray:
+        """Klassifiziert vollständige 20-ms-Frames vektorisiert als Sprache/Stille."""
+        frames = decode_mulaw(mulaw).reshape(-1, FRAME_SAMPLES).astype(np.float32)
+
+        rms = np.sqrt(np.mean(frames * frames, axis=1))
+        energy_db = 20.0 * np.log10(np.maximum(rms, 1.0) / 32768.0)
+
+        signs = np.signbit(frames)
+        zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / (
+            FRAME_SAMPLES - 1
+        )
+
+        return (energy_db > self.energy_threshold_db) & (zcr <= self.zcr_max)
+
+    def reset(self):
+        """Setzt den Zustand für eine neue Äußerung zurück."""
+        self._preroll.clear()
+        self._remainder = b""
+        self._triggered = False
+        self._speech_run = 0
+        self._silence_run = 0
@@ -0,0 +1,172 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from contextlib import nullcontext
+from typing import TYPE_CHECKING
+
+from src.core.config import VOICE_CACHE_SIZE, VOICE_CONCURRENCY, VOICE_TRANSCRIBE_TIMEOUT
+from src.core.metrics import metrics
+from src.models.telegramMessage import TelegramMessage, VoiceNote
+from src.service.stt_service import STTService
+from src.service.telegram_service import TelegramService
+
+if TYPE_CHECKING:
+    from src.core.service_provider import ServiceProvider
+
+logger = logging.getLogger(__name__)
+
+VOICE_NOTES_TOTAL = metrics.counter(
+    "voice_notes_total",
+    "Sprachnachrichten: erstes Ergebnis pro Notiz (transcribed, failed, late), cached = spätere Treffer",
+)
+VOICE_BATCH_SECONDS = metrics.histogram(
+    "voice_batch_seconds", "Download + Transkription eines Batches von Sprachnachrichten"
+)
+
+
+class VoiceNoteTranscriber:
+    """Transkribiert Sprachnachrichten im Hintergrund und cacht die Texte.
+
+    Pro Abruf laufen Downloads (getFile) und Deepgram-Transkription als ein
+    Batch über einen begrenzten Pool. Cache-Key ist `file_unique_id` — eine
+    Sprachnachricht wird nie zweimal geladen oder transkribiert, auch nicht
+    weitergeleitet oder bei einem anderen Tenant. Nicht rechtzeitig fertige
+    Notizen behalten ihren Platzhalter; der Batch läuft weiter und füllt den
+    Cache für den nächsten Anruf.
+
+    Der Batch überlebt den Anruf, der ihn gestartet hat. Den Telegram-Client
+    holt er sich deshalb über `lease` (von der TenantRegistry gesetzt) —
+    sonst könnte die Verdrängung des Tenants ihn mitten im Batch schließen.
+    """
+
+    def __init__(
+        self,
+        stt: STTService,
+        concurrency: int = VOICE_CONCURRENCY,
+        cache_size: int = VOICE_CACHE_SIZE,
+    ):
+        self.stt = stt
+        self.concurrency = concurrency
+        self.cache_size = cache_size
+        self._cache: OrderedDict[str, str] = OrderedDict()
+        self._pending: dict[str, asyncio.Future] = {}
+        self._downloads = asyncio.Semaphore(concurrency)
+        self._background: set[asyncio.Task] = set()
+        # Als `late` gezählte Notizen — ihr späterer Cache-Treffer zählt nicht noch einmal
+        self._late: set[str] = set()
+        # TenantRegistry.lease; ohne Registry nutzt der Batch den übergebenen Client
+        self.lease = None
+
+    async def transcribe(
+        self,
+        messages: list[TelegramMessage],
+        services: "ServiceProvider",
+        timeout: float = VOICE_TRANSCRIBE_TIMEOUT,
+    ) -> int:
+        """Ersetzt Platzhalter durch Transkripte, wartet höchstens `timeout` Sekunden.
+
+        Liefert die Anzahl transkribierter Nachrichten.
+        """
+        voiced = [m for m in messages if m.voice is not None]
+        if not voiced:
+            return 0
+
+        new: dict[str, VoiceNote] = {}
+        waiting: dict[str, asyncio.Future] = {}
+        cached: set[str] = set()
+        for m in voiced:
+            key = m.voice.file_unique_id
+            if key in self._cache:
+                cached.add(key)
+                continue
+            if key in waiting:
+                continue
+            if key not in self._pending:
+                self._pending[key] = asyncio.get_running_loop().create_future()
+                new[key] = m.voice
+            waiting[key] = self._pending[key]
+
+        if new:
+            task = asyncio.create_task(self._run_batch(list(new.values()), services))
+            self._background.add(task)
+            task.add_done_callback(self._background.discard)
+        if waiting:
+            # wait() bricht die Futures nicht ab — ein beendeter Anruf stoppt den Batch nicht
+            await asyncio.wait(list(waiting.values()), timeout=timeout)
+
+        filled = 0
+        for m in voiced:
+            text = self._lookup(m.voice.file_unique_id)
+            if text:
+                m.text = text
+                filled += 1
+        late = {key for key, f in waiting.items() if not f.done()}
+        if late:
+            self._late |= late
+            VOICE_NOTES_TOTAL.inc(len(late), result="late")
+        # Pro Notiz, nicht pro Nachricht; der erste Treffer einer `late`-Notiz ist ihr Ergebnis
+        hits = cached - self._late
+        self._late -= cached
+        VOICE_NOTES_TOTAL.inc(len(hits), result="cached")
+        logger.info(
+            f"Voice notes: {filled}/{len(voiced)} transcribed "
+            f"({len(new)} new, {len(late)} still running)"
+        )
+        return filled
+
+    def _lookup(self, key: str) -> str:
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+        return ""
+
+    def _store(self, key: str, text: str):
+        self._cache[key] = text
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            evicted, _ = self._cache.popitem(last=False)
+            self._late.discard(evicted)
+
+    async def _download(self, telegram: TelegramService, note: VoiceNote) -> bytes:
+        async with self._downloads:
+            return await telegram.download_file(note.file_id)
+
+    async def _run_batch(self, notes: list[VoiceNote], services: "ServiceProvider"):
+        """Lädt alle Notizen parallel und transkribiert sie als Batch."""
+        started = time.monotonic()
+        lease = self.lease(services.tenant) if self.lease else nullcontext(services)
+        try:
+            async with lease as leased:
+                telegram = leased.telegram
+                audios = await asyncio.gather(*(self._download(telegram, n) for n in notes))
+            loaded = [(n, a) for n, a in zip(notes, audios) if a]
+            texts = await self.stt.transcribe_batch(
+                [a for _, a in loaded], concurrency=self.concurrency
+            )
+            for (note, _), text in zip(loaded, texts):
+                if text:
+                    self._store(note.file_unique_id, text)
+            # Zu spät gekommene sind schon als `late` gezählt
+            counted = [n for n in notes if n.file_unique_id not in self._late]
+            transcribed = sum(1 for n in counted if n.file_unique_id in self._cache)
+            VOICE_NOTES_TOTAL.inc(transcribed, result="transcribed")
+            VOICE_NOTES_TOTAL.inc(len(counted) - transcribed, result="failed")
+        except Exception as e:
+            VOICE_NOTES_TOTAL.inc(
+                sum(1 for n in notes if n.file_unique_id not in self._late), result="failed"
+            )
+            logger.error(f"Voice note batch failed: {e!r}")
+        finally:
+            VOICE_BATCH_SECONDS.observe(time.monotonic() - started)
+            # Fehlgeschlagene Notizen sind nicht gecacht und werden beim nächsten Abruf neu versucht
+            for note in notes:
+                if note.file_unique_id not in self._cache:
+                    self._late.discard(note.file_unique_id)
+                if future := self._pending.pop(note.file_unique_id, None):
+                    if not future.done():
+                        future.set_result(None)
+
+    def cancel(self):
+        for task in self._background:
+            task.cancel()
@@ -1,19 +1,27 @@
+import asyncio
+import hmac
 import logging
 import os
+import time
+from contextlib import asynccontextmanager
+from urllib.parse import parse_qs
 
 from dotenv import load_dotenv
 
 load_dotenv()
 
-from fastapi import FastAPI, WebSocket
-from fastapi.responses import Response
+from fastapi import Depends, FastAPI, HTTPException, Request, WebSocket
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
 
-from src.core.service_provider import ServiceProvider
-from src.service.llm_service import LLMService
-from src.service.stt_service import STTService
-from src.service.telegram_service import TelegramService
-from src.service.tts_service import TTSService
-from src.service.twilio_service import TwilioService
+from src.core.config import (
+    ADMIN_TOKEN,
+    ARCHIVE_PATH,
+    DRAIN_TIMEOUT,
+    PROFILER_INTERVAL_MS,
+    TENANTS_FILE,
+    WARMUP_TIMEOUT,
+)
+from src.core.metrics import metrics
 
 logging.basicConfig(
     level=logging.INFO,
@@ -21,42 +29,227 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-app = FastAPI()
+STARTUP_SECONDS = metrics.gauge(
+    "startup_seconds", "Dauer der Startphasen (build, warmup) in Sekunden"
+)
 
 # ── Services ──
 
-services = ServiceProvider(
-    telegram=TelegramService(bot_token=os.getenv("TELEGRAM_BOT_TOKEN", "")),
-    llm=LLMService(
-        api_key=os.getenv("ANTHROPIC_API_KEY", ""),
-        model=os.getenv("ANTHROPIC_MODEL", "claude-sonnet-4-20250514"),
-    ),
-    tts=TTSService(voice=os.getenv("TTS_VOICE", "de-DE-ConradNeural")),
-    stt=STTService(api_key=os.getenv("DEEPGRAM_API_KEY", "")),
-)
 
-twilio_service = TwilioService(services=services)
+def build_tenants():
+    """Baut die geteilten Services und die Tenant-Registry.
+
+    Die schweren Abhängigkeiten (anthropic, edge_tts, websockets,
+    httpx) werden erst hier importiert — nicht beim Import dieses Moduls.
+    Ohne `TENANTS_FILE` gibt es genau einen Tenant aus den Env-Variablen.
+    """
+    from src.core.archive import MessageArchive
+    from src.core.pipeline import STATIC_PHRASES
+    from src.core.scheduler import UpstreamScheduler
+    from src.core.service_provider import DEFAULT_TENANT
+    from src.core.tenants import TenantRegistry, load_tenants
+    from src.core.voice_notes import VoiceNoteTranscriber
+    from src.models.tenant import Tenant
+    from src.service.llm_service import LLMService
+    from src.service.stt_service import STTService
+
+    default_voice = os.getenv("TTS_VOICE", "de-DE-ConradNeural")
+    if TENANTS_FILE:
+        tenants = load_tenants(TENANTS_FILE)
+    else:
+        tenants = {
+            DEFAULT_TENANT: Tenant(
+                id=DEFAULT_TENANT,
+                telegram_bot_token=os.getenv("TELEGRAM_BOT_TOKEN", ""),
+                tts_voice=default_voice,
+            )
+        }
+
+    scheduler = UpstreamScheduler()
+    stt = STTService(api_key=os.getenv("DEEPGRAM_API_KEY", ""), scheduler=scheduler)
+    return TenantRegistry(
+        tenants,
+        llm=LLMService(
+            api_key=os.getenv("ANTHROPIC_API_KEY", ""),
+            model=os.getenv("ANTHROPIC_MODEL", "claude-sonnet-4-20250514"),
+            fast_model=os.getenv("ANTHROPIC_FAST_MODEL", "claude-3-5-haiku-20241022"),
+            scheduler=scheduler,
+        ),
+        stt=stt,
+        default_voice=default_voice,
+        scheduler=scheduler,
+        static_phrases=STATIC_PHRASES,
+        archive=MessageArchive(ARCHIVE_PATH) if ARCHIVE_PATH else None,
+        voice_notes=VoiceNoteTranscriber(stt),
+    )
+
+
+async def warm_up(tenants, ready: asyncio.Event):
+    """Rendert statische Ansagen der Default-Stimme vor, danach ready.
+
+    Hängt ein Upstream, wird nach `WARMUP_TIMEOUT` trotzdem ready gemeldet —
+    fehlende Ansagen werden dann live synthetisiert.
+    """
+    started = time.monotonic()
+    tts, phrases = tenants.voice(tenants.default_voice)
+    try:
+        await asyncio.wait_for(
+            phrases.warm(tts, tenants.static_phrases), timeout=WARMUP_TIMEOUT
+        )
+    except asyncio.TimeoutError:
+        logger.warning(f"Warm-up did not finish within {WARMUP_TIMEOUT}s, going ready anyway")
+    STARTUP_SECONDS.set(time.monotonic() - started, phase="warmup")
+    ready.set()
+    logger.info("Ready for calls")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Baut die Services beim Start; Warm-up läuft im Hintergrund bis zur Readiness.
+
+    Beim Shutdown werden laufende Anrufe bis `DRAIN_TIMEOUT` zu Ende geführt.
+    """
+    from src.core.capacity import CallCapacity
+    from src.core.profiler import SamplingProfiler
+    from src.service.twilio_service import TwilioService
+
+    started = time.monotonic()
+    tenants = build_tenants()
+    capacity = CallCapacity()
+    app.state.tenants = tenants
+    app.state.capacity = capacity
+    app.state.twilio = TwilioService(tenants=tenants, capacity=capacity)
+    app.state.ready = asyncio.Event()
+    app.state.profiler = SamplingProfiler()
+    STARTUP_SECONDS.set(time.monotonic() - started, phase="build")
+
+    background = [
+        asyncio.create_task(warm_up(tenants, app.state.ready)),
+        asyncio.create_task(capacity.monitor_loop_lag()),
+    ]
+    if tenants.digests:
+        tenants.start_digests()
+    yield
+    await capacity.drain(DRAIN_TIMEOUT)
+    for task in background:
+        task.cancel()
+    if app.state.twilio.prefetcher:
+        app.state.twilio.prefetcher.cancel_all()
+    await tenants.aclose()
+
+
+app = FastAPI(lifespan=lifespan)
 
 
 # ── Health ──
 
 @app.get("/health")
 async def health_check():
-    """Health-Check Endpoint für Kubernetes Probes."""
+    """Liveness-Probe: antwortet, sobald der Prozess läuft."""
     return {"status": "ok"}
 
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness-Probe: bereit nach dem Warm-up, solange Kapazität frei ist."""
+    ready = getattr(app.state, "ready", None)
+    if ready is None or not ready.is_set():
+        return JSONResponse({"status": "warming_up"}, status_code=503)
+
+    capacity = app.state.capacity
+    if reason := capacity.unavailable_reason():
+        return JSONResponse({"status": reason, **capacity.status()}, status_code=503)
+    return {"status": "ready", **capacity.status()}
+
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Prometheus-Metriken (Latenzen, Spekulation, ...)."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+# ── Admin ──
+
+LOCALHOST = {"127.0.0.1", "::1"}
+
+
+def require_admin(request: Request):
+    """Schützt /admin/*: `Authorization: Bearer <ADMIN_TOKEN>`, ohne Token nur localhost.
+
+    Der Service ist ein öffentlicher LoadBalancer — Twilio muss /twilio/*
+    erreichen, die Admin-Endpoints darf es niemand sonst.
+    """
+    if ADMIN_TOKEN:
+        scheme, _, token = request.headers.get("authorization", "").partition(" ")
+        if scheme.lower() == "bearer" and hmac.compare_digest(token, ADMIN_TOKEN):
+            return
+    elif request.client and request.client.host in LOCALHOST:
+        return
+    raise HTTPException(status_code=403, detail="admin access denied")
+
+
+@app.get("/admin/calls/memory", dependencies=[Depends(require_admin)])
+async def call_memory():
+    """Geschätzter Speicher pro laufendem Anruf (Audio-Queue, Nachrichten, Verlauf)."""
+    return app.state.twilio.memory_report()
+
+
+@app.post("/admin/drain", dependencies=[Depends(require_admin)])
+async def drain():
+    """Für den preStop-Hook: keine neuen Anrufe, wartet auf laufende."""
+    remaining = await app.state.capacity.drain(DRAIN_TIMEOUT)
+    return {"status": "drained" if remaining == 0 else "timeout", "active_calls": remaining}
+
+
+@app.delete("/admin/drain", dependencies=[Depends(require_admin)])
+async def cancel_drain():
+    """Hebt einen Drain auf — der Pod meldet sich wieder bereit."""
+    app.state.capacity.resume()
+    return {"status": "ready", **app.state.capacity.status()}
+
+
+@app.get("/admin/profile", dependencies=[Depends(require_admin)])
+async def profile(seconds: float = 10, interval_ms: float = PROFILER_INTERVAL_MS):
+    """Sampling-Profil im Collapsed-Format (flamegraph.pl, speedscope).
+
+    Stacks des Event-Loops beginnen mit `call:<streamSid>;stage:<Stufe>`.
+    Nur ein Lauf gleichzeitig, Laufzeit und Wiederholung sind begrenzt.
+    """
+    from src.core.profiler import ProfilerBusy
+
+    try:
+        collapsed = await app.state.profiler.profile(seconds, interval_ms)
+    except ProfilerBusy as e:
+        return JSONResponse({"status": "busy", "detail": str(e)}, status_code=429)
+    return PlainTextResponse(collapsed)
+
+
 # ── Twilio ──
 
 @app.post("/twilio/voice")
-async def handle_incoming_call():
+async def handle_incoming_call(request: Request):
     """Twilio ruft diesen Endpoint bei eingehendem Anruf auf."""
-    twiml = twilio_service.generate_twiml()
-    logger.info("Incoming call, returning TwiML with media stream")
+    # Form-Body selbst parsen — spart die python-multipart-Abhängigkeit.
+    # Leere Felder gehören zur Signatur, daher keep_blank_values
+    form = {
+        name: values[0]
+        for name, values in parse_qs((await request.body()).decode(), keep_blank_values=True).items()
+    }
+    signature = request.headers.get("x-twilio-signature", "")
+    if not app.state.twilio.validate_webhook(request.url.path, form, signature):
+        logger.warning(f"Invalid Twilio signature on {request.url.path}, rejecting")
+        return Response(status_code=403)
+
+    called = form.get("To", "")
+    caller = form.get("From", "")
+    call_sid = form.get("CallSid", "")
+    # Startet Telegram-Abruf und Zusammenfassung, während Twilio den Stream aufbaut
+    twiml = app.state.twilio.generate_twiml(called=called, caller=caller, call_sid=call_sid)
+    logger.info(f"Incoming call to {called}, returning TwiML")
     return Response(content=twiml, media_type="application/xml")
 
 
 @app.websocket("/twilio/media-stream")
 async def media_stream(ws: WebSocket):
     """Bidirektionaler WebSocket für Twilio Media Streams."""
-    await twilio_service.handle_media_stream(ws)
+    await app.state.twilio.handle_media_stream(ws)
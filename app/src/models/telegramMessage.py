@@ -1,12 +1,42 @@
 from dataclasses import dataclass
 from datetime import datetime
+from functools import lru_cache
+from zoneinfo import ZoneInfo
 
+TIMEZONE = ZoneInfo("Europe/Berlin")
 
-@dataclass
+
+@dataclass(frozen=True, slots=True)
+class VoiceNote:
+    file_id: str  # für getFile, pro Bot
+    file_unique_id: str  # stabil über Bots und Weiterleitungen hinweg (Cache-Key)
+    duration: int = 0
+
+    @property
+    def placeholder(self) -> str:
+        """Text, solange (oder falls) kein Transkript vorliegt."""
+        return f"(Sprachnachricht, {self.duration} s)"
+
+
+@dataclass(slots=True)
 class TelegramMessage:
     sender: str
-    timestamp: datetime
+    date: int  # Unix-Zeit in Sekunden, wie von Telegram geliefert
     text: str
     chat_id: int
     message_id: int
-    update_id: int
\ No newline at end of file
+    update_id: int
+    voice: VoiceNote | None = None
+
+    @property
+    def timestamp(self) -> datetime:
+        return datetime.fromtimestamp(self.date, tz=TIMEZONE)
+
+    def clock_time(self) -> str:
+        """Uhrzeit als `HH:MM` — wird erst beim Formatieren berechnet."""
+        return _clock_time(self.date // 60)
+
+
+@lru_cache(maxsize=4096)
+def _clock_time(minute: int) -> str:
+    return datetime.fromtimestamp(minute * 60, tz=TIMEZONE).strftime("%H:%M")
@@ -0,0 +1,9 @@
+from dataclasses import dataclass, field
+
+
+@dataclass(frozen=True)
+class Tenant:
+    id: str
+    telegram_bot_token: str
+    tts_voice: str
+    numbers: tuple[str, ...] = field(default_factory=tuple)
@@ -1,8 +1,14 @@
 import logging
+import time
 
 from anthropic import APIConnectionError, APIStatusError, APITimeoutError, AsyncAnthropic
 
-from src.core.config import ANTHROPIC_TIMEOUT
+from src.core.config import ANTHROPIC_TIMEOUT, HEDGING_ENABLED, LLM_HEDGE_MAX_TOKENS
+from src.core.latency import hedged, with_timeout
+from src.core.model_router import ModelRouter, token_scale
+from src.core.prompt_builder import build_message_block
+from src.core.scheduler import UpstreamScheduler, admission
+from src.core.trace import record
 from src.models.telegramMessage import TelegramMessage
 
 logger = logging.getLogger(__name__)
@@ -12,8 +18,9 @@ Telegram-Nachrichten vorgelesen zu bekommen.
 
 Regeln:
 - Beginne mit "Du hast X neue Nachrichten."
-- Fasse jede Nachricht in einem kurzen Satz zusammen
-- Nummeriere die Nachrichten (Nachricht 1, Nachricht 2, ...)
+- Fasse jede Zeile in einem kurzen Satz zusammen
+- Nummeriere mit den Nummern am Zeilenanfang (#2 → "Nachricht 2", #3,4 → "Nachrichten 3 und 4");
+  fehlende Nummern (Wiederholungen, ausgelassene) nicht erwähnen
 - Nenne Absender und ungefähre Uhrzeit
 - Halte dich kurz — der Text wird per Telefon vorgelesen
 - Ende mit "Möchtest du zu einer Nachricht mehr erfahren?"
@@ -33,25 +40,41 @@ verabschiede dich freundlich."""
 class LLMService:
     """Claude-basierte Zusammenfassung und Rückfragen-Beantwortung."""
 
-    def __init__(self, api_key: str, model: str = "claude-sonnet-4-20250514"):
+    hedging = HEDGING_ENABLED
+
+    def __init__(
+        self,
+        api_key: str,
+        model: str = "claude-sonnet-4-20250514",
+        scheduler: UpstreamScheduler | None = None,
+        fast_model: str = "",
+    ):
         self.client = AsyncAnthropic(api_key=api_key, timeout=ANTHROPIC_TIMEOUT)
         self.model = model
+        self.scheduler = scheduler
+        self.router = ModelRouter(strong_model=model, fast_model=fast_model)
 
     async def summarize(self, messages: list[TelegramMessage]) -> str:
         """Fasst Telegram-Nachrichten als sprechbaren Text zusammen."""
         if not messages:
             return "Du hast keine neuen Nachrichten."
 
-        formatted = _format_messages(messages)
+        block = build_message_block(messages, numbered=True)
+        block.record("summary")
 
         return await self._call(
             system=SUMMARIZE_PROMPT,
             messages=[{
                 "role": "user",
-                "content": f"Fasse diese Nachrichten zusammen:\n\n{formatted}",
+                # Zeilen ≠ Nachrichten: Zeilen fassen Nachrichten zusammen, Wiederholungen fehlen
+                "content": (
+                    f"Du hast {len(messages)} neue Nachrichten. "
+                    f"Fasse diese {block.lines} Zeilen zusammen:\n\n{block.text}"
+                ),
             }],
             max_tokens=500,
             fallback="Entschuldigung, ich konnte deine Nachrichten gerade nicht zusammenfassen.",
+            route=self.router.route(len(messages), max_tokens=500),
         )
 
     async def answer_followup(
@@ -61,30 +84,101 @@ class LLMService:
         conversation_history: list[dict],
     ) -> str:
         """Beantwortet eine Rückfrage im Kontext der Nachrichten."""
-        system = FOLLOWUP_PROMPT.format(messages=_format_messages(messages))
+        answer = await self.draft_followup(question, messages, conversation_history)
         conversation_history.append({"role": "user", "content": question})
+        conversation_history.append({"role": "assistant", "content": answer})
+        return answer
 
-        answer = await self._call(
+    async def draft_followup(
+        self,
+        question: str,
+        messages: list[TelegramMessage],
+        conversation_history: list[dict],
+    ) -> str:
+        """Beantwortet eine Rückfrage, ohne die Conversation History zu verändern."""
+        block = build_message_block(messages)
+        block.record("followup")
+        system = FOLLOWUP_PROMPT.format(messages=block.text)
+
+        return await self._call(
             system=system,
-            messages=conversation_history,  # type: ignore
+            messages=[*conversation_history, {"role": "user", "content": question}],
             max_tokens=300,
             fallback="Entschuldigung, das habe ich nicht verstanden.",
+            route=self.router.route(len(messages), max_tokens=300, question=question),
         )
 
-        conversation_history.append({"role": "assistant", "content": answer})
-        return answer
-
     async def _call(
         self,
         system: str,
         messages: list[dict],
         max_tokens: int,
         fallback: str,
+        route: str,
     ) -> str:
-        """Sendet eine Anfrage an Claude mit einheitlichem Error-Handling."""
+        """Sendet eine Anfrage an Claude mit einheitlichem Error-Handling.
+
+        Wirft `Overloaded`, wenn der Scheduler keinen Slot vergeben kann.
+        Liefert die gewählte Route kein Ergebnis, wird im selben Slot auf
+        das starke Modell ausgewichen.
+        """
+        async with admission(self.scheduler, "llm"):
+            started = time.monotonic()
+            text = await self._attempt(route, system, messages, max_tokens)
+            if text is None and (retry := self.router.fallback(route)):
+                route = retry
+                text = await self._attempt(route, system, messages, max_tokens)
+        record(
+            "llm",
+            latency=round(time.monotonic() - started, 4),
+            text=text,
+            route=route,
+        )
+        return fallback if text is None else text
+
+    async def _attempt(
+        self,
+        route: str,
+        system: str,
+        messages: list[dict],
+        max_tokens: int,
+    ) -> str | None:
+        """Ein Versuch auf einer Route: adaptiver Timeout, Hedging nur für kurze Antworten.
+
+        Lange Zusammenfassungen werden nicht gehedged, da ein Duplikat dort
+        die Kosten verdoppeln würde.
+        """
+        model = self.router.models[route]
+        tracker = self.router.latency[route]
+        scale = token_scale(max_tokens)
+        started = time.monotonic()
+        text = await hedged(
+            tracker,
+            lambda: with_timeout(
+                tracker,
+                lambda: self._request(system, messages, max_tokens, model),
+                on_timeout=None,
+                scale=scale,
+            ),
+            succeeded=lambda t: t is not None,
+            scheduler=self.scheduler,
+            enabled=self.hedging and max_tokens <= LLM_HEDGE_MAX_TOKENS,
+            upstream="llm",
+        )
+        self.router.observe(route, time.monotonic() - started)
+        return text
+
+    async def _request(
+        self,
+        system: str,
+        messages: list[dict],
+        max_tokens: int,
+        model: str,
+    ) -> str | None:
+        """Führt den Claude-Request aus, liefert None bei Fehlern."""
         try:
             response = await self.client.messages.create(
-                model=self.model,
+                model=model,
                 max_tokens=max_tokens,
                 system=system,
                 messages=messages,  # type: ignore
@@ -99,12 +193,9 @@ class LLMService:
         except Exception as e:
             logger.error(f"Claude API unexpected error: {e}")
 
-        return fallback
+        return None
 
 
 def _format_messages(messages: list[TelegramMessage]) -> str:
-    """Formatiert Telegram-Nachrichten als lesbaren Text."""
-    return "\n".join(
-        f"[{m.timestamp.strftime('%H:%M')}] {m.sender}: {m.text}"
-        for m in messages
-    )
+    """Formatiert Telegram-Nachrichten als lesbaren Text (kompakt, im Token-Budget)."""
+    return build_message_block(messages).text
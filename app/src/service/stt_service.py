@@ -1,10 +1,18 @@
+import asyncio
 import logging
+from contextlib import AsyncExitStack, asynccontextmanager
 
+import httpx
 import websockets
 
+from src.core.config import DEEPGRAM_ENDPOINTING_MS, DEEPGRAM_TIMEOUT
+from src.core.scheduler import UpstreamScheduler, admission
+from src.core.trace import RecordingStream, current_trace
+
 logger = logging.getLogger(__name__)
 
 DEEPGRAM_STREAM_URL = "wss://api.deepgram.com/v1/listen"
+DEEPGRAM_PRERECORDED_URL = "https://api.deepgram.com/v1/listen"
 
 STREAM_PARAMS = "&".join([
     "encoding=mulaw",
@@ -13,19 +21,86 @@ STREAM_PARAMS = "&".join([
     "language=de",
     "model=nova-2",
     "punctuate=true",
-    "endpointing=2000",
+    "interim_results=true",
+    f"endpointing={DEEPGRAM_ENDPOINTING_MS}",
 ])
 
+# Aufgezeichnete Dateien (Sprachnachrichten): Format erkennt Deepgram selbst
+PRERECORDED_PARAMS = {
+    "language": "de",
+    "model": "nova-2",
+    "punctuate": "true",
+    "smart_format": "true",
+}
+
 
 class STTService:
     """Deepgram Streaming Speech-to-Text mit integrierter VAD."""
 
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, scheduler: UpstreamScheduler | None = None):
         self.api_key = api_key
+        self.scheduler = scheduler
+        self._http: httpx.AsyncClient | None = None
 
     def create_stream(self):
-        """Öffnet eine Streaming-Verbindung zu Deepgram mit VAD."""
+        """Öffnet eine Streaming-Verbindung zu Deepgram mit VAD.
+
+        Der Scheduler-Slot gilt nur für den Verbindungsaufbau — ein offener
+        Stream würde ihn sonst den ganzen Anruf lang belegen und die
+        Sprachnachrichten-Transkription aushungern. Wie viele Streams
+        gleichzeitig offen sind, begrenzt die Anruf-Kapazität.
+        """
+        connect = self._connect()
+        if recorder := current_trace.get():
+            connect = RecordingStream(connect, recorder)
+        return self._admitted(connect)
+
+    @asynccontextmanager
+    async def _admitted(self, connect):
+        async with AsyncExitStack() as stack:
+            async with admission(self.scheduler, "stt"):
+                dg_ws = await stack.enter_async_context(connect)
+            yield dg_ws
+
+    def _connect(self):
+        """Baut die rohe Deepgram-WebSocket-Verbindung (async Context Manager)."""
         return websockets.connect(
             f"{DEEPGRAM_STREAM_URL}?{STREAM_PARAMS}",
             additional_headers={"Authorization": f"Token {self.api_key}"},
         )
+
+    async def transcribe(self, audio: bytes, mimetype: str = "audio/ogg") -> str:
+        """Transkribiert eine aufgezeichnete Datei (leerer String bei Fehlern)."""
+        if self._http is None:
+            self._http = httpx.AsyncClient(timeout=DEEPGRAM_TIMEOUT)
+        try:
+            async with admission(self.scheduler, "stt"):
+                response = await self._http.post(
+                    DEEPGRAM_PRERECORDED_URL,
+                    params=PRERECORDED_PARAMS,
+                    content=audio,
+                    headers={
+                        "Authorization": f"Token {self.api_key}",
+                        "Content-Type": mimetype,
+                    },
+                )
+            response.raise_for_status()
+            channel = response.json()["results"]["channels"][0]
+            return channel["alternatives"][0]["transcript"].strip()
+        except (httpx.HTTPError, KeyError, IndexError) as e:
+            logger.error(f"Deepgram prerecorded error: {e!r}")
+            return ""
+
+    async def transcribe_batch(self, audios: list[bytes], concurrency: int) -> list[str]:
+        """Transkribiert mehrere Dateien parallel (höchstens `concurrency` gleichzeitig)."""
+        pool = asyncio.Semaphore(concurrency)
+
+        async def one(audio: bytes) -> str:
+            async with pool:
+                return await self.transcribe(audio)
+
+        return list(await asyncio.gather(*map(one, audios)))
+
+    async def aclose(self):
+        if self._http is not None:
+            await self._http.aclose()
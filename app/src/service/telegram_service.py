@@ -1,26 +1,57 @@
 import logging
-from datetime import datetime
-from zoneinfo import ZoneInfo
+import sys
+import time
 
 import httpx
 
-from src.core.config import TELEGRAM_TIMEOUT
-from src.models.telegramMessage import TelegramMessage
+from src.core.config import TELEGRAM_KEEPALIVE_EXPIRY, TELEGRAM_MAX_CONNECTIONS, TELEGRAM_TIMEOUT
+from src.core.trace import record
+from src.models.telegramMessage import TelegramMessage, VoiceNote
 
 logger = logging.getLogger(__name__)
 
 TELEGRAM_API_BASE = "https://api.telegram.org/bot{token}"
+TELEGRAM_FILE_BASE = "https://api.telegram.org/file/bot{token}"
+
+# Pro Bot wenige Requests pro Anruf — kleiner Pool statt httpx-Default (100)
+TELEGRAM_LIMITS = httpx.Limits(
+    max_connections=TELEGRAM_MAX_CONNECTIONS,
+    max_keepalive_connections=1,
+    keepalive_expiry=TELEGRAM_KEEPALIVE_EXPIRY,
+)
 
 
 class TelegramService:
     """Telegram Bot API: Nachrichten abrufen und als gelesen markieren."""
 
-    def __init__(self, bot_token: str):
+    def __init__(self, bot_token: str, limits: httpx.Limits = TELEGRAM_LIMITS):
         self.base_url = TELEGRAM_API_BASE.format(token=bot_token)
-        self.client = httpx.AsyncClient(timeout=TELEGRAM_TIMEOUT)
+        self.file_url = TELEGRAM_FILE_BASE.format(token=bot_token)
+        self.client = httpx.AsyncClient(timeout=TELEGRAM_TIMEOUT, limits=limits)
+
+    async def aclose(self):
+        """Schließt den Connection-Pool (z.B. wenn ein Tenant verdrängt wird)."""
+        await self.client.aclose()
+
+    async def get_messages(self, limit: int = 20) -> list[TelegramMessage] | None:
+        """Ruft die letzten Nachrichten via getUpdates ab (None, wenn Telegram nicht antwortet)."""
+        started = time.monotonic()
+        updates = await self._fetch_updates(limit)
+        record("telegram", latency=round(time.monotonic() - started, 4), updates=updates)
+        if updates is None:
+            return None
+
+        messages = [
+            msg
+            for update in updates
+            if (msg := self._parse_update(update)) is not None
+        ]
 
-    async def get_messages(self, limit: int = 20) -> list[TelegramMessage]:
-        """Ruft die letzten Nachrichten via getUpdates ab."""
+        logger.info(f"Retrieved {len(messages)} messages from Telegram")
+        return messages
+
+    async def _fetch_updates(self, limit: int) -> list[dict] | None:
+        """Lädt rohe Updates via getUpdates (None bei Fehlern — nicht mit "keine Updates" verwechseln)."""
         url = f"{self.base_url}/getUpdates"
         params = {"limit": limit, "allowed_updates": '["message"]'}
 
@@ -30,26 +61,32 @@ class TelegramService:
             data = response.json()
         except httpx.TimeoutException:
             logger.error("Telegram API timeout — API nicht erreichbar")
-            return []
+            return None
         except httpx.ConnectError:
             logger.error("Telegram API connection error — keine Verbindung")
-            return []
+            return None
         except httpx.HTTPError as e:
             logger.error(f"Telegram API error: {e}")
-            return []
+            return None
 
         if not data.get("ok"):
             logger.error(f"Telegram API returned error: {data}")
-            return []
+            return None
 
-        messages = [
-            msg
-            for update in data.get("result", [])
-            if (msg := self._parse_update(update)) is not None
-        ]
+        return data.get("result", [])
 
-        logger.info(f"Retrieved {len(messages)} messages from Telegram")
-        return messages
+    async def download_file(self, file_id: str) -> bytes:
+        """Lädt eine Datei (z.B. Sprachnachricht) via getFile (leer bei Fehlern)."""
+        try:
+            response = await self.client.get(f"{self.base_url}/getFile", params={"file_id": file_id})
+            response.raise_for_status()
+            file_path = response.json()["result"]["file_path"]
+            response = await self.client.get(f"{self.file_url}/{file_path}")
+            response.raise_for_status()
+        except (httpx.HTTPError, KeyError) as e:
+            logger.error(f"Telegram file download failed: {e!r}")
+            return b""
+        return response.content
 
     async def acknowledge(self, last_update_id: int):
         """Markiert Updates bis einschließlich last_update_id als gelesen."""
@@ -62,7 +99,19 @@ class TelegramService:
     def _parse_update(update: dict) -> TelegramMessage | None:
         """Parst ein Telegram-Update zu einer TelegramMessage."""
         msg = update.get("message")
-        if not msg or not msg.get("text"):
+        if not msg:
+            return None
+
+        text, voice = msg.get("text"), None
+        if not text and (note := msg.get("voice")):
+            # Transkript folgt später (VoiceNoteTranscriber), bis dahin Platzhalter
+            voice = VoiceNote(
+                file_id=note["file_id"],
+                file_unique_id=note["file_unique_id"],
+                duration=note.get("duration", 0),
+            )
+            text = voice.placeholder
+        if not text:
             return None
 
         sender = msg["from"].get("first_name", "Unbekannt")
@@ -70,10 +119,12 @@ class TelegramService:
             sender = f"{sender} {last_name}"
 
         return TelegramMessage(
-            sender=sender,
-            timestamp=datetime.fromtimestamp(msg["date"], tz=ZoneInfo("Europe/Berlin")),
-            text=msg["text"],
+            # Wenige Absender, viele Nachrichten — ein String-Objekt pro Name
+            sender=sys.intern(sender),
+            date=msg["date"],
+            text=text,
             chat_id=msg["chat"]["id"],
             message_id=msg["message_id"],
             update_id=update["update_id"],
+            voice=voice,
         )
@@ -1,32 +1,66 @@
-import asyncio
+import base64
 import io
 import logging
+import time
 
-import edge_tts
-
-from src.core.config import TTS_TIMEOUT
+from src.core.config import HEDGING_ENABLED, TTS_TIMEOUT
+from src.core.latency import get_tracker, hedged, with_timeout
+from src.core.scheduler import UpstreamScheduler, admission
+from src.core.trace import current_trace
 
 logger = logging.getLogger(__name__)
 
+# Latenzen werden auf diese Textlänge normiert (TTS-Dauer wächst mit dem Text)
+LATENCY_UNIT_CHARS = 200
+
 
 class TTSService:
     """Edge-TTS Text-to-Speech Synthese."""
 
-    def __init__(self, voice: str = "de-DE-ConradNeural"):
+    hedging = HEDGING_ENABLED
+
+    def __init__(
+        self,
+        voice: str = "de-DE-ConradNeural",
+        scheduler: UpstreamScheduler | None = None,
+    ):
         self.voice = voice
+        self.scheduler = scheduler
+        self.latency = get_tracker("tts", static_timeout=TTS_TIMEOUT)
 
     async def synthesize(self, text: str) -> bytes:
         """Wandelt Text in Audio-Bytes um (MP3)."""
         if not text:
             return b""
 
+        async with admission(self.scheduler, "tts"):
+            started = time.monotonic()
+            audio = await hedged(
+                self.latency,
+                lambda: self._synthesize_with_timeout(text),
+                succeeded=bool,
+                scheduler=self.scheduler,
+                enabled=self.hedging,
+                scale=_scale(text),
+            )
+        if recorder := current_trace.get():
+            recorder.write(
+                "tts",
+                latency=round(time.monotonic() - started, 4),
+                chars=len(text),
+                audio=base64.b64encode(audio).decode("ascii"),
+            )
+        return audio
+
+    async def _synthesize_with_timeout(self, text: str) -> bytes:
+        """TTS-Synthese mit adaptivem Timeout und einheitlichem Error-Handling."""
         try:
-            return await asyncio.wait_for(
-                self._do_synthesize(text), timeout=TTS_TIMEOUT
+            return await with_timeout(
+                self.latency,
+                lambda: self._do_synthesize(text),
+                on_timeout=b"",
+                scale=_scale(text),
             )
-        except asyncio.TimeoutError:
-            logger.error(f"TTS timeout nach {TTS_TIMEOUT}s für {len(text)} Zeichen")
-            return b""
         except ConnectionError as e:
             logger.error(f"TTS connection error: {e}")
             return b""
@@ -36,6 +70,8 @@ class TTSService:
 
     async def _do_synthesize(self, text: str) -> bytes:
         """Interne TTS-Synthese ohne Timeout-Wrapper."""
+        import edge_tts  # lazy: zieht aiohttp nach, erst beim ersten Aufruf nötig
+
         communicate = edge_tts.Communicate(text, self.voice)
         buffer = io.BytesIO()
 
@@ -44,4 +80,8 @@ class TTSService:
                 buffer.write(chunk["data"])  # type: ignore
 
         logger.info(f"TTS generated {buffer.tell()} bytes for {len(text)} chars")
-        return buffer.getvalue()
\ No newline at end of file
+        return buffer.getvalue()
+
+
+def _scale(text: str) -> float:
+    return max(1.0, len(text) / LATENCY_UNIT_CHARS)
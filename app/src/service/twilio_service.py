@@ -1,29 +1,159 @@
 import asyncio
+import hashlib
+import hmac
 import logging
 import os
+import time
+from contextlib import AsyncExitStack
+from xml.sax.saxutils import quoteattr
 
 from fastapi import WebSocket, WebSocketDisconnect
+from twilio.request_validator import RequestValidator
 
+from src.core.audio_utils import mulaw_to_base64_chunks
+from src.core.capacity import CallCapacity
+from src.core.config import (
+    CALL_MEMORY_BUDGET_BYTES,
+    PREFETCH_ENABLED,
+    STREAM_SIGNATURE_TTL,
+    TRACE_DIR,
+)
 from src.core.pipeline import Pipeline
-from src.core.service_provider import ServiceProvider
+from src.core.prefetch import CallPrefetcher
+from src.core.profiler import tag_task
+from src.core.tenants import TenantRegistry
+from src.core.trace import TraceRecorder, current_trace, record
+from src.core.transport import CallTransport
 
 logger = logging.getLogger(__name__)
 
 PUBLIC_URL = os.getenv("PUBLIC_URL", "localhost:8000")
+# Prüft X-Twilio-Signature der Webhooks und signiert die <Stream>-Parameter
+TWILIO_AUTH_TOKEN = os.getenv("TWILIO_AUTH_TOKEN", "")
+# Erlaubte Uhrabweichung zwischen Pods beim Stream-Zeitstempel (Sekunden)
+CLOCK_SKEW = 5
+
+REJECT_TWIML = """<?xml version="1.0" encoding="UTF-8"?>
+<Response>
+    <Reject />
+</Response>"""
+
+
+class TwilioTransport(CallTransport):
+    """Twilio Media Stream: Base64-mulaw-Frames, `clear` und `mark` als JSON-Events."""
+
+    # Pause nach jeder gesendeten Äußerung (Sekunden)
+    send_pause = 0.1
+
+    def __init__(self, ws: WebSocket, sid: str):
+        super().__init__()
+        self.ws = ws
+        self.sid = sid
+        # Gesendete, von Twilio noch nicht zurückgemeldete Marks
+        self._pending_marks: set[str] = set()
+
+    async def send_audio(self, mulaw: bytes | memoryview):
+        await self.send_frames(mulaw_to_base64_chunks(mulaw), len(mulaw))
+
+    async def send_frames(self, frames: list[str], n_bytes: int):
+        logger.info(f"Sending {len(frames)} audio chunks to Twilio")
+        for chunk in frames:
+            await self.ws.send_json({
+                "event": "media",
+                "streamSid": self.sid,
+                "media": {"payload": chunk},
+            })
+
+        await asyncio.sleep(self.send_pause)
+
+    async def clear(self):
+        await self.ws.send_json({"event": "clear", "streamSid": self.sid})
+        # Twilio meldet die Marks des verworfenen Audios sofort zurück
+        self._pending_marks.clear()
+
+    async def mark(self, name: str):
+        self._pending_marks.add(name)
+        await self.ws.send_json({"event": "mark", "streamSid": self.sid, "mark": {"name": name}})
+
+    async def end(self):
+        # Ohne weitere TwiML nach <Connect> legt Twilio auf, sobald der Stream schließt
+        try:
+            await self.ws.close()
+        except RuntimeError:
+            pass  # Twilio hat bereits geschlossen
+
+    def on_mark(self, name: str):
+        """Twilio hat das Audio bis zu diesem Mark abgespielt."""
+        self._pending_marks.discard(name)
+
+    @property
+    def playing(self) -> bool:
+        return bool(self._pending_marks)
 
 
 class TwilioService:
     """Kapselt die Twilio-Logik: TwiML-Generierung und Media-Stream-Handling."""
 
-    def __init__(self, services: ServiceProvider):
-        self.services = services
+    def __init__(
+        self,
+        tenants: TenantRegistry,
+        capacity: CallCapacity | None = None,
+        prefetch: bool = PREFETCH_ENABLED,
+        signature_ttl: float = STREAM_SIGNATURE_TTL,
+    ):
+        if not TWILIO_AUTH_TOKEN:
+            # Ohne Token wären Webhook-Prüfung und Stream-Signatur mit leerem Schlüssel fälschbar
+            raise RuntimeError("TWILIO_AUTH_TOKEN is not set, refusing to start")
+        self.validator = RequestValidator(TWILIO_AUTH_TOKEN)
+        self.signature_ttl = signature_ttl
+        # Bereits gestartete Streams (CallSid → Zeitstempel), gegen Wiederverwendung
+        self._used_streams: dict[str, int] = {}
+        self.tenants = tenants
+        self.capacity = capacity or CallCapacity()
+        # Laufende Anrufe nach streamSid (für Admin-Endpoints)
+        self.pipelines: dict[str, Pipeline] = {}
+        # Ein Trace muss Telegram- und Claude-Antworten des Anrufs enthalten — kein Prefetch
+        self.prefetcher = (
+            CallPrefetcher(tenants, max_pending=self.capacity.max_calls)
+            if prefetch and not TRACE_DIR else None
+        )
+
+    def validate_webhook(self, path: str, params: dict[str, str], signature: str) -> bool:
+        """Prüft `X-Twilio-Signature` gegen die öffentliche URL, die Twilio aufgerufen hat."""
+        return self.validator.validate(f"https://{PUBLIC_URL}{path}", params, signature)
+
+    def generate_twiml(self, called: str, caller: str, call_sid: str) -> str:
+        """Erzeugt TwiML-Response für eingehende Anrufe (nur nach geprüfter Signatur aufrufen).
+
+        Der Tenant wird über die angerufene bzw. anrufende Nummer bestimmt
+        und als signierter Parameter an den Media Stream übergeben. Die
+        Signatur bindet Tenant, CallSid und Zeitstempel, damit sie nur für
+        diesen Anruf und nur einmal gilt. Hier startet auch schon der Prefetch.
+        """
+        tenant_id = self.tenants.resolve(called, caller)
+        if tenant_id is None or not call_sid:
+            logger.warning(f"No tenant for call {caller} -> {called}, rejecting")
+            return REJECT_TWIML
+
+        prefetch = ""
+        if self.prefetcher and self.capacity.unavailable_reason() is None:
+            if self.prefetcher.start(call_sid, tenant_id, caller):
+                prefetch = "1"
+        params = {"tenant": tenant_id, "call_sid": call_sid, "timestamp": str(int(time.time()))}
+        if prefetch:
+            params["prefetch"] = prefetch
+        params["signature"] = _sign(tenant_id, call_sid, params["timestamp"], prefetch)
+        parameters = "\n".join(
+            f'            <Parameter name="{name}" value={quoteattr(value)} />'
+            for name, value in params.items()
+        )
 
-    def generate_twiml(self) -> str:
-        """Erzeugt TwiML-Response für eingehende Anrufe."""
         return f"""<?xml version="1.0" encoding="UTF-8"?>
 <Response>
     <Connect>
-        <Stream url="wss://{PUBLIC_URL}/twilio/media-stream" />
+        <Stream url="wss://{PUBLIC_URL}/twilio/media-stream">
+{parameters}
+        </Stream>
     </Connect>
 </Response>"""
 
@@ -33,8 +163,10 @@ class TwilioService:
         logger.info("Twilio WebSocket connected")
 
         stream_sid = None
+        transport = None
         pipeline = None
-        pipeline_task = None
+        recorder = None
+        leases = AsyncExitStack()
 
         try:
             async for message in ws.iter_json():
@@ -45,25 +177,54 @@ class TwilioService:
 
                 elif event == "start":
                     stream_sid = message["start"]["streamSid"]
-                    logger.info(f"Stream started: {stream_sid}")
+                    params = message["start"].get("customParameters", {})
+                    call_sid = message["start"].get("callSid", "")
+                    if not self.verify_stream(params, call_sid):
+                        logger.warning(f"Invalid, stale or reused signature on stream {stream_sid}")
+                        break
+                    tenant_id = params["tenant"]
+                    logger.info(f"Stream started: {stream_sid} (tenant '{tenant_id}')")
+                    # JSON-Parsing und Base64 der Media-Events laufen in diesem Task
+                    tag_task(stream_sid, "media")
+                    services = await leases.enter_async_context(self.tenants.lease(tenant_id))
 
-                    pipeline = Pipeline(
-                        ws=ws,
-                        stream_sid=stream_sid,
-                        services=self.services,
+                    # Opt-in Call-Trace; der Pipeline-Task erbt den Kontext
+                    recorder = TraceRecorder.for_call(stream_sid)
+                    current_trace.set(recorder)
+                    record("start", sid=stream_sid)
+
+                    prefetch = (
+                        self.prefetcher.claim(call_sid)
+                        if self.prefetcher and params.get("prefetch") else None
                     )
 
-                    pipeline_task = asyncio.create_task(pipeline.run())
+                    transport = TwilioTransport(ws, stream_sid)
+                    pipeline = Pipeline(transport=transport, services=services, prefetch=prefetch)
+                    pipeline.supervisor.register(ws, "socket")
+                    self.pipelines[stream_sid] = pipeline
+                    self.capacity.call_started()
+
+                    pipeline.supervisor.spawn(pipeline.run(), name=f"pipeline-{stream_sid}")
 
                 elif event == "media":
                     if pipeline:
                         payload = message["media"]["payload"]
+                        record("in", p=payload)
                         pipeline.feed_audio(payload)
 
+                elif event == "dtmf":
+                    if transport:
+                        transport.keypress(message["dtmf"]["digit"])
+
+                elif event == "mark":
+                    if transport:
+                        transport.on_mark(message["mark"]["name"])
+
                 elif event == "stop":
                     logger.info(f"Stream stopped: {stream_sid}")
-                    if pipeline:
-                        pipeline.audio_queue.put_nowait(None)
+                    record("stop")
+                    if transport:
+                        transport.receive(None)
                     break
 
         except WebSocketDisconnect:
@@ -71,6 +232,54 @@ class TwilioService:
         except Exception as e:
             logger.error(f"WebSocket error: {e}")
         finally:
-            if pipeline_task and not pipeline_task.done():
-                pipeline_task.cancel()
+            if pipeline:
+                # Pipeline und alle Kind-Tasks abbrechen und (begrenzt) abwarten
+                await pipeline.supervisor.aclose()
+            if stream_sid and self.pipelines.pop(stream_sid, None):
+                self.capacity.call_ended()
+            if recorder:
+                recorder.close()
+            await leases.aclose()
             logger.info(f"WebSocket session ended: {stream_sid}")
+
+    def verify_stream(self, params: dict[str, str], call_sid: str) -> bool:
+        """Prüft die <Stream>-Parameter: gültige Signatur, passende CallSid, frisch, unbenutzt.
+
+        Verbraucht die Signatur — ein zweiter Stream mit denselben
+        Parametern wird abgelehnt. Der Schutz gegen Wiederverwendung gilt
+        pro Pod; über Pods hinweg begrenzt ihn `signature_ttl`.
+        """
+        tenant_id = params.get("tenant", "")
+        timestamp = params.get("timestamp", "")
+        expected = _sign(tenant_id, params.get("call_sid", ""), timestamp, params.get("prefetch", ""))
+        if not hmac.compare_digest(params.get("signature", ""), expected):
+            return False
+        if not call_sid or params.get("call_sid") != call_sid:
+            return False
+
+        now = int(time.time())
+        age = now - int(timestamp)
+        if not -CLOCK_SKEW <= age <= self.signature_ttl:
+            return False
+        # Abgelaufene Einträge braucht es nicht mehr: ihre Zeitstempel wären ohnehin zu alt
+        self._used_streams = {
+            sid: ts for sid, ts in self._used_streams.items() if now - ts <= self.signature_ttl
+        }
+        if call_sid in self._used_streams:
+            return False
+        self._used_streams[call_sid] = int(timestamp)
+        return True
+
+    def memory_report(self) -> dict:
+        """Speicher pro laufendem Anruf (Bytes) plus Summe und Budget."""
+        calls = {sid: p.memory_usage() for sid, p in self.pipelines.items()}
+        return {
+            "calls": calls,
+            "total": sum(usage["total"] for usage in calls.values()),
+            "budget_per_call": CALL_MEMORY_BUDGET_BYTES,
+        }
+
+
+def _sign(*parts: str) -> str:
+    message = ":".join(parts)
+    return hmac.new(TWILIO_AUTH_TOKEN.encode(), message.encode(), hashlib.sha256).hexdigest()
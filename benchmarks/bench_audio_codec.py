@@ -0,0 +1,109 @@
+"""
+Benchmark: NumPy-Codec (src.core.audio_codec) gegen audioop/pydub.
+
+Nutzung: uv run python benchmarks/bench_audio_codec.py
+
+Misst µ-law Encode/Decode, Resampling 24 kHz → 8 kHz und — falls ffmpeg
+verfügbar ist — die komplette MP3 → mulaw Konvertierung. Der Vergleich mit
+audioop läuft nur, wenn audioop importierbar ist (Dev-Dependency audioop-lts).
+"""
+
+import io
+import shutil
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+import numpy as np
+
+from src.core.audio_codec import decode_mulaw, encode_mulaw, resample
+from src.core.audio_utils import mp3_to_mulaw
+
+try:
+    import audioop
+except ImportError:
+    audioop = None
+
+SECONDS = 60
+REPEAT = 5
+
+
+def _synthetic_speech(rate: int, seconds: int = SECONDS) -> np.ndarray:
+    """Sprachähnliches Testsignal: modulierte Harmonische plus Rauschen."""
+    rng = np.random.default_rng(0)
+    t = np.arange(rate * seconds) / rate
+    f0 = 120 + 30 * np.sin(2 * np.pi * 0.5 * t)
+    phase = 2 * np.pi * np.cumsum(f0) / rate
+    voiced = sum(np.sin(k * phase) / k for k in range(1, 12))
+    envelope = 0.5 + 0.5 * np.sin(2 * np.pi * 3 * t)
+    signal = 6000 * voiced * envelope + 300 * rng.standard_normal(len(t))
+    return np.clip(signal, -32768, 32767).astype(np.int16)
+
+
+def _bench(label: str, fn) -> float:
+    best = min(timeit.repeat(fn, number=1, repeat=REPEAT))
+    print(f"  {label:<28}{best * 1000:>10.2f} ms")
+    return best
+
+
+def _section(title: str, new, old=None):
+    print(title)
+    t_new = _bench("numpy", new)
+    if old is not None:
+        t_old = _bench("audioop/pydub", old)
+        print(f"  {'Speedup':<28}{t_old / t_new:>10.1f}x")
+    print()
+
+
+def main():
+    pcm_24k = _synthetic_speech(24000)
+    pcm_8k = _synthetic_speech(8000)
+    pcm_8k_bytes = pcm_8k.tobytes()
+    mulaw = bytes(encode_mulaw(pcm_8k))
+
+    print(f"Audio-Codec Benchmark ({SECONDS} s Sprache, best of {REPEAT})\n")
+
+    _section(
+        "µ-law Encode (8 kHz)",
+        lambda: encode_mulaw(pcm_8k),
+        (lambda: audioop.lin2ulaw(pcm_8k_bytes, 2)) if audioop else None,
+    )
+    _section(
+        "µ-law Decode (8 kHz)",
+        lambda: decode_mulaw(mulaw),
+        (lambda: audioop.ulaw2lin(mulaw, 2)) if audioop else None,
+    )
+    pcm_24k_bytes = pcm_24k.tobytes()
+    _section(
+        "Resampling 24 kHz → 8 kHz",
+        lambda: resample(pcm_24k, 24000, 8000),
+        (lambda: audioop.ratecv(pcm_24k_bytes, 2, 1, 24000, 8000, None)) if audioop else None,
+    )
+
+    if not shutil.which("ffmpeg"):
+        print("MP3 → mulaw: übersprungen (ffmpeg nicht gefunden)")
+        return
+
+    from pydub import AudioSegment
+
+    segment = AudioSegment(data=pcm_24k_bytes, sample_width=2, frame_rate=24000, channels=1)
+    buffer = io.BytesIO()
+    segment.export(buffer, format="mp3", bitrate="48k")
+    mp3_bytes = buffer.getvalue()
+
+    def legacy_mp3_to_mulaw():
+        audio = AudioSegment.from_mp3(io.BytesIO(mp3_bytes))
+        audio = audio.set_frame_rate(8000).set_channels(1).set_sample_width(2)
+        return audioop.lin2ulaw(audio.raw_data, 2)
+
+    _section(
+        "MP3 → mulaw (komplett)",
+        lambda: mp3_to_mulaw(mp3_bytes),
+        legacy_mp3_to_mulaw if audioop else None,
+    )
+
+
+if __name__ == "__main__":
+    main()
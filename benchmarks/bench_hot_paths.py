@@ -0,0 +1,234 @@
+"""
+Benchmark: Hot Paths pro Anruf, mit gespeicherter Baseline und Regressionsschwelle.
+
+Nutzung: uv run python benchmarks/bench_hot_paths.py [--calls 20] [--save] [--threshold 1.25]
+
+Läuft offline mit synthetischem Audio und synthetischen Telegram-Updates:
+  - chunks        mulaw_to_base64_chunks, 60 s Zusammenfassung
+  - mp3           mp3_to_mulaw, 60 s (nur mit ffmpeg; sonst übersprungen)
+  - transcode     Resampling 24 kHz → 8 kHz + µ-law Encode, 60 s (mp3_to_mulaw ohne Decode)
+  - feed_audio    Pipeline.feed_audio, 50 Frames/s × 10 s × --calls Anrufe
+  - send_audio    TwilioTransport.send_audio, 60 s als JSON-Media-Events
+  - parse_update  TelegramService._parse_update, 500 Updates Rückstau
+  - format        _format_messages, 500 Nachrichten
+
+Ohne --save wird gegen benchmarks/baselines/hot_paths.json verglichen; ist ein
+Fall auch nach einer Nachmessung langsamer als `threshold` × Baseline (für
+rauschanfällige Fälle gilt der größere Wert aus THRESHOLDS) oder fehlt für
+einen gemessenen Fall die Baseline, endet das Skript mit Exit-Code 1.
+Verglichen wird der Median aus REPEAT Messungen, geteilt durch den Median
+eines festen Kalibrier-Laufs, damit eine auf einem anderen Rechner
+gespeicherte Baseline vergleichbar bleibt.
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import shutil
+import statistics
+import subprocess
+import sys
+import timeit
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+import numpy as np
+
+from bench_audio_codec import _synthetic_speech
+from src.core.audio_codec import encode_mulaw, resample
+from src.core.audio_utils import mp3_to_mulaw, mulaw_to_base64_chunks
+from src.core.pipeline import Pipeline
+from src.core.transport import InMemoryTransport
+from src.service.llm_service import _format_messages
+from src.service.telegram_service import TelegramService
+from src.service.twilio_service import TwilioTransport
+
+BASELINE_FILE = Path(__file__).resolve().parent / "baselines" / "hot_paths.json"
+
+SECONDS = 60
+BACKLOG = 500
+FRAMES_PER_SECOND = 50  # Twilio: 20 ms pro eingehendem Frame
+FRAME_BYTES = 160
+CALL_SECONDS = 10
+REPEAT = 7
+
+CASES = ("chunks", "mp3", "transcode", "feed_audio", "send_audio", "parse_update", "format")
+# Reine Python-Fälle mit vielen kurzlebigen Objekten streuen stärker (GC, Allokator)
+THRESHOLDS = {"parse_update": 1.4, "format": 1.4}
+
+SENDERS = [("Anna", "Schmidt"), ("Ben", None), ("Clara", "Weber"), ("Deniz", None), ("Emil", "Braun")]
+
+
+def _synthetic_updates(n: int = BACKLOG) -> list[dict]:
+    """Telegram-Rückstau: überwiegend Text, jede zehnte eine Sprachnachricht."""
+    rng = np.random.default_rng(1)
+    words = "ich bin heute später zuhause kannst du bitte noch milch und brot mitbringen danke".split()
+    updates = []
+    for i in range(n):
+        first, last = SENDERS[i % len(SENDERS)]
+        sender = {"id": i % len(SENDERS), "first_name": first}
+        if last:
+            sender["last_name"] = last
+        msg = {
+            "message_id": 1000 + i,
+            "from": sender,
+            "chat": {"id": 42 + i % len(SENDERS)},
+            "date": 1_760_000_000 + 30 * i,
+        }
+        if i % 10 == 9:
+            msg["voice"] = {"file_id": f"F{i}", "file_unique_id": f"U{i}", "duration": 7}
+        else:
+            msg["text"] = " ".join(rng.choice(words, size=int(rng.integers(3, 40))))
+        updates.append({"update_id": 500_000 + i, "message": msg})
+    return updates
+
+
+def _calibrate():
+    """Fester Referenz-Lauf (Python-Schleife + NumPy) zur Normalisierung."""
+    data = np.arange(200_000, dtype=np.int32)
+    total = 0
+    for i in range(200_000):
+        total += i & 7
+    return total + int(np.sum(data * data))
+
+
+class _CollectingWebSocket:
+    """Starlette-ähnlicher WebSocket: serialisiert wie `send_json`, sendet nicht."""
+
+    def __init__(self):
+        self.sent = 0
+
+    async def send_json(self, data: dict):
+        json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+        self.sent += 1
+
+
+class _BenchTwilioTransport(TwilioTransport):
+    send_pause = 0
+
+
+def _cases(calls: int) -> dict:
+    pcm_24k = _synthetic_speech(24000, SECONDS)
+    mulaw = bytes(encode_mulaw(_synthetic_speech(8000, SECONDS)))
+
+    frame = base64.b64encode(mulaw[:FRAME_BYTES]).decode("ascii")
+    pipelines = [
+        Pipeline(transport=InMemoryTransport(sid=f"BENCH{i}"), services=SimpleNamespace())  # type: ignore
+        for i in range(calls)
+    ]
+    frames_per_call = FRAMES_PER_SECOND * CALL_SECONDS
+
+    def feed_audio():
+        # Frames im Wechsel über alle Anrufe, wie sie im Event-Loop ankommen
+        for _ in range(frames_per_call):
+            for pipeline in pipelines:
+                pipeline.feed_audio(frame)
+
+    loop = asyncio.new_event_loop()
+    transport = _BenchTwilioTransport(_CollectingWebSocket(), "MZBENCH")  # type: ignore
+
+    updates = _synthetic_updates()
+    messages = [m for u in updates if (m := TelegramService._parse_update(u)) is not None]
+
+    cases = {
+        "chunks": lambda: mulaw_to_base64_chunks(mulaw),
+        "transcode": lambda: encode_mulaw(resample(pcm_24k, 24000, 8000)),
+        "feed_audio": feed_audio,
+        "send_audio": lambda: loop.run_until_complete(transport.send_audio(mulaw)),
+        "parse_update": lambda: [TelegramService._parse_update(u) for u in updates],
+        "format": lambda: _format_messages(messages),
+    }
+    if shutil.which("ffmpeg"):
+        mp3_bytes = subprocess.run(
+            [
+                "ffmpeg", "-hide_banner", "-loglevel", "error",
+                "-f", "s16le", "-ar", "24000", "-ac", "1", "-i", "pipe:0",
+                "-f", "mp3", "-b:a", "48k", "pipe:1",
+            ],
+            input=pcm_24k.tobytes(),
+            capture_output=True,
+            check=True,
+        ).stdout
+        cases["mp3"] = lambda: mp3_to_mulaw(mp3_bytes)
+    return cases
+
+
+def _median(fn) -> float:
+    """Median-Zeit pro Aufruf; kurze Fälle laufen mehrfach pro Messung (≥ 0.2 s)."""
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    return statistics.median(timer.repeat(number=number, repeat=REPEAT)) / number
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--calls", type=int, default=20, help="gleichzeitige Anrufe für feed_audio")
+    parser.add_argument("--threshold", type=float, default=1.25, help="erlaubter Faktor gegenüber der Baseline")
+    parser.add_argument("--save", action="store_true", help="Ergebnis als neue Baseline speichern")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_FILE)
+    args = parser.parse_args()
+
+    cases = _cases(args.calls)
+    calibration = _median(_calibrate)
+    results = {name: _median(cases[name]) for name in CASES if name in cases}
+    # vor und nach den Fällen — kurzzeitige Last auf dem Rechner verzerrt sonst alle Faktoren
+    calibration = min(calibration, _median(_calibrate))
+
+    if args.save:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(
+            {"calls": args.calls, "calibration": calibration, "results": results},
+            indent=2,
+        ) + "\n")
+        print(f"Baseline gespeichert: {args.baseline}")
+
+    baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() else None
+    if baseline and baseline["calls"] != args.calls:
+        print(f"Baseline mit --calls {baseline['calls']} gemessen — Vergleich übersprungen")
+        baseline = None
+
+    def factor(name: str) -> float | None:
+        base = baseline["results"].get(name) if baseline else None
+        return (results[name] / calibration) / (base / baseline["calibration"]) if base else None
+
+    def threshold(name: str) -> float:
+        return max(args.threshold, THRESHOLDS.get(name, 0))
+
+    # Ausreißer einmal nachmessen, bevor sie als Regression zählen
+    for name in results:
+        if (f := factor(name)) is not None and f > threshold(name):
+            results[name] = min(results[name], _median(cases[name]))
+
+    print(f"Hot-Path Benchmark ({SECONDS} s Audio, {BACKLOG} Updates, {args.calls} Anrufe, median of {REPEAT})\n")
+    print(f"  {'Fall':<16}{'ms':>10}{'Baseline':>12}{'Faktor':>10}")
+    regressions = []
+    missing = []
+    for name in CASES:
+        if name not in results:
+            print(f"  {name:<16}{'übersprungen (ffmpeg nicht gefunden)':>32}")
+            continue
+        line = f"  {name:<16}{results[name] * 1000:>10.2f}"
+        if (f := factor(name)) is not None:
+            line += f"{baseline['results'][name] * 1000:>12.2f}{f:>9.2f}x"
+            if f > threshold(name):
+                regressions.append(name)
+                line += "  REGRESSION"
+        elif baseline:
+            # Ohne Eintrag würde eine Regression in diesem Fall nie auffallen
+            missing.append(name)
+            line += f"{'fehlt':>12}"
+        print(line)
+
+    if missing:
+        print(f"\nKeine Baseline für: {', '.join(missing)} — mit --save neu aufnehmen")
+    if regressions:
+        print(f"\nLangsamer als erlaubt gegenüber der Baseline: {', '.join(regressions)}")
+    if missing or regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
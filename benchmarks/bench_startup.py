@@ -0,0 +1,71 @@
+"""
+Benchmark: Import-Zeit und Time-to-Ready des Servers.
+
+Nutzung: uv run python benchmarks/bench_startup.py [--runs 5]
+
+Jeder Lauf startet einen frischen Interpreter (kalte Module) und misst:
+  - import   `import src.endpoint` (was uvicorn vor dem Binden des Ports lädt)
+  - build    Lifespan-Start: schwere Imports + Service-Aufbau
+  - ready    Import bis Readiness (inkl. Warm-up der statischen Ansagen)
+
+Das Warm-up spricht edge-tts an; ohne Netz zählt bis `WARMUP_TIMEOUT`.
+Die Ergebnisse eignen sich zum Vergleich zwischen Releases (--json).
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+APP_DIR = Path(__file__).resolve().parent.parent / "app"
+
+PROBE = """
+import asyncio, json, time
+t0 = time.perf_counter()
+from src.endpoint import app
+t_import = time.perf_counter() - t0
+
+async def main():
+    async with app.router.lifespan_context(app):
+        t_build = time.perf_counter() - t0
+        await app.state.ready.wait()
+        t_ready = time.perf_counter() - t0
+    print(json.dumps({"import": t_import, "build": t_build - t_import, "ready": t_ready}))
+
+asyncio.run(main())
+"""
+
+
+def _run_once() -> dict[str, float]:
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE],
+        cwd=APP_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--json", action="store_true", help="Median als JSON ausgeben")
+    args = parser.parse_args()
+
+    runs = [_run_once() for _ in range(args.runs)]
+    medians = {phase: statistics.median(r[phase] for r in runs) for phase in runs[0]}
+
+    if args.json:
+        print(json.dumps(medians))
+        return
+
+    print(f"Startup Benchmark (Median aus {args.runs} kalten Starts)\n")
+    for phase, seconds in medians.items():
+        print(f"  {phase:<28}{seconds * 1000:>10.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,48 @@
 """Tests für den AI-Powered Messenger-Anrufbeantworter."""
 
+import asyncio
 import base64
+import json
+import os
+import time
 from datetime import datetime
 from zoneinfo import ZoneInfo
 
+import httpx
 from fastapi.testclient import TestClient
 
-from src.core.audio_utils import mulaw_to_base64_chunks
+# TwilioService startet nicht ohne Auth-Token (Webhook- und Stream-Signaturen)
+os.environ.setdefault("TWILIO_AUTH_TOKEN", "test-auth-token")
+
+import numpy as np
+import pytest
+
+from src.core.archive import MessageArchive
+from src.core.audio_codec import decode_mulaw, encode_mulaw, resample
+from src.core.audio_utils import mulaw_to_base64_chunks, mulaw_to_wav
+from src.core.call_memory import AudioQueue, trim_to_budget
+from src.core.digest import DigestRenderer
+from src.core.capacity import CallCapacity
+from src.core.latency import HEDGE_TOTAL, HEDGE_WINS, LatencyTracker, hedged, with_timeout
+from src.core.model_router import FAST, ROUTE_FALLBACK_TOTAL, STRONG, ModelRouter
 from src.core.pipeline import GOODBYE_WORDS, GREETING
-from src.models.telegramMessage import TelegramMessage
+from src.core.profiler import ProfilerBusy, SamplingProfiler, tag_task
+from src.core.prompt_builder import (
+    PromptStats,
+    build_message_block,
+    current_prompt_stats,
+    estimate_tokens,
+)
+from src.core.replay import analyze, compare, replay
+from src.core.scheduler import QUEUE_WAIT_SECONDS, Overloaded, Priority, UpstreamScheduler
+from src.core.speculation import SpeculativeExecutor, normalize_transcript
+from src.core.tenants import TenantRegistry
+from src.core.transport import InMemoryTransport
+from src.core.trace import TraceRecorder, load_trace
+from src.core.vad import FRAME_SAMPLES, VoiceActivityDetector
+from src.core.voice_notes import VoiceNoteTranscriber
+from src.models.telegramMessage import TelegramMessage, VoiceNote
+from src.models.tenant import Tenant
 from src.service.llm_service import _format_messages
 from src.service.telegram_service import TelegramService
 
@@ -28,7 +62,7 @@ SAMPLE_UPDATE = {
 
 SAMPLE_MESSAGE = TelegramMessage(
     sender="Max Müller",
-    timestamp=datetime(2024, 1, 15, 14, 30, tzinfo=ZoneInfo("Europe/Berlin")),
+    date=int(datetime(2024, 1, 15, 14, 30, tzinfo=ZoneInfo("Europe/Berlin")).timestamp()),
     text="Kommst du heute Abend?",
     chat_id=42,
     message_id=1,
@@ -40,19 +74,77 @@ SAMPLE_MESSAGE = TelegramMessage(
 
 
 class TestEndpoints:
-    def test_health_returns_ok(self):
+    @pytest.fixture
+    def client(self):
         from src.endpoint import app
-        response = TestClient(app).get("/health")
+        with TestClient(app) as client:
+            yield client
+
+    def test_health_returns_ok(self, client):
+        response = client.get("/health")
         assert response.status_code == 200
         assert response.json() == {"status": "ok"}
 
-    def test_voice_returns_twiml(self):
+    def test_not_ready_before_warmup(self):
         from src.endpoint import app
-        response = TestClient(app).post("/twilio/voice")
+        response = TestClient(app).get("/ready")
+        assert response.status_code == 503
+
+    def test_metrics_exposed(self, client):
+        response = client.get("/metrics")
+        assert response.status_code == 200
+        assert "speculation_total" in response.text
+
+    def test_profile_returns_collapsed_stacks_and_rate_limits(self):
+        from src.endpoint import app
+        with TestClient(app, client=("127.0.0.1", 50000)) as client:
+            response = client.get("/admin/profile", params={"seconds": 0.1})
+            assert response.status_code == 200
+            assert "call:" in response.text or "thread:" in response.text
+            assert client.get("/admin/profile", params={"seconds": 0.1}).status_code == 429
+
+    def test_profile_requires_admin(self, client):
+        assert client.get("/admin/profile", params={"seconds": 0.1}).status_code == 403
+
+    def test_voice_returns_twiml(self, client):
+        from twilio.request_validator import RequestValidator
+
+        from src.service.twilio_service import PUBLIC_URL, TWILIO_AUTH_TOKEN
+
+        client.app.state.twilio.prefetcher = None  # kein echter Telegram-Abruf im Test
+        form = {"CallSid": "CA1", "From": "+4900", "To": "+4911", "CallerName": ""}
+        signature = RequestValidator(TWILIO_AUTH_TOKEN).compute_signature(
+            f"https://{PUBLIC_URL}/twilio/voice", form
+        )
+        response = client.post("/twilio/voice", data=form, headers={"X-Twilio-Signature": signature})
         assert response.status_code == 200
         assert "<Response>" in response.text
         assert "<Stream" in response.text
 
+    def test_voice_rejects_invalid_signature(self, client):
+        form = {"CallSid": "CA1", "From": "+4900", "To": "+4911"}
+        response = client.post("/twilio/voice", data=form, headers={"X-Twilio-Signature": "falsch"})
+        assert response.status_code == 403
+        assert client.post("/twilio/voice", data=form).status_code == 403
+
+    def test_import_defers_heavy_dependencies(self):
+        import subprocess
+        import sys
+        from pathlib import Path
+
+        code = (
+            "import sys; import src.endpoint; "
+            "print(','.join(m for m in ('anthropic', 'edge_tts') if m in sys.modules))"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", code],
+            capture_output=True,
+            text=True,
+            cwd=Path(__file__).resolve().parent.parent / "app",
+            check=True,
+        )
+        assert result.stdout.strip() == ""
+
 
 # ── Telegram Parsing ──
 
@@ -86,6 +178,31 @@ class TestTelegramParsing:
     def test_parse_update_without_message_returns_none(self):
         assert TelegramService._parse_update({"update_id": 1}) is None
 
+    @pytest.mark.parametrize("respond", [
+        lambda request: httpx.Response(500),
+        lambda request: httpx.Response(200, json={"ok": False, "description": "Unauthorized"}),
+        lambda request: (_ for _ in ()).throw(httpx.ReadTimeout("timeout", request=request)),
+        lambda request: (_ for _ in ()).throw(httpx.ConnectError("refused", request=request)),
+    ], ids=["http_500", "not_ok", "timeout", "connect_error"])
+    async def test_get_messages_returns_none_on_error(self, respond):
+        telegram = TelegramService(bot_token="test")
+        telegram.client = httpx.AsyncClient(transport=httpx.MockTransport(respond))
+        assert await telegram.get_messages() is None
+        await telegram.aclose()
+
+    def test_parse_voice_update_uses_placeholder(self):
+        update = {
+            "update_id": 1,
+            "message": {
+                "message_id": 1, "from": {"first_name": "Anna"}, "chat": {"id": 1},
+                "date": 1700000000,
+                "voice": {"file_id": "f1", "file_unique_id": "u1", "duration": 12},
+            },
+        }
+        result = TelegramService._parse_update(update)
+        assert result.voice.file_unique_id == "u1"
+        assert result.text == "(Sprachnachricht, 12 s)"
+
 
 # ── Nachrichtenformatierung ──
 
@@ -98,7 +215,7 @@ class TestFormatMessages:
     def test_format_multiple(self):
         msg2 = TelegramMessage(
             sender="Anna",
-            timestamp=datetime(2024, 1, 15, 15, 0, tzinfo=ZoneInfo("Europe/Berlin")),
+            date=int(datetime(2024, 1, 15, 15, 0, tzinfo=ZoneInfo("Europe/Berlin")).timestamp()),
             text="OK",
             chat_id=1, message_id=2, update_id=101,
         )
@@ -110,6 +227,91 @@ class TestFormatMessages:
         assert _format_messages([]) == ""
 
 
+# ── Prompt-Builder ──
+
+
+def _chat(*entries, start=SAMPLE_MESSAGE.date):
+    return [
+        TelegramMessage(
+            sender=sender, date=start + 60 * i, text=text,
+            chat_id=1, message_id=i, update_id=100 + i,
+        )
+        for i, (sender, text) in enumerate(entries)
+    ]
+
+
+class TestPromptBuilder:
+    def test_merges_consecutive_sender_messages(self):
+        block = build_message_block(_chat(("Anna", "Hallo"), ("Anna", "Bist du da?"), ("Max", "Ja")))
+        assert block.text == "[14:30] Anna: Hallo / Bist du da?\n[14:32] Max: Ja"
+
+    def test_drops_repeated_and_forwarded_text(self):
+        block = build_message_block(_chat(
+            ("Anna", "Treffen um 8 im Büro"),
+            ("Max", "treffen um 8  im Büro"),
+            ("Max", "Passt"),
+        ))
+        assert block.text.count("Büro") == 1
+        assert "[14:32] Max: Passt" in block.text
+
+    def test_truncates_long_messages(self):
+        long_text = " ".join(["Wort"] * 500)
+        block = build_message_block(_chat(("Anna", long_text)), max_message_tokens=20)
+        assert block.text.endswith("[…]")
+        assert block.tokens < block.raw_tokens / 10
+
+    def test_budget_drops_oldest_lines(self):
+        messages = _chat(*[(f"Person {i}", f"Nachricht Nummer {i}") for i in range(50)])
+        block = build_message_block(messages, budget=60)
+        assert block.tokens <= 60
+        assert block.omitted > 0
+        assert block.text.startswith(f"({block.omitted} ältere Nachrichten ausgelassen)")
+        assert "Nachricht Nummer 49" in block.text
+
+    def test_budget_trims_within_one_sender(self):
+        messages = _chat(*[("Anna", f"Nachricht Nummer {i} mit etwas mehr Text dazu") for i in range(200)])
+        block = build_message_block(messages, budget=100, numbered=True)
+        assert block.tokens <= 100
+        assert block.lines == 1
+        assert block.text.startswith(f"({block.omitted} ältere Nachrichten ausgelassen)\n#{block.omitted + 1},")
+        assert block.text.endswith("Nachricht Nummer 199 mit etwas mehr Text dazu")
+        # Uhrzeit der ältesten verbliebenen Nachricht, nicht der ersten der Gruppe
+        assert "[14:30]" not in block.text
+
+    def test_budget_truncates_single_message(self):
+        block = build_message_block(_chat(("Anna", " ".join(["Wort"] * 500))), budget=50)
+        assert block.tokens <= 50
+        assert block.text.endswith("[…]")
+
+    def test_records_savings_in_call_stats(self):
+        stats = PromptStats()
+        token = current_prompt_stats.set(stats)
+        try:
+            block = build_message_block(_chat(("Anna", "Hallo"), ("Anna", "Hallo"), ("Anna", "Wie geht's?")))
+            assert stats.raw_tokens == 0  # Aufbau allein zählt nichts
+            block.record("summary")
+        finally:
+            current_prompt_stats.reset(token)
+        assert stats.raw_tokens > stats.sent_tokens > 0
+        assert stats.saved_tokens > 0
+
+    def test_numbering_keeps_original_message_index(self):
+        block = build_message_block(
+            _chat(("Anna", "Hallo"), ("Max", "Hallo"), ("Max", "Ja"), ("Max", "Kommst du?"), ("Lisa", "Hi")),
+            numbered=True,
+        )
+        assert block.lines == 3
+        assert block.text.splitlines() == [
+            "#1 [14:30] Anna: Hallo",
+            "#3,4 [14:32] Max: Ja / Kommst du?",
+            "#5 [14:34] Lisa: Hi",
+        ]
+
+    def test_estimate_counts_long_words_more(self):
+        assert estimate_tokens("ja") == 1
+        assert estimate_tokens("Donaudampfschifffahrt") > 1
+
+
 # ── Keine Nachrichten ──
 
 
@@ -138,6 +340,1297 @@ class TestAudioChunking:
     def test_empty_input(self):
         assert mulaw_to_base64_chunks(b"") == []
 
+    def test_chunks_accept_memoryview(self):
+        data = encode_mulaw(np.zeros(1000, dtype=np.int16))
+        chunks = mulaw_to_base64_chunks(data, chunk_size=640)
+        assert b"".join(base64.b64decode(c) for c in chunks) == bytes(data)
+
+
+class TestAudioCodec:
+    def test_mulaw_roundtrip_is_stable(self):
+        table = decode_mulaw(bytes(range(256)))
+        assert np.array_equal(decode_mulaw(encode_mulaw(table)), table)
+
+    def test_silence_encodes_to_0xff(self):
+        assert bytes(encode_mulaw(np.zeros(4, dtype=np.int16))) == b"\xff" * 4
+
+    def test_encode_returns_memoryview(self):
+        assert isinstance(encode_mulaw(np.zeros(4, dtype=np.int16)), memoryview)
+
+    def test_resample_24k_to_8k_keeps_tone(self):
+        t = np.arange(24000) / 24000
+        tone = (10000 * np.sin(2 * np.pi * 440 * t)).astype(np.int16)
+        out = resample(tone, 24000, 8000)
+        expected = 10000 * np.sin(2 * np.pi * 440 * np.arange(len(out)) / 8000)
+        assert len(out) == 8000
+        assert np.max(np.abs(out[50:-50] - expected[50:-50])) < 50
+
+    def test_resample_suppresses_aliasing(self):
+        t = np.arange(24000) / 24000
+        tone = (10000 * np.sin(2 * np.pi * 6000 * t)).astype(np.int16)
+        assert np.max(np.abs(resample(tone, 24000, 8000)[50:-50])) < 50
+
+    def test_resample_rational_ratio(self):
+        assert len(resample(np.zeros(44100, dtype=np.int16), 44100, 8000)) == 8000
+
+    def test_mulaw_to_wav(self):
+        wav = mulaw_to_wav(b"\xff" * 800)
+        assert wav[:4] == b"RIFF"
+        assert len(wav) == 44 + 1600
+
+    def test_decode_mp3_without_audioop(self):
+        import subprocess
+        import sys
+        from pathlib import Path
+
+        # Python 3.13 ohne Dev-Dependencies: weder audioop noch audioop-lts
+        code = (
+            "import sys; sys.modules['audioop'] = None; "
+            "from src.core.audio_utils import decode_mp3, mp3_to_mulaw; "
+            "mp3_to_mulaw(b'kein mp3'); "
+            "print(','.join(m for m in ('audioop', 'pydub') if sys.modules.get(m)))"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", code],
+            capture_output=True,
+            text=True,
+            cwd=Path(__file__).resolve().parent.parent / "app",
+            check=True,
+        )
+        assert result.stdout.strip() == ""
+
+    async def test_render_decodes_off_the_event_loop(self, monkeypatch):
+        def slow_decode(mp3):
+            time.sleep(0.2)  # wie ffmpeg: blockiert, bis alles dekodiert ist
+            return b"\xff" * 640
+
+        monkeypatch.setattr("src.core.pipeline.mp3_to_mulaw", slow_decode)
+        pipeline, _ = _simulated_call("RENDER1")
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        task = asyncio.create_task(ticker())
+        assert await pipeline._render("Hallo") == b"\xff" * 640
+        task.cancel()
+        assert ticks > 5
+
+
+# ── Voice Activity Detection ──
+
+SILENCE_FRAME = b"\xff" * FRAME_SAMPLES  # mulaw 0xFF = 0
+SPEECH_FRAME = (b"\x80" * 8 + b"\x00" * 8) * (FRAME_SAMPLES // 16)  # 500 Hz Rechteck
+
+
+class TestVoiceActivityDetection:
+    def test_silence_is_not_forwarded(self):
+        vad = VoiceActivityDetector()
+        for _ in range(50):
+            result = vad.process(SILENCE_FRAME)
+            assert result.audio == b""
+            assert not result.end_of_utterance
+
+    def test_speech_is_forwarded_with_padding(self):
+        vad = VoiceActivityDetector(min_speech_ms=20, padding_ms=40, hangover_ms=100)
+        for _ in range(5):
+            vad.process(SILENCE_FRAME)
+        result = vad.process(SPEECH_FRAME)
+        assert result.audio == SILENCE_FRAME * 2 + SPEECH_FRAME
+
+    def test_end_of_utterance_after_hangover(self):
+        vad = VoiceActivityDetector(min_speech_ms=20, padding_ms=0, hangover_ms=100)
+        vad.process(SPEECH_FRAME * 5)
+        results = [vad.process(SILENCE_FRAME) for _ in range(5)]
+        assert [r.end_of_utterance for r in results] == [False] * 4 + [True]
+        assert all(r.audio == SILENCE_FRAME for r in results)
+        assert vad.process(SILENCE_FRAME).audio == b""
+
+    def test_high_zero_crossing_noise_is_rejected(self):
+        vad = VoiceActivityDetector(min_speech_ms=20)
+        hiss = b"\x80\x00" * (FRAME_SAMPLES // 2)
+        assert vad.process(hiss * 10).audio == b""
+
+    def test_partial_frames_are_buffered(self):
+        vad = VoiceActivityDetector(min_speech_ms=20, padding_ms=0)
+        assert vad.process(SPEECH_FRAME[:100]).audio == b""
+        assert vad.process(SPEECH_FRAME[100:]).audio == SPEECH_FRAME
+
+
+# ── Spekulative Antworten ──
+
+
+class TestSpeculation:
+    @staticmethod
+    def _executor(calls: list[str]):
+        async def compute(text: str) -> str:
+            calls.append(text)
+            return f"Antwort auf {text}"
+
+        return SpeculativeExecutor(compute, stability_ms=10)
+
+    def test_normalize_ignores_case_and_punctuation(self):
+        assert normalize_transcript("Wann hat Anna geschrieben?") == "wann hat anna geschrieben"
+
+    async def test_hit_when_final_matches(self):
+        calls: list[str] = []
+        spec = self._executor(calls)
+        spec.observe("Wann hat Anna")
+        spec.observe("Wann hat Anna geschrieben")
+        await asyncio.sleep(0.05)
+        assert await spec.resolve("Wann hat Anna geschrieben?") == "Antwort auf Wann hat Anna geschrieben"
+        assert calls == ["Wann hat Anna geschrieben"]
+
+    async def test_miss_when_final_differs(self):
+        calls: list[str] = []
+        spec = self._executor(calls)
+        spec.observe("Wann hat Anna")
+        await asyncio.sleep(0.05)
+        assert await spec.resolve("Wann hat Anna angerufen") is None
+
+    async def test_unstable_interim_does_not_start(self):
+        calls: list[str] = []
+        spec = self._executor(calls)
+        spec.observe("Wann")
+        assert await spec.resolve("Wann") is None
+        assert calls == []
+
+
+# ── Record & Replay ──
+
+
+def _final(text: str) -> str:
+    return json.dumps({
+        "type": "Results", "is_final": True,
+        "channel": {"alternatives": [{"transcript": text}]},
+    })
+
+
+class TestTraceReplay:
+    def test_recorder_roundtrip(self, tmp_path):
+        path = tmp_path / "call.trace.jsonl.gz"
+        recorder = TraceRecorder(path)
+        recorder.write("in", p="//8=")
+        recorder.close()
+        recorder.write("in", p="ignored")
+        events = load_trace(path)
+        assert [e["k"] for e in events] == ["in"]
+        assert events[0]["p"] == "//8="
+
+    def test_analyze_turn_latency(self):
+        events = [
+            {"t": 0, "k": "start"},
+            {"t": 100, "k": "out", "n": 800},
+            {"t": 900, "k": "llm", "latency": 0.5, "text": "x"},
+            {"t": 1000, "k": "stt", "s": 1, "m": _final("Wer hat geschrieben?")},
+            {"t": 1800, "k": "out", "n": 800},
+        ]
+        report = analyze(events)
+        assert report["first_audio_ms"] == 100
+        assert report["turn_latency_ms"]["mean"] == 800
+        assert report["upstream_ms"]["llm"]["mean"] == 500
+
+    def test_compare_reports(self):
+        base = {"first_audio_ms": 500, "duration_ms": 9000,
+                "turn_latency_ms": {"mean": 1200, "p95": 2000}}
+        new = {"first_audio_ms": 300, "duration_ms": 8000,
+               "turn_latency_ms": {"mean": 900, "p95": None}}
+        diff = compare(base, new)
+        assert diff["first_audio_ms"]["delta"] == -200
+        assert diff["turn_latency_p95_ms"]["delta"] is None
+
+    async def test_replay_reuses_recorded_upstreams(self):
+        events = [
+            {"t": 0, "k": "start", "sid": "MZ1"},
+            {"t": 50, "k": "tts", "latency": 0.05, "chars": 10, "audio": ""},
+            {"t": 120, "k": "telegram", "latency": 0.07, "updates": [SAMPLE_UPDATE]},
+            {"t": 900, "k": "llm", "latency": 0.8, "text": "Du hast 1 neue Nachricht."},
+            {"t": 950, "k": "stop"},
+        ]
+        replayed = await replay(events, speed=100, grace=0.2)
+        llm = [e for e in replayed if e["k"] == "llm"]
+        telegram = [e for e in replayed if e["k"] == "telegram"]
+        assert llm[0]["text"] == "Du hast 1 neue Nachricht."
+        assert telegram[0]["updates"] == [SAMPLE_UPDATE]
+
+
+# ── Transport / Simulation ──
+
+
+class _SimTelegram:
+    async def get_messages(self, limit: int = 20):
+        return [SAMPLE_MESSAGE]
+
+    async def acknowledge(self, last_update_id: int):
+        pass
+
+
+class _SimLLM:
+    async def summarize(self, messages):
+        return "Max fragt, ob du heute Abend kommst."
+
+
+class _SimTTS:
+    async def synthesize(self, text: str) -> bytes:
+        return text.encode()
+
+
+class _SimStream:
+    """Deepgram-Ersatz: liefert ein finales "Tschüss" (sofort oder nach `gate`)."""
+
+    def __init__(self, gate: asyncio.Event | None = None):
+        self.gate = gate
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def send(self, data):
+        pass
+
+    def __aiter__(self):
+        return self._iter()
+
+    async def _iter(self):
+        if self.gate is not None:
+            await self.gate.wait()
+        yield _final("Danke, tschüss")
+
+
+class _SimSTT:
+    def __init__(self, gate: asyncio.Event | None = None):
+        self.gate = gate
+
+    def create_stream(self):
+        return _SimStream(self.gate)
+
+
+def _simulated_call(sid: str, llm=None, stt=None):
+    from src.core.pipeline import Pipeline
+    from src.core.service_provider import ServiceProvider
+
+    services = ServiceProvider(
+        telegram=_SimTelegram(), llm=llm or _SimLLM(), tts=_SimTTS(), stt=stt or _SimSTT(),  # type: ignore
+    )
+    transport = InMemoryTransport(sid=sid)
+    return Pipeline(transport=transport, services=services), transport
+
+
+class TestInMemoryTransport:
+    @pytest.fixture(autouse=True)
+    def _fake_transcoding(self, monkeypatch):
+        # kein ffmpeg im Test: 1 Zeichen Text = 80 ms mulaw
+        monkeypatch.setattr("src.core.pipeline.mp3_to_mulaw", lambda mp3: b"\xff" * 640 * len(mp3))
+
+    async def test_pipeline_runs_full_call(self):
+        pipeline, transport = _simulated_call("SIM1")
+        await asyncio.wait_for(pipeline.run(), timeout=5)
+        # Begrüßung, Zusammenfassung, Verabschiedung
+        assert transport.marks == ["utterance-1", "utterance-2", "utterance-3"]
+        assert transport.audio_seconds > 10
+
+    async def test_simulates_calls_faster_than_real_time(self):
+        calls = [_simulated_call(f"SIM{i}") for i in range(200)]
+        started = asyncio.get_running_loop().time()
+        await asyncio.wait_for(asyncio.gather(*(p.run() for p, _ in calls)), timeout=10)
+        elapsed = asyncio.get_running_loop().time() - started
+        audio = sum(t.audio_seconds for _, t in calls)
+        assert all(len(t.marks) == 3 for _, t in calls)
+        assert audio / elapsed > 100
+
+    def test_caller_audio_reaches_pipeline(self):
+        pipeline, transport = _simulated_call("SIM2")
+        transport.say(b"\x7f" * 1600)
+        transport.hang_up()
+        assert pipeline.audio_queue.qsize() == 4
+        assert pipeline.audio_queue.nbytes == 1600
+
+
+# ── Tastensteuerung (DTMF) ──
+
+
+class _SlowLLM(_SimLLM):
+    async def summarize(self, messages):
+        await asyncio.sleep(5)
+        return await super().summarize(messages)
+
+
+async def _until(condition, timeout: float = 2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "timeout"
+        await asyncio.sleep(0.005)
+
+
+class TestKeypad:
+    @pytest.fixture(autouse=True)
+    def _fake_transcoding(self, monkeypatch):
+        monkeypatch.setattr("src.core.pipeline.mp3_to_mulaw", lambda mp3: b"\xff" * 640 * len(mp3))
+
+    async def test_skip_cancels_summary_without_waiting_for_claude(self):
+        pipeline, transport = _simulated_call("KEY1", llm=_SlowLLM())
+        run = asyncio.create_task(pipeline.run())
+        await _until(lambda: transport.marks)  # Begrüßung läuft
+        transport.keypress("3")
+        await asyncio.wait_for(run, timeout=2)
+        # Begrüßung + Verabschiedung, keine Zusammenfassung
+        assert len(transport.marks) == 2
+        assert transport.clears == 1
+
+    async def test_next_repeat_and_hangup(self):
+        gate = asyncio.Event()  # Anrufer sagt nichts
+        pipeline, transport = _simulated_call("KEY2", stt=_SimSTT(gate))
+        run = asyncio.create_task(pipeline.run())
+        await _until(lambda: len(transport.marks) == 2)  # Begrüßung + Zusammenfassung
+
+        transport.keypress("2")
+        await _until(lambda: len(transport.marks) == 3)
+        message_bytes = transport.bytes_sent
+        transport.keypress("1")
+        await _until(lambda: len(transport.marks) == 4)
+        assert transport.bytes_sent - message_bytes > 0
+        transport.keypress("2")  # nur eine Nachricht vorhanden
+        await _until(lambda: len(transport.marks) == 5)
+        transport.keypress("9")  # nicht belegt
+
+        transport.keypress("#")
+        await asyncio.wait_for(run, timeout=2)
+        assert transport.ended
+        assert transport.clears == 4
+
+    async def test_next_during_summary_plays_prerendered_message(self):
+        gate = asyncio.Event()  # Anrufer sagt nichts
+        pipeline, transport = _simulated_call("KEY3", llm=_SlowLLM(), stt=_SimSTT(gate))
+        run = asyncio.create_task(pipeline.run())
+        # Erste Nachricht ist gerendert, bevor jemand eine Taste drückt
+        await _until(lambda: 0 in pipeline._message_audio and pipeline._message_audio[0].done())
+        assert len(transport.marks) == 1  # nur die Begrüßung, Claude rechnet noch
+
+        transport.keypress("2")
+        await _until(lambda: len(transport.marks) == 2)
+        await _until(lambda: pipeline._summary_task is not None and pipeline._summary_task.done())
+        assert pipeline._summary_task.cancelled()
+
+        transport.keypress("#")
+        await asyncio.wait_for(run, timeout=2)
+        # Begrüßung, Nachricht, Verabschiedung — keine Zusammenfassung dazwischen
+        assert len(transport.marks) == 3
+
+
+# ── Task-Supervision pro Anruf ──
+
+
+class _ClosableSocket:
+    def __init__(self):
+        self.closed = False
+
+    async def close(self):
+        await asyncio.sleep(0)
+        self.closed = True
+
+
+class TestCallSupervisor:
+    async def test_teardown_awaits_cancelled_tasks_and_closes_sockets(self):
+        from src.core.supervisor import CallSupervisor, LeakTracker
+
+        supervisor = CallSupervisor("SUP1", timeout=1, leaks=LeakTracker(delay=60))
+        cleaned = asyncio.Event()
+
+        async def worker():
+            try:
+                await asyncio.sleep(10)
+            finally:
+                await asyncio.sleep(0)  # Aufräumen braucht selbst einen Loop-Durchlauf
+                cleaned.set()
+
+        task = supervisor.spawn(worker())
+        socket = supervisor.register(_ClosableSocket(), "socket", close=True)
+        await asyncio.sleep(0)
+        await supervisor.aclose()
+
+        assert task.cancelled() and cleaned.is_set()
+        assert socket.closed
+        with pytest.raises(asyncio.CancelledError):
+            await supervisor.spawn(asyncio.sleep(1))  # nach dem Abbau sofort abgebrochen
+
+    async def test_stuck_task_is_time_limited_and_counted_as_leak(self):
+        from src.core.supervisor import LEAKED_OBJECTS, CallSupervisor, LeakTracker
+
+        tracker = LeakTracker(delay=60)
+        supervisor = CallSupervisor("SUP2", timeout=0.05, leaks=tracker)
+        release = asyncio.Event()
+
+        async def stubborn():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                await release.wait()  # ignoriert den Abbruch
+
+        task = supervisor.spawn(stubborn())
+        await asyncio.sleep(0)
+        before = LEAKED_OBJECTS.value(kind="task")
+        started = time.monotonic()
+        await supervisor.aclose()
+        assert time.monotonic() - started < 0.5
+
+        assert tracker.check()["task"] == 1
+        assert LEAKED_OBJECTS.value(kind="task") == before + 1
+        release.set()
+        await task
+        await asyncio.sleep(0)
+        assert LEAKED_OBJECTS.value(kind="task") == before
+
+    async def test_finished_call_leaves_nothing_behind(self, monkeypatch):
+        from src.core.pipeline import Pipeline
+        from src.core.service_provider import ServiceProvider
+        from src.core.supervisor import CallSupervisor, LeakTracker
+
+        monkeypatch.setattr("src.core.pipeline.mp3_to_mulaw", lambda mp3: b"\xff" * 640 * len(mp3))
+        tracker = LeakTracker(delay=60)
+        services = ServiceProvider(
+            telegram=_SimTelegram(), llm=_SimLLM(), tts=_SimTTS(), stt=_SimSTT(),  # type: ignore
+        )
+        pipeline = Pipeline(
+            transport=InMemoryTransport(sid="SUP3"),
+            services=services,
+            supervisor=CallSupervisor("SUP3", leaks=tracker),
+        )
+        await asyncio.wait_for(pipeline.run(), timeout=5)
+        await pipeline.supervisor.aclose()
+        del pipeline
+
+        assert not tracker.check()
+
+
+# ── Sampling-Profiler ──
+
+
+def _busy_work(seconds: float):
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        sum(range(1000))
+
+
+async def _tagged_busy_loop(seconds: float):
+    tag_task("CA-prof", "transcode")
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        # länger als sys.getswitchinterval(), sonst landen Samples nur an GIL-Freigaben
+        _busy_work(0.03)
+        await asyncio.sleep(0)
+
+
+class TestSamplingProfiler:
+    async def test_samples_are_tagged_by_call_and_stage(self):
+        profiler = SamplingProfiler(cooldown=0)
+        work = asyncio.create_task(_tagged_busy_loop(0.4))
+        collapsed = await profiler.profile(0.3, interval_ms=2)
+        await work
+
+        lines = collapsed.splitlines()
+        tagged = [line for line in lines if line.startswith("call:CA-prof;stage:transcode;")]
+        assert tagged
+        assert any("_busy_work" in line for line in tagged)
+        stack, count = tagged[0].rsplit(" ", 1)
+        assert int(count) > 0 and ";" in stack
+
+    async def test_rate_limited(self):
+        profiler = SamplingProfiler(cooldown=60)
+        await profiler.profile(0.1, interval_ms=5)
+        with pytest.raises(ProfilerBusy):
+            await profiler.profile(0.1)
+
+    async def test_distinct_stacks_are_bounded(self):
+        profiler = SamplingProfiler(cooldown=0, max_stacks=1)
+        work = asyncio.create_task(_tagged_busy_loop(0.3))
+        collapsed = await profiler.profile(0.2, interval_ms=1)
+        await work
+        stacks = [line for line in collapsed.splitlines() if "[truncated]" not in line]
+        assert len(stacks) == 1
+
+
+# ── Admission Control ──
+
+
+class TestUpstreamScheduler:
+    async def test_priority_order(self):
+        scheduler = UpstreamScheduler(limits={"llm": 1}, max_queue=10, max_wait=1)
+        order: list[str] = []
+        await scheduler.acquire("llm")
+
+        async def job(name: str, priority: Priority):
+            async with scheduler.slot("llm", priority):
+                order.append(name)
+
+        tasks = [
+            asyncio.create_task(job("background", Priority.BACKGROUND)),
+            asyncio.create_task(job("followup", Priority.FOLLOWUP)),
+            asyncio.create_task(job("first_audio", Priority.FIRST_AUDIO)),
+        ]
+        await asyncio.sleep(0)
+        scheduler.release("llm")
+        await asyncio.gather(*tasks)
+        assert order == ["first_audio", "followup", "background"]
+        assert scheduler.stats()["llm"]["active"] == 0
+
+    async def test_full_queue_sheds_immediately(self):
+        scheduler = UpstreamScheduler(limits={"tts": 1}, max_queue=1, max_wait=1)
+        await scheduler.acquire("tts")
+        waiter = asyncio.create_task(scheduler.acquire("tts", Priority.FOLLOWUP))
+        await asyncio.sleep(0)
+        with pytest.raises(Overloaded) as exc:
+            await scheduler.acquire("tts", Priority.FOLLOWUP)
+        assert exc.value.upstream == "tts"
+        waiter.cancel()
+
+    async def test_higher_priority_evicts_background(self):
+        scheduler = UpstreamScheduler(limits={"tts": 1}, max_queue=1, max_wait=1)
+        await scheduler.acquire("tts")
+        background = asyncio.create_task(scheduler.acquire("tts", Priority.BACKGROUND))
+        await asyncio.sleep(0)
+        first = asyncio.create_task(scheduler.acquire("tts", Priority.FIRST_AUDIO))
+        await asyncio.sleep(0)
+        scheduler.release("tts")
+        await first
+        with pytest.raises(Overloaded):
+            await background
+
+    async def test_wait_timeout_sheds_and_records_wait(self):
+        scheduler = UpstreamScheduler(limits={"stt": 1}, max_queue=5, max_wait=0.01)
+        before = QUEUE_WAIT_SECONDS.count(upstream="stt", priority="first_audio")
+        await scheduler.acquire("stt", Priority.FIRST_AUDIO)
+        with pytest.raises(Overloaded):
+            await scheduler.acquire("stt", Priority.FIRST_AUDIO)
+        assert scheduler.stats()["stt"] == {"active": 1, "queued": 0, "limit": 1}
+        assert QUEUE_WAIT_SECONDS.count(upstream="stt", priority="first_audio") == before + 1
+
+    async def test_stt_stream_releases_slot_after_connect(self, monkeypatch):
+        from contextlib import asynccontextmanager
+
+        from src.service.stt_service import STTService
+
+        @asynccontextmanager
+        async def connect():
+            yield "dg_ws"
+
+        scheduler = UpstreamScheduler(limits={"stt": 1})
+        stt = STTService(api_key="fake", scheduler=scheduler)
+        monkeypatch.setattr(stt, "_connect", connect)
+        async with stt.create_stream() as dg_ws:
+            assert dg_ws == "dg_ws"
+            # offener Stream blockiert keine Sprachnachrichten-Transkription
+            assert scheduler.stats()["stt"]["active"] == 0
+
+
+# ── Adaptive Timeouts + Hedging ──
+
+
+class TestLatencyHedging:
+    def test_timeout_static_until_enough_samples(self):
+        tracker = LatencyTracker("test", static_timeout=15, window=50, min_samples=5)
+        assert tracker.timeout() == 15
+        assert tracker.hedge_delay() is None
+        for _ in range(5):
+            tracker.observe(1.5)
+        assert tracker.timeout() == 3.0
+        assert tracker.hedge_delay() == 1.5
+        assert tracker.timeout(scale=100) == 15  # statischer Timeout bleibt Obergrenze
+
+    async def test_adaptive_timeout_returns_fallback(self):
+        tracker = LatencyTracker("test", static_timeout=0.02, min_samples=1)
+        result = await with_timeout(tracker, lambda: asyncio.sleep(1, "late"), on_timeout="")
+        assert result == ""
+        assert tracker.percentile(50) == 0.02
+
+    async def test_hedge_wins_when_primary_stalls(self):
+        tracker = LatencyTracker("hedge-test", static_timeout=5, min_samples=1)
+        tracker.observe(0.01)
+        scheduler = UpstreamScheduler(limits={"hedge-test": 2})
+        delays = iter([1.0, 0.0])
+        cancelled = []
+
+        async def attempt():
+            try:
+                await asyncio.sleep(next(delays))
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+            return "ok"
+
+        async with scheduler.slot("hedge-test"):
+            result = await hedged(tracker, attempt, succeeded=bool, scheduler=scheduler)
+            assert scheduler.stats()["hedge-test"]["active"] == 1
+        assert result == "ok"
+        assert cancelled == [True]  # Verlierer ist beendet, nicht nur abgebrochen
+        assert HEDGE_TOTAL.value(upstream="hedge-test") == 1
+        assert HEDGE_WINS.value(upstream="hedge-test") == 1
+
+    async def test_no_hedge_without_free_slot(self):
+        tracker = LatencyTracker("hedge-busy", static_timeout=5, min_samples=1)
+        tracker.observe(0.001)
+        scheduler = UpstreamScheduler(limits={"hedge-busy": 1})
+        async with scheduler.slot("hedge-busy"):
+            result = await hedged(
+                tracker, lambda: asyncio.sleep(0.01, "slow"), succeeded=bool, scheduler=scheduler
+            )
+        assert result == "slow"
+        assert HEDGE_TOTAL.value(upstream="hedge-busy") == 0
+
+    async def test_cancel_before_hedge_stops_primary(self):
+        tracker = LatencyTracker("hedge-cancel", static_timeout=5, min_samples=1)
+        tracker.observe(1.0)  # Hedge erst nach 1 s
+        finished = asyncio.Event()
+
+        async def attempt():
+            try:
+                await asyncio.sleep(10)
+            finally:
+                finished.set()
+
+        call = asyncio.create_task(hedged(tracker, attempt, succeeded=bool))
+        await asyncio.sleep(0.01)
+        call.cancel()  # z.B. Auflegen
+        with pytest.raises(asyncio.CancelledError):
+            await call
+        assert finished.is_set()  # primary ist beendet, bevor der Aufrufer den Slot freigibt
+
+    async def test_externally_cancelled_attempt_loses_to_the_other(self):
+        tracker = LatencyTracker("hedge-ext", static_timeout=5, min_samples=1)
+        tracker.observe(0.01)
+        tasks = []
+
+        async def attempt():
+            tasks.append(asyncio.current_task())
+            await asyncio.sleep(0.05 if len(tasks) == 2 else 10)
+            return "ok"
+
+        call = asyncio.create_task(hedged(tracker, attempt, succeeded=bool))
+        await _until(lambda: len(tasks) == 2)
+        tasks[0].cancel()  # primary von außen abgebrochen (z.B. Supervisor)
+        assert await asyncio.wait_for(call, timeout=2) == "ok"
+
+
+# ── Modell-Routing ──
+
+
+class TestModelRouter:
+    def test_small_requests_use_fast_model(self):
+        router = ModelRouter("big", fast_model="small")
+        assert router.route(3, max_tokens=300, question="Wann hat Anna geschrieben?") == FAST
+        assert router.route(200, max_tokens=500) == STRONG
+        assert router.route(3, max_tokens=300, question="x" * 500) == STRONG
+
+    def test_without_fast_model_always_strong(self):
+        router = ModelRouter("big")
+        assert router.route(1, max_tokens=300) == STRONG
+        assert router.fallback(STRONG) is None
+
+    async def test_failed_fast_route_falls_back_to_strong(self):
+        from src.service.llm_service import LLMService
+
+        llm = LLMService(api_key="fake", model="big", fast_model="small")
+        llm.hedging = False
+        models: list[str] = []
+
+        async def fake_request(system, messages, max_tokens, model):
+            models.append(model)
+            return None if model == "small" else "Anna schrieb um 9 Uhr."
+
+        llm._request = fake_request  # type: ignore
+        before = ROUTE_FALLBACK_TOTAL.value(route=FAST)
+        answer = await llm.draft_followup("Wann?", [], [])
+        assert answer == "Anna schrieb um 9 Uhr."
+        assert models == ["small", "big"]
+        assert ROUTE_FALLBACK_TOTAL.value(route=FAST) == before + 1
+
+
+# ── Speicher pro Anruf ──
+
+
+class TestCallMemory:
+    def test_message_is_slotted_and_formats_lazily(self):
+        assert not hasattr(SAMPLE_MESSAGE, "__dict__")
+        assert SAMPLE_MESSAGE.clock_time() == "14:30"
+        assert SAMPLE_MESSAGE.timestamp.tzinfo == ZoneInfo("Europe/Berlin")
+
+    def test_parsed_senders_are_interned(self):
+        first = TelegramService._parse_update(json.loads(json.dumps(SAMPLE_UPDATE)))
+        second = TelegramService._parse_update(json.loads(json.dumps(SAMPLE_UPDATE)))
+        assert first is not None and second is not None
+        assert first.sender is second.sender
+
+    def test_audio_queue_drops_oldest_and_counts_bytes(self):
+        queue = AudioQueue(maxsize=2)
+        for chunk in (b"a" * 160, b"b" * 160, b"c" * 160):
+            queue.put_latest(chunk)
+        assert queue.nbytes == 320
+        assert queue.get_nowait() == b"b" * 160
+        assert queue.nbytes == 160
+
+    def test_budget_trims_history_then_messages(self):
+        history = [{"role": "user", "content": "x" * 1000} for _ in range(6)]
+        messages = [SAMPLE_MESSAGE] * 5
+        total = trim_to_budget(messages, history, fixed_bytes=0, budget=3000)
+        assert total <= 3000
+        assert len(history) == 2
+        assert len(messages) < 5
+
+    def test_memory_endpoint_lists_calls(self):
+        from src.endpoint import app
+        with TestClient(app, client=("127.0.0.1", 50000)) as client:
+            response = client.get("/admin/calls/memory")
+        assert response.status_code == 200
+        assert response.json()["calls"] == {}
+
+    def test_memory_endpoint_requires_admin(self, monkeypatch):
+        import src.endpoint
+        from src.endpoint import app
+        with TestClient(app) as client:
+            assert client.get("/admin/calls/memory").status_code == 403
+            monkeypatch.setattr(src.endpoint, "ADMIN_TOKEN", "geheim")
+            headers = {"Authorization": "Bearer falsch"}
+            assert client.get("/admin/calls/memory", headers=headers).status_code == 403
+            headers = {"Authorization": "Bearer geheim"}
+            assert client.get("/admin/calls/memory", headers=headers).status_code == 200
+
+
+# ── Kapazität ──
+
+
+class TestCallCapacity:
+    def test_unavailable_at_capacity_and_when_draining(self):
+        capacity = CallCapacity(max_calls=1)
+        assert capacity.unavailable_reason() is None
+        capacity.call_started()
+        assert capacity.unavailable_reason() == "at_capacity"
+        capacity.call_ended()
+        capacity.draining = True
+        assert capacity.unavailable_reason() == "draining"
+
+    async def test_drain_waits_for_active_calls(self):
+        capacity = CallCapacity()
+        capacity.call_started()
+        asyncio.get_running_loop().call_later(0.01, capacity.call_ended)
+        assert await capacity.drain(timeout=1) == 0
+
+    async def test_drain_times_out(self):
+        capacity = CallCapacity()
+        capacity.call_started()
+        assert await capacity.drain(timeout=0.01) == 1
+
+    def test_drain_endpoint_is_admin_only_and_resumable(self):
+        from src.endpoint import app
+        with TestClient(app) as client:
+            assert client.post("/admin/drain").status_code == 403
+            assert not app.state.capacity.draining
+        with TestClient(app, client=("127.0.0.1", 50000)) as client:
+            assert client.post("/admin/drain").json()["status"] == "drained"
+            assert app.state.capacity.unavailable_reason() == "draining"
+            assert client.delete("/admin/drain").status_code == 200
+            assert app.state.capacity.unavailable_reason() is None
+
+    async def test_loop_lag_detected(self):
+        import time
+
+        capacity = CallCapacity(max_loop_lag=0.01)
+        monitor = asyncio.create_task(capacity.monitor_loop_lag(interval=0.01))
+        await asyncio.sleep(0)
+        time.sleep(0.2)  # blockiert den Event-Loop
+        await asyncio.sleep(0.05)
+        monitor.cancel()
+        assert capacity.unavailable_reason() == "event_loop_lagging"
+
+    def test_ready_reports_capacity(self):
+        from src.endpoint import app
+        with TestClient(app) as client:
+            app.state.ready.set()
+            assert client.get("/ready").json()["status"] == "ready"
+            app.state.capacity.active = app.state.capacity.max_calls
+            response = client.get("/ready")
+            app.state.capacity.active = 0
+        assert response.status_code == 503
+        assert response.json()["status"] == "at_capacity"
+
+
+# ── Multi-Tenant ──
+
+
+def _registry(max_cached: int = 2) -> TenantRegistry:
+    from src.service.llm_service import LLMService
+    from src.service.stt_service import STTService
+
+    tenants = {
+        name: Tenant(id=name, telegram_bot_token=f"token-{name}", tts_voice=voice, numbers=(number,))
+        for name, voice, number in [
+            ("anna", "", "+491"),
+            ("ben", "de-DE-KatjaNeural", "+492"),
+            ("cem", "", "+493"),
+        ]
+    }
+    return TenantRegistry(
+        tenants,
+        llm=LLMService(api_key="fake"),
+        stt=STTService(api_key="fake"),
+        default_voice="de-DE-ConradNeural",
+        max_cached=max_cached,
+    )
+
+
+class TestTenantRegistry:
+    def test_resolve_by_called_then_calling_number(self):
+        registry = _registry()
+        assert registry.resolve("+492", "+491") == "ben"
+        assert registry.resolve("+499", "+493") == "cem"
+        assert registry.resolve("+499", "+498") is None
+
+    async def test_providers_share_stateless_clients(self):
+        registry = _registry()
+        anna, ben = registry.get("anna"), registry.get("ben")
+        assert anna.telegram is not ben.telegram
+        assert anna.llm is ben.llm and anna.stt is ben.stt
+        assert anna.tts.voice == "de-DE-ConradNeural"
+        assert ben.tts.voice == "de-DE-KatjaNeural"
+        assert registry.get("anna") is anna
+        await registry.aclose()
+
+    async def test_lru_evicts_idle_tenants_only(self):
+        registry = _registry(max_cached=1)
+        async with registry.lease("anna") as anna:
+            async with registry.lease("ben"):
+                pass
+            # anna läuft noch, ben ist verdrängt
+            assert not anna.telegram.client.is_closed
+        async with registry.lease("cem"):
+            pass
+        assert anna.telegram.client.is_closed
+        await registry.aclose()
+
+    def test_twiml_carries_signed_tenant(self):
+        from src.service.twilio_service import TwilioService
+
+        twilio = TwilioService(tenants=_registry(), prefetch=False)
+        twiml = twilio.generate_twiml(called="+492", caller="+4900", call_sid="CA1")
+        assert '<Parameter name="tenant" value="ben" />' in twiml
+        assert '<Parameter name="call_sid" value="CA1" />' in twiml
+        assert "<Reject" in twilio.generate_twiml(called="+499", caller="+498", call_sid="CA2")
+
+    def test_stream_signature_is_bound_single_use_and_expires(self, monkeypatch):
+        import re
+
+        import src.service.twilio_service as twilio_service
+        from src.service.twilio_service import TwilioService
+
+        twilio = TwilioService(tenants=_registry(), prefetch=False, signature_ttl=60)
+        twiml = twilio.generate_twiml(called="+492", caller="+4900", call_sid="CA1")
+        params = dict(re.findall(r'<Parameter name="(\w+)" value="([^"]*)" />', twiml))
+
+        assert not twilio.verify_stream({**params, "tenant": "anna"}, "CA1")
+        assert not twilio.verify_stream(params, "CA2")  # Signatur eines anderen Anrufs
+        assert twilio.verify_stream(params, "CA1")
+        assert not twilio.verify_stream(params, "CA1")  # nur einmal gültig
+
+        twiml = twilio.generate_twiml(called="+492", caller="+4900", call_sid="CA3")
+        params = dict(re.findall(r'<Parameter name="(\w+)" value="([^"]*)" />', twiml))
+        later = time.time() + 61
+        monkeypatch.setattr(twilio_service.time, "time", lambda: later)
+        assert not twilio.verify_stream(params, "CA3")
+
+    def test_refuses_to_start_without_auth_token(self, monkeypatch):
+        import src.service.twilio_service as twilio_service
+
+        monkeypatch.setattr(twilio_service, "TWILIO_AUTH_TOKEN", "")
+        with pytest.raises(RuntimeError):
+            twilio_service.TwilioService(tenants=_registry())
+
+
+# ── Prefetch beim Voice-Webhook ──
+
+
+class _CountingTelegram(_SimTelegram):
+    def __init__(self, gate: asyncio.Event | None = None):
+        self.gate = gate
+        self.fetches = 0
+
+    async def get_messages(self, limit: int = 20):
+        self.fetches += 1
+        if self.gate is not None:
+            await self.gate.wait()
+        return await super().get_messages(limit)
+
+    async def aclose(self):
+        pass
+
+
+class _CountingLLM(_SimLLM):
+    def __init__(self):
+        self.summaries = 0
+
+    async def summarize(self, messages):
+        self.summaries += 1
+        return await super().summarize(messages)
+
+
+def _prefetch_registry(telegram: _CountingTelegram | None = None):
+    registry = _registry()
+    services = registry.get("ben")
+    services.telegram, services.llm = telegram or _CountingTelegram(), _CountingLLM()
+    services.tts, services.stt = _SimTTS(), _SimSTT()
+    return registry, services
+
+
+class TestPrefetch:
+    @pytest.fixture(autouse=True)
+    def _fake_transcoding(self, monkeypatch):
+        monkeypatch.setattr("src.core.pipeline.mp3_to_mulaw", lambda mp3: b"\xff" * 640 * len(mp3))
+
+    async def test_call_picks_up_prefetch_from_webhook(self):
+        from src.core.pipeline import Pipeline
+        from src.service.twilio_service import TwilioService
+
+        registry, services = _prefetch_registry()
+        twilio = TwilioService(tenants=registry, prefetch=True)
+        twiml = twilio.generate_twiml(called="+492", caller="+4900", call_sid="CA1")
+        assert '<Parameter name="prefetch" value="1" />' in twiml
+
+        prefetch = twilio.prefetcher.claim("CA1")
+        assert await prefetch.summary == "Max fragt, ob du heute Abend kommst."
+        transport = InMemoryTransport(sid="MZ1")
+        pipeline = Pipeline(transport=transport, services=services, prefetch=prefetch)
+        await asyncio.wait_for(pipeline.run(), timeout=5)
+
+        # Kein zweiter Abruf, keine zweite Zusammenfassung
+        assert services.telegram.fetches == 1
+        assert services.llm.summaries == 1
+        assert transport.marks == ["utterance-1", "utterance-2", "utterance-3"]
+        await registry.aclose()
+
+    async def test_unclaimed_prefetch_expires(self):
+        from src.core.prefetch import PREFETCH_UNCLAIMED, CallPrefetcher
+
+        registry, services = _prefetch_registry(_CountingTelegram(gate=asyncio.Event()))
+        prefetcher = CallPrefetcher(registry, ttl=0.05)
+        before = PREFETCH_UNCLAIMED.value(stage="none")
+        assert prefetcher.start("CA2", "ben")
+        prefetch = prefetcher._pending["CA2"]
+        await asyncio.sleep(0.15)
+
+        assert prefetch.messages.cancelled() and prefetch.summary.cancelled()
+        assert prefetcher.claim("CA2") is None
+        assert not registry._leases  # Tenant wieder verdrängbar
+        assert PREFETCH_UNCLAIMED.value(stage="none") == before + 1
+        await registry.aclose()
+
+    async def test_unclaimed_prefetch_counts_wasted_summary(self):
+        from src.core.prefetch import PREFETCH_UNCLAIMED, CallPrefetcher
+
+        # Stream landet auf einem anderen Pod: Abruf und Claude liefen umsonst
+        registry, services = _prefetch_registry()
+        prefetcher = CallPrefetcher(registry, ttl=0.1)
+        before = PREFETCH_UNCLAIMED.value(stage="summarized")
+        assert prefetcher.start("CA3", "ben")
+        await asyncio.sleep(0.2)
+
+        assert services.llm.summaries == 1
+        assert PREFETCH_UNCLAIMED.value(stage="summarized") == before + 1
+        await registry.aclose()
+
+    async def test_prefetch_rate_limited_per_caller_and_tenant(self):
+        from src.core.prefetch import CallPrefetcher, RateLimit
+
+        registry, services = _prefetch_registry(_CountingTelegram(gate=asyncio.Event()))
+        prefetcher = CallPrefetcher(registry, per_caller=RateLimit(2), per_tenant=RateLimit(3))
+        assert prefetcher.start("CA1", "ben", caller="+4900")
+        assert prefetcher.start("CA2", "ben", caller="+4900")
+        assert not prefetcher.start("CA3", "ben", caller="+4900")  # gleicher Anrufer
+        assert prefetcher.start("CA4", "ben", caller="+4901")
+        assert not prefetcher.start("CA5", "ben", caller="+4902")  # Tenant ausgeschöpft
+        assert set(prefetcher._pending) == {"CA1", "CA2", "CA4"}
+        prefetcher.cancel_all()
+        await registry.aclose()
+
+    def test_invalid_webhook_signature_starts_no_prefetch(self):
+        from src.endpoint import app
+
+        with TestClient(app) as client:
+            prefetcher = app.state.twilio.prefetcher
+            form = {"CallSid": "CA1", "From": "+4900", "To": "+4911"}
+            response = client.post("/twilio/voice", data=form, headers={"X-Twilio-Signature": "x"})
+            assert response.status_code == 403
+            assert not prefetcher._pending
+
+
+# ── Nachrichten-Archiv ──
+
+
+def _message(sender: str, day: int, hour: int, text: str, message_id: int) -> TelegramMessage:
+    date = datetime(2024, 1, day, hour, 0, tzinfo=ZoneInfo("Europe/Berlin"))
+    return TelegramMessage(
+        sender=sender,
+        date=int(date.timestamp()),
+        text=text,
+        chat_id=42,
+        message_id=message_id,
+        update_id=100 + message_id,
+    )
+
+
+class TestMessageArchive:
+    NOW = datetime(2024, 1, 15, 18, 0, tzinfo=ZoneInfo("Europe/Berlin"))
+
+    @pytest.fixture
+    def archive(self, tmp_path):
+        archive = MessageArchive(str(tmp_path / "archive.db"))
+        archive.add("anna", [
+            _message("Max Müller", 14, 9, "Das Meeting ist auf Donnerstag verschoben", 1),
+            _message("Max Müller", 15, 14, "Kommst du heute Abend?", 2),
+            _message("Lisa", 14, 20, "Die Rechnung für die Reparatur ist da", 3),
+        ])
+        archive.add("ben", [_message("Max Müller", 14, 10, "Geheim", 4)])
+        yield archive
+        archive.close()
+
+    def test_sender_and_day_query(self, archive):
+        query = archive.parse_question("anna", "Was hat Max gestern geschrieben?", now=self.NOW)
+        assert query.scoped
+        assert [m.text for m in archive.find("anna", query)] == [
+            "Das Meeting ist auf Donnerstag verschoben"
+        ]
+
+    def test_fulltext_prefix_search(self, archive):
+        query = archive.parse_question("anna", "Wegen welcher Reparatur?", now=self.NOW)
+        assert not query.scoped
+        assert [m.sender for m in archive.find("anna", query)] == ["Lisa"]
+
+    def test_duplicates_ignored_and_tenants_isolated(self, archive):
+        archive.add("anna", [_message("Lisa", 14, 20, "Die Rechnung für die Reparatur ist da", 3)])
+        assert len(archive.search("anna")) == 3
+        assert [m.text for m in archive.search("ben")] == ["Geheim"]
+
+    def test_unrelated_question_has_no_matches(self, archive):
+        query = archive.parse_question("anna", "Wie spät ist es?", now=self.NOW)
+        assert archive.find("anna", query) == []
+
+    async def test_scoped_followup_keeps_current_messages(self, archive):
+        from types import SimpleNamespace
+
+        from src.core.pipeline import Pipeline
+
+        services = SimpleNamespace(archive=archive, tenant="anna")
+        pipeline = Pipeline(transport=InMemoryTransport(sid="MZA"), services=services)  # type: ignore
+        pipeline.messages = [_message("Tom", 15, 17, "Bin gleich da", 9)]
+        context = await pipeline._followup_context("Was hat Lisa geschrieben?")
+        assert [m.sender for m in context] == ["Lisa", "Tom"]
+
+
+# ── Sprachnachrichten ──
+
+
+class _VoiceTelegram:
+    def __init__(self):
+        self.downloads: list[str] = []
+        self.tenant = "anna"
+
+    @property
+    def telegram(self):
+        # steht zugleich für den ServiceProvider des Tenants
+        return self
+
+    async def download_file(self, file_id: str) -> bytes:
+        self.downloads.append(file_id)
+        return f"audio-{file_id}".encode()
+
+
+class _VoiceSTT:
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.transcribed = 0
+
+    async def transcribe_batch(self, audios: list[bytes], concurrency: int) -> list[str]:
+        await asyncio.sleep(self.delay)
+        self.transcribed += len(audios)
+        return [f"Text zu {a.decode()}" for a in audios]
+
+
+def _voice_message(unique_id: str, message_id: int = 1) -> TelegramMessage:
+    note = VoiceNote(file_id=f"file-{unique_id}", file_unique_id=unique_id, duration=5)
+    return TelegramMessage(
+        sender="Anna", date=SAMPLE_MESSAGE.date, text=note.placeholder,
+        chat_id=1, message_id=message_id, update_id=message_id, voice=note,
+    )
+
+
+class TestVoiceNotes:
+    async def test_transcribes_and_caches_by_unique_id(self):
+        telegram, stt = _VoiceTelegram(), _VoiceSTT()
+        transcriber = VoiceNoteTranscriber(stt)
+        # dieselbe Notiz weitergeleitet: nur ein Download
+        first = [_voice_message("u1", 1), _voice_message("u1", 2), SAMPLE_MESSAGE]
+        assert await transcriber.transcribe(first, telegram) == 2
+        assert first[0].text == first[1].text == "Text zu audio-file-u1"
+        assert first[2].text == "Kommst du heute Abend?"
+
+        again = [_voice_message("u1", 3)]
+        await transcriber.transcribe(again, telegram)
+        assert again[0].text == "Text zu audio-file-u1"
+        assert telegram.downloads == ["file-u1"]
+        assert stt.transcribed == 1
+
+    async def test_slow_batch_keeps_placeholder_and_fills_cache(self):
+        telegram, stt = _VoiceTelegram(), _VoiceSTT(delay=0.1)
+        transcriber = VoiceNoteTranscriber(stt)
+        messages = [_voice_message("u2")]
+        assert await transcriber.transcribe(messages, telegram, timeout=0.01) == 0
+        assert messages[0].text == "(Sprachnachricht, 5 s)"
+
+        await asyncio.sleep(0.15)
+        later = [_voice_message("u2")]
+        await transcriber.transcribe(later, telegram, timeout=0.01)
+        assert later[0].text == "Text zu audio-file-u2"
+        assert stt.transcribed == 1
+
+    async def test_concurrent_calls_share_one_batch(self):
+        telegram, stt = _VoiceTelegram(), _VoiceSTT(delay=0.02)
+        transcriber = VoiceNoteTranscriber(stt)
+        a, b = [_voice_message("u3")], [_voice_message("u3")]
+        await asyncio.gather(transcriber.transcribe(a, telegram), transcriber.transcribe(b, telegram))
+        assert a[0].text == b[0].text == "Text zu audio-file-u3"
+        assert telegram.downloads == ["file-u3"]
+
+    async def test_batch_leases_tenant_client(self):
+        from contextlib import asynccontextmanager
+
+        caller, leased = _VoiceTelegram(), _VoiceTelegram()
+        leases = []
+
+        @asynccontextmanager
+        async def lease(tenant_id):
+            leases.append(tenant_id)
+            yield leased
+
+        transcriber = VoiceNoteTranscriber(_VoiceSTT())
+        transcriber.lease = lease
+        await transcriber.transcribe([_voice_message("u4")], caller)
+        # Client kommt aus der Registry, nicht vom (evtl. verdrängten) Anrufer
+        assert leases == ["anna"]
+        assert caller.downloads == [] and leased.downloads == ["file-u4"]
+
+    async def test_late_note_counted_once(self):
+        from src.core.voice_notes import VOICE_NOTES_TOTAL
+
+        telegram = _VoiceTelegram()
+        transcriber = VoiceNoteTranscriber(_VoiceSTT(delay=0.05))
+        before = {r: VOICE_NOTES_TOTAL.value(result=r) for r in ("late", "cached", "transcribed")}
+        await transcriber.transcribe([_voice_message("u5")], telegram, timeout=0.01)
+        await asyncio.sleep(0.1)
+        await transcriber.transcribe([_voice_message("u5")], telegram)
+        counts = {r: VOICE_NOTES_TOTAL.value(result=r) - before[r] for r in before}
+        assert counts == {"late": 1, "cached": 0, "transcribed": 0}
+
+
+# ── Vorgerenderte Zusammenfassung ──
+
+
+class _DigestTelegram:
+    def __init__(self, messages):
+        self.messages = messages
+
+    async def get_messages(self):
+        return None if self.messages is None else list(self.messages)
+
+
+class _DigestLLM:
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.calls = 0
+
+    async def summarize(self, messages):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return f"{len(messages)} neue Nachrichten"
+
+
+class _DigestTTS:
+    async def synthesize(self, text):
+        return text.encode()
+
+
+def _digest_services(messages, llm):
+    from types import SimpleNamespace
+
+    return SimpleNamespace(
+        telegram=_DigestTelegram(messages), llm=llm, tts=_DigestTTS(),
+        voice_notes=None, tenant="default",
+    )
+
+
+class TestDigestRenderer:
+    @pytest.fixture(autouse=True)
+    def _fake_transcoding(self, monkeypatch):
+        # kein ffmpeg im Test: "MP3" (Text-Bytes) vervielfacht als mulaw
+        monkeypatch.setattr("src.core.digest.mp3_to_mulaw", lambda mp3: mp3 * 100)
+
+    async def test_renders_after_debounce_and_matches(self):
+        messages = _chat(("Anna", "Hallo"), ("Max", "Bin unterwegs"))
+        llm = _DigestLLM()
+        renderer = DigestRenderer(_digest_services(messages, llm), debounce=0.0)
+
+        await renderer.poll()  # neue Menge erkannt
+        assert llm.calls == 0
+        await renderer.poll()  # stabil → rendern
+        await renderer._render
+
+        digest = renderer.match(messages)
+        assert digest.summary == "2 neue Nachrichten"
+        assert digest.chunks and digest.audio_bytes == len(digest.summary) * 100
+        assert renderer.match(messages[:1]) is None
+
+    async def test_debounce_delays_render(self):
+        llm = _DigestLLM()
+        renderer = DigestRenderer(_digest_services(_chat(("Anna", "Hallo")), llm), debounce=60)
+        await renderer.poll()
+        await renderer.poll()
+        assert renderer._render is None and llm.calls == 0
+
+    async def test_new_messages_cancel_stale_render(self):
+        messages = _chat(("Anna", "Hallo"))
+        llm = _DigestLLM(delay=1.0)
+        services = _digest_services(messages, llm)
+        renderer = DigestRenderer(services, debounce=0.0)
+        await renderer.poll()
+        await renderer.poll()
+        stale = renderer._render
+        assert stale is not None
+
+        services.telegram.messages = _chat(("Anna", "Hallo"), ("Max", "Neu"))
+        await renderer.poll()
+        await asyncio.sleep(0)
+        assert stale.cancelled()
+        assert renderer.digest is None
+
+    async def test_telegram_error_keeps_digest(self):
+        responses = [httpx.Response(200, json={"ok": True, "result": [SAMPLE_UPDATE]})] * 2
+        responses.append(httpx.Response(500))  # getUpdates fehlgeschlagen
+        telegram = TelegramService(bot_token="test")
+        telegram.client = httpx.AsyncClient(transport=httpx.MockTransport(lambda _: responses.pop(0)))
+        services = _digest_services(None, _DigestLLM())
+        services.telegram = telegram
+        renderer = DigestRenderer(services, debounce=0.0)
+        await renderer.poll()
+        await renderer.poll()
+        await renderer._render
+        messages = [TelegramService._parse_update(SAMPLE_UPDATE)]
+        assert renderer.match(messages) is not None
+
+        await renderer.poll()
+        assert not responses
+        assert renderer.match(messages) is not None
+        await telegram.aclose()
+
 
 # ── Pipeline Konstanten ──
 